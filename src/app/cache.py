@@ -0,0 +1,40 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+from google.appengine.api import memcache
+import time
+
+
+def get_generation (name):
+    """
+    Gets the generation of a group of cached items. Items keyed with it are
+    all invalidated at once by next_generation().
+    """
+
+    key = "generation/" + name
+    generation = memcache.get(key)
+    if generation == None:
+        # Starting from the current time, so that a generation which was
+        # evicted from memcache is never reused.
+        generation = int(time.time() * 1000)
+        if not memcache.add(key, generation):
+            generation = memcache.get(key)
+    return generation
+
+def next_generation (name):
+    """
+    Invalidates a group of cached items.
+    """
+
+    memcache.incr("generation/" + name)
@@ -0,0 +1,77 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+from google.appengine.api import memcache
+from google.appengine.ext import db
+import random
+
+import app.model
+import settings
+
+
+# The counter of all the pastes ever submitted.
+kPASTES = "pastes"
+
+
+def count (name):
+    """
+    Adds up the shards of a counter, from the datastore.
+    """
+
+    key_names = [name + "/" + str(i) for i in range(settings.COUNTER_SHARD_COUNT)]
+
+    total = 0
+    for shard in app.model.CounterShard.get_by_key_name(key_names):
+        if shard != None:
+            total += shard.count
+
+    # Pastes were counted in a single entity before the counter was sharded.
+    if name == kPASTES:
+        stats = app.model.PasteStats.get_by_key_name("c1")
+        if stats != None and stats.paste_count != None:
+            total += stats.paste_count
+
+    return total
+
+def get_count (name):
+    """
+    Gets the value of a counter, from memcache when possible.
+    """
+
+    key = "counter/" + name
+    total = memcache.get(key)
+    if total == None:
+        total = count(name)
+        memcache.add(key, total, settings.COUNTER_CACHE_TIME)
+    return total
+
+def increment (name, delta=1):
+    """
+    Increments a counter. One of its shards is picked at random, so that
+    concurrent increments seldom update the same entity.
+    """
+
+    key_name = name + "/" + str(random.randrange(settings.COUNTER_SHARD_COUNT))
+
+    def increment_shard ():
+        shard = app.model.CounterShard.get_by_key_name(key_name)
+        if shard == None:
+            shard = app.model.CounterShard(key_name=key_name, name=name)
+        shard.count += delta
+        shard.put()
+
+    db.run_in_transaction(increment_shard)
+
+    # Does nothing if the total isn't cached, it is then counted on next read.
+    memcache.incr("counter/" + name, delta)
@@ -0,0 +1,198 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+import difflib
+import time
+
+
+# Lines are compared the way difflib.Differ does, they are similar when their
+# ratio is at least this one.
+kSIMILAR_RATIO = 0.75
+
+
+def compare (lines1, lines2, max_time=0, refine_max_lines=0):
+    """
+    Compares two lists of lines. Returns the lines prefixed with "  " when
+    they are common to both lists, "- " when they are only in <lines1> and
+    "+ " when they are only in <lines2>, like difflib.Differ.compare()
+    without its "? " hints. Returns None if it takes more than <max_time>
+    seconds (0 for no limit).
+
+    The lines are matched with Myers' algorithm, which takes time in
+    proportion to the length of the lists times the number of differences,
+    rather than matching the most similar lines first. In a block of at
+    most <refine_max_lines> lines replaced by as many lines at most, each
+    line is then shown right before the line most similar to it, if any.
+    """
+
+    deadline = None
+    if max_time > 0:
+        deadline = time.time() + max_time
+
+    # Lines are compared as numbers, which is much cheaper than comparing
+    # strings of the same length.
+    ids = {}
+    seq1 = [ids.setdefault(line, len(ids)) for line in lines1]
+    seq2 = [ids.setdefault(line, len(ids)) for line in lines2]
+
+    # The common head and tail are left out of the search.
+    start = 0
+    while start < len(seq1) and start < len(seq2) and seq1[start] == seq2[start]:
+        start += 1
+    end1 = len(seq1)
+    end2 = len(seq2)
+    while end1 > start and end2 > start and seq1[end1 - 1] == seq2[end2 - 1]:
+        end1 -= 1
+        end2 -= 1
+
+    edits = find_edits(seq1[start:end1], seq2[start:end2], deadline)
+    if edits == None:
+        return None
+
+    result = ["  " + line for line in lines1[:start]]
+    i = start
+    j = start
+    removed = []
+    added = []
+    for edit in edits + ["="]:
+        if edit == "-":
+            removed.append(lines1[i])
+            i += 1
+        elif edit == "+":
+            added.append(lines2[j])
+            j += 1
+        else:
+            if len(removed) > 0 or len(added) > 0:
+                if len(removed) <= refine_max_lines and len(added) <= refine_max_lines:
+                    result.extend(refine(removed, added, deadline))
+                else:
+                    result.extend(["- " + line for line in removed])
+                    result.extend(["+ " + line for line in added])
+                removed = []
+                added = []
+            if i < end1:
+                result.append("  " + lines1[i])
+                i += 1
+                j += 1
+    result.extend(["  " + line for line in lines1[end1:]])
+
+    return result
+
+def find_edits (seq1, seq2, deadline=None):
+    """
+    Finds the shortest way to turn <seq1> into <seq2>, with Myers' algorithm.
+    Returns a list of "=" (an item kept), "-" (an item of <seq1> removed)
+    and "+" (an item of <seq2> added), or None if <deadline>, a time.time()
+    value, is passed.
+    """
+
+    n = len(seq1)
+    m = len(seq2)
+    max_d = n + m
+    offset = max_d + 1
+
+    # v[offset + k] is the furthest x reached on the diagonal k = x - y.
+    # The part of v each round starts from is kept to walk back the path.
+    v = [0] * (2 * max_d + 3)
+    trace = []
+
+    for d in xrange(0, max_d + 1):
+        if deadline != None and time.time() > deadline:
+            return None
+
+        trace.append(v[offset - d - 1:offset + d + 2])
+        for k in xrange(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and seq1[x] == seq2[y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+
+            if x >= n and y >= m:
+                return walk_back(trace, n, m)
+
+    return walk_back(trace, n, m)
+
+def walk_back (trace, x, y):
+    """
+    Walks the path found by find_edits() back from (<x>, <y>) to the start,
+    and returns its edits in order.
+    """
+
+    edits = []
+    for d in xrange(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        # v holds the diagonals -d - 1 to d + 1.
+        if k == -d or (k != d and v[k - 1 + d + 1] < v[k + 1 + d + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k + d + 1]
+        prev_y = prev_x - prev_k
+
+        while x > prev_x and y > prev_y:
+            edits.append("=")
+            x -= 1
+            y -= 1
+
+        if d > 0:
+            if x == prev_x:
+                edits.append("+")
+            else:
+                edits.append("-")
+        x = prev_x
+        y = prev_y
+
+    edits.reverse()
+    return edits
+
+def is_similar (line1, line2):
+    matcher = difflib.SequenceMatcher(None, line1, line2)
+    return matcher.real_quick_ratio() >= kSIMILAR_RATIO \
+        and matcher.quick_ratio() >= kSIMILAR_RATIO \
+        and matcher.ratio() >= kSIMILAR_RATIO
+
+def refine (removed, added, deadline=None):
+    """
+    Orders a block of <removed> lines replaced by <added> lines so that each
+    removed line is followed by the first added line similar to it. Lines
+    are kept in order on both sides. Once <deadline> is passed the lines
+    left are not matched anymore.
+    """
+
+    result = []
+    j = 0
+    for line in removed:
+        match = None
+        if deadline == None or time.time() <= deadline:
+            for k in xrange(j, len(added)):
+                if is_similar(line, added[k]):
+                    match = k
+                    break
+
+        if match == None:
+            result.append("- " + line)
+        else:
+            result.extend(["+ " + other for other in added[j:match]])
+            result.append("- " + line)
+            result.append("+ " + added[match])
+            j = match + 1
+    result.extend(["+ " + line for line in added[j:]])
+
+    return result
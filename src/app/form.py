@@ -11,50 +11,104 @@
 # License for more details.
 
 
-import datetime
 import hashlib
+import hmac
+from google.appengine.api import memcache
+import random
+import re
+import time
 
-import app
 import app.model
 import settings
 
 
-def delete_token(ip_address, stoken):
-    token = app.model.Form()
-    token.token = stoken
-    token.created_by_ip = ip_address
-
-    try:
-        token.delete()
-        result = True
-    except:
-        result = False
-
-    return result
-
-def has_valid_token(ip_address, token):
-    tokens = app.model.Form.all()
-    tokens.filter("token =", token)
-    tokens.filter("created_by_ip =", ip_address)
-    tokens.filter("expired_at >", datetime.datetime.now())
-    return tokens.get() != None
-
-def put_form_token(ip_address, token=""):
-    if token == "":
-        token = make_token()
-
-    ftoken = app.model.Form()
-    ftoken.token = token
-    ftoken.created_at = datetime.datetime.now()
-    ftoken.created_by_ip = ip_address
-    ftoken.expired_at = datetime.datetime.now() + settings.PASTE_FORM_EXPIRATION_DELTA
-    key = ftoken.put()
-    if key != "":
-        return token
-    else:
-        return ""
-
-def make_token():
-    hash = hashlib.sha256()
-    hash.update(datetime.datetime.now().strftime("%Y:%m:%d:%H:%M:BONOBO"))
-    return hash.hexdigest()
+# A form token is <timestamp>-<nonce>-<signature>: the time the form was
+# shown, a random number telling the forms apart, and an HMAC of both and of
+# the IP address the form was shown to. Checking a token reads nothing from
+# the datastore; memcache only remembers the tokens which were used.
+
+kSECRET_KEY_NAME = "form_token"
+
+# Tokens are made of ASCII digits and hexadecimal digits only, anything else
+# is rejected before it gets near the signature.
+kTOKEN = re.compile(r"^([0-9]{1,12})-([0-9a-f]{16})-([0-9a-f]{64})\Z")
+
+# The secret made and stored when FORM_TOKEN_SECRET is empty, once loaded.
+_secret = None
+
+
+def get_expiration_time ():
+    """
+    Gets how long a form token is valid (in seconds).
+    """
+
+    delta = settings.PASTE_FORM_EXPIRATION_DELTA
+    return delta.days * 24 * 60 * 60 + delta.seconds
+
+def get_secret ():
+    """
+    Gets the key the tokens are signed with: FORM_TOKEN_SECRET, or else a
+    random key made and stored the first time it is needed.
+    """
+
+    global _secret
+
+    if settings.FORM_TOKEN_SECRET:
+        return settings.FORM_TOKEN_SECRET
+
+    if _secret == None:
+        value = "%064x" % random.SystemRandom().getrandbits(256)
+        _secret = str(app.model.Secret.get_or_insert(kSECRET_KEY_NAME, value=value).value)
+    return _secret
+
+def has_valid_token (ip_address, token):
+    """
+    Tells whether <token> was made for <ip_address>, hasn't expired and
+    hasn't been used. A valid token is marked as used at once, with an
+    atomic memcache add, so that of several forms sent with the same token
+    at the same time, only one passes.
+    """
+
+    match = kTOKEN.match(token)
+    if match == None:
+        return False
+
+    timestamp, nonce, signature = [str(part) for part in match.groups()]
+    age = time.time() - int(timestamp)
+    if age < 0 or age > get_expiration_time():
+        return False
+
+    if not is_same_signature(sign(ip_address, timestamp, nonce), signature):
+        return False
+
+    if settings.FORM_TOKEN_ONE_TIME and not memcache.add("form/used/" + nonce, True, get_expiration_time()):
+        return False
+
+    return True
+
+def is_same_signature (signature1, signature2):
+    """
+    Compares two signatures in a time which doesn't tell how much of them
+    is the same.
+    """
+
+    if len(signature1) != len(signature2):
+        return False
+
+    difference = 0
+    for i in xrange(0, len(signature1)):
+        difference |= ord(signature1[i]) ^ ord(signature2[i])
+    return difference == 0
+
+def make_token (ip_address):
+    """
+    Makes the token of a form shown to <ip_address>.
+    """
+
+    timestamp = str(int(time.time()))
+    nonce = "%016x" % random.SystemRandom().getrandbits(64)
+    return timestamp + "-" + nonce + "-" + sign(ip_address, timestamp, nonce)
+
+def sign (ip_address, timestamp, nonce):
+    message = str(ip_address) + "/" + timestamp + "/" + nonce
+    return hmac.new(get_secret(), message, hashlib.sha256).hexdigest()
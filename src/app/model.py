@@ -11,7 +11,10 @@
 # License for more details.
 
 
+import calendar
 import cgi
+import datetime
+import google.appengine.api.datastore
 import google.appengine.api.users
 from google.appengine.ext import db
 import pygments.lexer
@@ -19,7 +22,9 @@ import random
 
 import app
 import app.user
+import app.util
 import settings
+import smoid
 import smoid.languages
 
 
@@ -28,26 +33,231 @@ kPASTE_STATUS_PRIVATE = 1
 kPASTE_STATUS_MODERATED = 2
 kPASTE_STATUS_WAITING_FOR_APPROVAL = 3
 
+# The version of the HTML stored in PasteBody.code_formatted. Pastes formatted
+# with another version are formatted again when viewed.
+kPASTE_FORMAT_VERSION = 1
+
+# The properties of PasteBody, which used to be stored with the paste.
+kPASTE_BODY_PROPERTIES = ("code", "code_colored", "code_formatted")
+
+# The thread path of a paste is the thread path of its parent followed by a
+# segment made from the time it was posted and its slug, so that sorting the
+# pastes of a thread by path lists each paste after its parent, and the forks
+# of a paste from the oldest to the newest. The slug tells apart the forks
+# posted in the same millisecond, whose subthreads would be mixed otherwise.
+# Segments have a fixed length: no segment is the start of another one. Threads deeper than kTHREAD_PATH_MAX_LENGTH
+# allows have their deepest forks listed among the forks of an ancestor.
+kTHREAD_PATH_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+kTHREAD_PATH_TIME_LENGTH = 8
+kTHREAD_PATH_SLUG_LENGTH = 9
+kTHREAD_PATH_SEGMENT_LENGTH = kTHREAD_PATH_TIME_LENGTH + kTHREAD_PATH_SLUG_LENGTH
+kTHREAD_PATH_MAX_LENGTH = 500
+
+
+def get_language_name (language):
+    name = language
+
+    if smoid.languages.languages.has_key(language) and smoid.languages.languages[language].has_key("name"):
+        name = smoid.languages.languages[language]["name"]
+
+    return name
+
+def get_paste_icon_url (status, language):
+    url = ""
+
+    if status == kPASTE_STATUS_PRIVATE:
+        url = app.image_url("silk/lock.png")
+    elif status == kPASTE_STATUS_MODERATED:
+        url = app.image_url("silk/flag_red.png")
+    elif status == kPASTE_STATUS_WAITING_FOR_APPROVAL:
+        url = app.image_url("silk/hourglass.png")
+    elif status == kPASTE_STATUS_PUBLIC:
+        if language and language in smoid.languages.languages:
+            url = app.image_url("languages/%s.png", language)
+        else:
+            url = app.image_url("silk/page_white_text.png")
+    return url
+
+def make_thread_path (parent_path, posted_at, slug):
+    """
+    Makes the thread path of the fork <slug> of the paste whose thread path
+    is <parent_path>, posted at <posted_at>.
+    """
+
+    ms = calendar.timegm(posted_at.utctimetuple()) * 1000 + posted_at.microsecond // 1000
+
+    segment = ""
+    base = len(kTHREAD_PATH_DIGITS)
+    for i in xrange(0, kTHREAD_PATH_TIME_LENGTH):
+        segment = kTHREAD_PATH_DIGITS[ms % base] + segment
+        ms //= base
+    # "-" sorts before the slug characters, so shorter slugs come first.
+    segment += str(slug)[:kTHREAD_PATH_SLUG_LENGTH].ljust(kTHREAD_PATH_SLUG_LENGTH, "-")
+
+    max_parent_length = kTHREAD_PATH_MAX_LENGTH - kTHREAD_PATH_SEGMENT_LENGTH
+    max_parent_length -= max_parent_length % kTHREAD_PATH_SEGMENT_LENGTH
+    return parent_path[:max_parent_length] + segment
+
+
+class CounterShard (db.Model):
+    """
+    A part of a counter (see app.counter), keyed by <counter name>/<index>.
+    """
+
+    name = db.StringProperty()
+    count = db.IntegerProperty(default=0)
+
 
 class Form (db.Model):
+    """
+    A paste form token, from before they were signed (see app.form). No
+    longer written.
+    """
+
     token           = db.StringProperty()
     created_at      = db.DateTimeProperty()
     created_by_ip   = db.StringProperty()
     expired_at      = db.DateTimeProperty()
 
 
+class PasteBody (db.Model):
+    """
+    The code of a paste, keyed by the slug of the paste, so that the pages
+    which only show what a paste is about don't load it. See Pasty.get_body().
+
+    The code, the colored code and the formatted code are stored compressed
+    by app.util.compress_text(), and only decompressed when read through
+    the code, code_colored and code_formatted attributes.
+    """
+
+    code_blob = db.BlobProperty()
+    code_colored_blob = db.BlobProperty()
+    code_formatted_blob = db.BlobProperty()
+
+    # The uncompressed code of the bodies put before it was compressed.
+    code_text = db.TextProperty(name="code")
+    code_colored_text = db.TextProperty(name="code_colored")
+    code_formatted_text = db.TextProperty(name="code_formatted")
+
+    # The texts decompressed so far, by name.
+    _texts = None
+
+    @staticmethod
+    def make_from_entity (slug, entity):
+        """
+        Makes the body of a paste stored before the code was split out of
+        Pasty, from the raw datastore entity of the paste.
+        """
+
+        body = PasteBody(key_name=slug)
+        for name in kPASTE_BODY_PROPERTIES:
+            if entity.get(name):
+                setattr(body, name, entity[name])
+        return body
+
+    def compress (self):
+        """
+        Compresses the code stored uncompressed.
+        """
+
+        for name in kPASTE_BODY_PROPERTIES:
+            self.set_text(name, self.get_text(name))
+
+    def get_text (self, name):
+        if self._texts == None:
+            self._texts = {}
+
+        if not name in self._texts:
+            blob = getattr(self, name + "_blob")
+            if blob:
+                text = app.util.decompress_text(blob)
+            else:
+                text = getattr(self, name + "_text") or u""
+            self._texts[name] = text
+        return self._texts[name]
+
+    def is_compressed (self):
+        """
+        Tells whether none of the code is stored uncompressed anymore.
+        """
+
+        for name in kPASTE_BODY_PROPERTIES:
+            if getattr(self, name + "_text") != None:
+                return False
+        return True
+
+    def set_text (self, name, text):
+        if self._texts == None:
+            self._texts = {}
+
+        self._texts[name] = text
+        setattr(self, name + "_blob", db.Blob(app.util.compress_text(text)))
+        setattr(self, name + "_text", None)
+
+    code = property(lambda self: self.get_text("code"),
+                    lambda self, text: self.set_text("code", text))
+    code_colored = property(lambda self: self.get_text("code_colored"),
+                            lambda self, text: self.set_text("code_colored", text))
+    code_formatted = property(lambda self: self.get_text("code_formatted"),
+                              lambda self, text: self.set_text("code_formatted", text))
+
+
+class BreakdownTally (db.Model):
+    """
+    The pastes of a month counted again by language and by user, a day at a
+    time, keyed by the month path. See app.stats.tally_breakdowns().
+    """
+
+    # The day to count next.
+    day = db.DateTimeProperty()
+    started_at = db.DateTimeProperty()
+    # The counts of the days counted so far, by path, in JSON.
+    totals = db.TextProperty(default="{}")
+
+
 class PasteCount (db.Model):
+    """
+    A shard of the count of the pastes posted in an hour, a day or a month,
+    or in a month with a given language or by a given user, keyed by its
+    path and its number. See app.stats.
+    """
+
+    breakdown = db.StringProperty()
     count = db.IntegerProperty(default=0)
     last_checked = db.DateTimeProperty()
+    month = db.StringProperty()
+    name = db.StringProperty()
     path = db.StringProperty()
 
 
 class PasteStats(db.Model):
+    """
+    The paste count before the paste counter was sharded. It is no longer
+    updated, app.counter adds it to the shards.
+    """
+
     paste_count = db.IntegerProperty()
     last_posted_at = db.DateTimeProperty(auto_now=True)
     last_edited_at = db.DateTimeProperty(auto_now=True)
 
 
+class Secret (db.Model):
+    """
+    A random key made the first time it is needed, see app.form.
+    """
+
+    value = db.StringProperty()
+
+
+class Status (db.Model):
+    """
+    The latest tweet shown on the pages, see app.twitter.
+    """
+
+    text = db.TextProperty(default="")
+    updated_at = db.DateTimeProperty()
+
+
 class User (db.Model):
     id = db.StringProperty()
     google_id = db.StringProperty()
@@ -61,12 +271,21 @@ class User (db.Model):
 
 
 class Pasty (db.Model):
+    # The slugs of the pastes this one was forked from, root first.
+    ancestors = db.StringListProperty()
     characters = db.IntegerProperty(default=0)
-    code = db.TextProperty(default="")
-    code_colored = db.TextProperty(default="")
+    format_version = db.IntegerProperty(default=0)
     forks = db.IntegerProperty(default=0)
     highlights = db.TextProperty(default="")
     indirect_forks = db.IntegerProperty(default=0)
+    is_colorized = db.BooleanProperty(default=True)
+    # Whether the paste is added to the paste counts (see app.stats) yet.
+    is_counted = db.BooleanProperty(default=True)
+    # Whether the fork counts of the ancestors include this paste yet.
+    is_fork_counted = db.BooleanProperty(default=True)
+    # The ancestors whose fork counts include this paste, while it is being
+    # counted or uncounted (see app.pasty.update_fork_counts()).
+    fork_counted_in = db.StringListProperty()
     is_moderated = db.BooleanProperty(default=False)
     language = db.StringProperty(choices=["ada", "html", "java", "lua", "perl", "php", "python", "python_console", "ruby", "scala", "sh", "sql", "xml"])
     lines = db.IntegerProperty(default=0)
@@ -78,20 +297,81 @@ class Pasty (db.Model):
     edited_by_user_name = db.StringProperty(default="")
     expired_at = db.DateTimeProperty()
     parent_paste = db.StringProperty(default="")
+    revision = db.IntegerProperty(default=0)
     secret_key = db.TextProperty(default="")
     slug = db.StringProperty(default="")
     snippet = db.TextProperty(default="")
     tags = db.TextProperty(default="")
     thread = db.StringProperty(default="")
     thread_level = db.IntegerProperty(default=0)
-    thread_position = db.IntegerProperty(default=0)
+    # Orders the pastes of a thread, see make_thread_path().
+    thread_path = db.StringProperty(default="")
     title = db.TextProperty(default="")
     status = db.IntegerProperty(default=0, choices=[kPASTE_STATUS_PUBLIC, kPASTE_STATUS_PRIVATE, kPASTE_STATUS_MODERATED, kPASTE_STATUS_WAITING_FOR_APPROVAL])
     user = db.ReferenceProperty(User)
 
+    # The PasteBody, once loaded by get_body().
+    _body = None
+    _is_body_changed = False
+
+    @staticmethod
+    def get_by_slug (slug):
+        """
+        Gets a paste given its slug, with a direct key get.
+        """
+
+        paste = None
+        if slug:
+            paste = Pasty.get_by_key_name(slug)
+            if paste == None:
+                paste = Pasty.get_legacy_by_slug(slug)
+        return paste
+
+    @staticmethod
+    def get_many_by_slugs (slugs):
+        """
+        Gets several pastes in a single datastore round-trip. The result is
+        ordered like <slugs>, with None for each slug that was not found.
+        """
+
+        pastes = []
+        if len(slugs) > 0:
+            pastes = Pasty.get_by_key_name(slugs)
+            for i, paste in enumerate(pastes):
+                if paste == None:
+                    pastes[i] = Pasty.get_legacy_by_slug(slugs[i])
+        return pastes
+
+    @staticmethod
+    def get_legacy_by_slug (slug):
+        """
+        Gets a paste which has not been rekeyed by its slug yet.
+        """
+
+        paste = None
+        if settings.PASTE_LEGACY_SLUG_LOOKUP:
+            qry_pastes = Pasty.all()
+            qry_pastes.filter("slug =", slug)
+            paste = qry_pastes.get()
+        return paste
+
+    @staticmethod
+    def load_bodies (pastes):
+        """
+        Loads the bodies of several pastes in a single datastore round-trip.
+        """
+
+        pastes = [paste for paste in pastes if paste._body == None and paste.is_saved()]
+        if len(pastes) > 0:
+            bodies = PasteBody.get_by_key_name([paste.slug for paste in pastes])
+            for i, body in enumerate(bodies):
+                if body != None:
+                    pastes[i]._body = body
+
     def _is_current_user_author_or_admin (self):
         cuser = app.user.get_current_user()
-        is_author = self.user and self.user.id == cuser.id
+        # Anonymous users aren't the author, no need to load the paste user.
+        is_author = cuser.is_logged_in and self.user and self.user.id == cuser.id
         return cuser.is_google_admin or is_author
 
     @staticmethod
@@ -149,6 +429,22 @@ class Pasty (db.Model):
 
         return highlights
 
+    def colorize (self):
+        """
+        Finds out the language of the code, highlights it and makes its
+        snippet. This is too slow for the submit request, so it is done by
+        the paste-colorize task queue.
+        """
+
+        raw_code, highlights = self.extract_highlights_from_code(self.get_body().code)
+
+        self.snippet = Pasty.make_snippet(raw_code, settings.PASTE_SNIPPET_MAX_LENGTH)
+        self.language = smoid.find_out_language(raw_code,
+            max_length=settings.PASTE_LANGUAGE_DETECTION_MAX_LENGTH,
+            max_time=settings.PASTE_LANGUAGE_DETECTION_MAX_TIME)
+        self.set_code_colored(self.syntax_highlight_code(raw_code, self.language))
+        self.is_colorized = True
+
     def extract_highlights_from_code (self, code):
         raw_code = ""
         highlights = []
@@ -163,38 +459,112 @@ class Pasty (db.Model):
 
         return raw_code, highlights
 
+    def get_ancestors (self):
+        """
+        Gets the slugs of the pastes this one was forked from, root first.
+        Forks made before they were stored with the paste have them found
+        by walking up the thread, up to an ancestor which has them.
+        """
+
+        ancestors = self.ancestors
+        if len(ancestors) == 0 and self.parent_paste:
+            ancestors = [self.parent_paste]
+            parent = Pasty.get_by_slug(self.parent_paste)
+            while parent != None and parent.parent_paste and not parent.parent_paste in ancestors:
+                if len(parent.ancestors) > 0:
+                    ancestors = parent.ancestors + ancestors
+                    break
+                ancestors.insert(0, parent.parent_paste)
+                parent = Pasty.get_by_slug(parent.parent_paste)
+        return ancestors
+
+    def get_body (self):
+        """
+        Gets the PasteBody holding the code, loading it on the first call.
+        The code of a paste that was not migrated yet is still stored with
+        the paste itself.
+        """
+
+        if self._body == None:
+            body = None
+            if self.is_saved():
+                body = PasteBody.get_by_key_name(self.slug)
+                if body == None:
+                    entity = google.appengine.api.datastore.Get(self.key())
+                    body = PasteBody.make_from_entity(self.slug, entity)
+            else:
+                body = PasteBody(key_name=self.slug)
+            self._body = body
+        return self._body
+
+    def get_changed_body (self):
+        """
+        Gets the PasteBody if the code was set since the paste was loaded,
+        None otherwise.
+        """
+
+        body = None
+        if self._is_body_changed:
+            body = self._body
+        return body
+
+    def get_counted_ancestors (self):
+        """
+        Gets the slugs of the ancestors whose fork counts include this paste.
+        Forks counted before the ancestors were recorded are counted in all
+        of them.
+        """
+
+        if self.is_fork_counted and len(self.fork_counted_in) == 0:
+            return self.get_ancestors()
+        return list(self.fork_counted_in)
+
+    def get_cache_key (self, name):
+        """
+        Makes a memcache key for something derived from the current revision
+        of the paste.
+        """
+
+        return "paste/" + self.slug + "/" + str(self.revision) + "/" + name
+
+    def get_formatted_code (self):
+        """
+        Gets the HTML code ready to be shown, a line break after each line.
+        It is made once the paste is colorized, pastes colorized before
+        that or with another format are formatted on the fly.
+        """
+
+        if self.is_colorized and self.format_version == kPASTE_FORMAT_VERSION:
+            return self.get_body().code_formatted
+        return app.util.format_code_lines(self.get_html_code())
+
+    def get_html_code (self):
+        """
+        Gets the code as HTML, plainly escaped if it is not colorized yet.
+        """
+
+        body = self.get_body()
+        if self.is_colorized:
+            html_code = body.code_colored
+        else:
+            raw_code, highlights = self.extract_highlights_from_code(body.code)
+            html_code = cgi.escape(raw_code)
+        return html_code
+
     def get_code (self):
         code = ""
         if self.status == kPASTE_STATUS_PUBLIC:
-            code = self.code
+            code = self.get_body().code
         return code
 
     def get_fork_url (self):
         return app.url("%s/fork", self.slug)
 
     def get_icon_url (self):
-        url = ""
-
-        if self.status == kPASTE_STATUS_PRIVATE:
-            url = app.image_url("silk/lock.png")
-        elif self.status == kPASTE_STATUS_MODERATED:
-            url = app.image_url("silk/flag_red.png")
-        elif self.status == kPASTE_STATUS_WAITING_FOR_APPROVAL:
-            url = app.image_url("silk/hourglass.png")
-        elif self.status == kPASTE_STATUS_PUBLIC:
-            if self.language and self.language in smoid.languages.languages:
-                url = app.image_url("languages/%s.png", self.language)
-            else:
-                url = app.image_url("silk/page_white_text.png")
-        return url
+        return get_paste_icon_url(self.status, self.language)
 
     def get_language_name (self):
-        lang = self.language
-
-        if smoid.languages.languages.has_key(lang) and smoid.languages.languages[lang].has_key("name"):
-            lang = smoid.languages.languages[lang]["name"]
-
-        return lang
+        return get_language_name(self.language)
 
     def get_language_url (self):
         lang = self.language
@@ -208,15 +578,16 @@ class Pasty (db.Model):
         return app.url("%s/moderate", self.slug)
 
     def get_parsed_highlights (self):
-        return Pasty.parse_highlights(self.highlights, self.code.count("\n"))
+        return Pasty.parse_highlights(self.highlights, self.lines)
 
     def get_private_url (self):
         return app.url("%s?key=%s", self.slug, self.secret_key)
 
     def get_raw_code (self):
+        code = self.get_body().code
         raw_code = ""
         if self.highlights:
-            lines = self.code.splitlines()
+            lines = code.splitlines()
             for i, line in enumerate(lines):
                 if line.startswith("@h@"):
                     raw_code += line[3:]
@@ -224,7 +595,7 @@ class Pasty (db.Model):
                     raw_code += line
                 raw_code += "\r\n"
         else:
-            raw_code = self.code
+            raw_code = code
 
         return raw_code
 
@@ -263,6 +634,9 @@ class Pasty (db.Model):
     def is_diffable (self):
         return self.status == kPASTE_STATUS_PUBLIC
 
+    def is_expired (self):
+        return self.expired_at != None and self.expired_at <= datetime.datetime.now()
+
     def is_forkable (self):
         return self.status == kPASTE_STATUS_PUBLIC
 
@@ -279,15 +653,37 @@ class Pasty (db.Model):
         return self.status == kPASTE_STATUS_WAITING_FOR_APPROVAL
 
     def set_code (self, code):
+        """
+        Sets the raw code. The language, the colored code and the snippet
+        are left to colorize().
+        """
+
         raw_code, highlights = self.extract_highlights_from_code(code)
 
-        self.code = code
+        body = self.get_body()
+        body.code = code
+        body.code_colored = ""
+        body.code_formatted = ""
+        self._is_body_changed = True
+
         self.highlights = ",".join([str(line) for line in highlights])
         self.characters = len(code)
-        self.snippet = Pasty.make_snippet(raw_code, settings.PASTE_SNIPPET_MAX_LENGTH)
-        self.language = smoid.GrandChecker().find_out_language(raw_code)
-        self.code_colored = self.syntax_highlight_code(raw_code, self.language)
         self.lines = raw_code.count("\n") + 1
+        self.snippet = ""
+        self.language = None
+        self.format_version = 0
+        self.is_colorized = False
+
+    def set_code_colored (self, code_colored):
+        """
+        Sets the colored code, and formats it as it will be shown.
+        """
+
+        body = self.get_body()
+        body.code_colored = code_colored
+        body.code_formatted = app.util.format_code_lines(code_colored)
+        self._is_body_changed = True
+        self.format_version = kPASTE_FORMAT_VERSION
 
     def syntax_highlight_code (self, code, language_name):
         result = ""
@@ -305,6 +701,92 @@ class Pasty (db.Model):
 
         return result
 
+class PasteSummary (db.Model):
+    """
+    What the paste listings and feeds show of a paste, keyed by the slug of
+    the paste, so that they don't load the paste itself. It is put along with the
+    paste by app.summaries.put().
+    """
+
+    characters = db.IntegerProperty(default=0)
+    edited_at = db.DateTimeProperty()
+    expired_at = db.DateTimeProperty()
+    forks = db.IntegerProperty(default=0)
+    gravatar_id = db.TextProperty(default="")
+    language = db.StringProperty()
+    lines = db.IntegerProperty(default=0)
+    posted_at = db.DateTimeProperty()
+    posted_by_user_name = db.StringProperty(default="")
+    slug = db.StringProperty(default="")
+    snippet = db.TextProperty(default="")
+    status = db.IntegerProperty(default=0)
+    title = db.TextProperty(default="")
+    user_id = db.StringProperty(default="")
+
+    @staticmethod
+    def make (paste):
+        summary = PasteSummary(key_name=paste.slug)
+        summary.characters = paste.characters
+        summary.edited_at = paste.edited_at
+        summary.expired_at = paste.expired_at
+        summary.forks = paste.forks
+        summary.language = paste.language
+        summary.lines = paste.lines
+        summary.posted_at = paste.posted_at
+        summary.posted_by_user_name = paste.posted_by_user_name
+        summary.slug = paste.slug
+        summary.snippet = paste.snippet
+        summary.status = paste.status
+        summary.title = paste.title
+        if paste.user:
+            summary.user_id = paste.user.id
+            summary.gravatar_id = paste.user.gravatar_id
+        return summary
+
+    def _is_current_user_author_or_admin (self):
+        cuser = app.user.get_current_user()
+        is_author = self.user_id != "" and self.user_id == cuser.id
+        return cuser.is_google_admin or is_author
+
+    def get_gravatar (self, size):
+        return "http://www.gravatar.com/avatar/" + self.gravatar_id + ".jpg?s=" + str(size)
+
+    def get_icon_url (self):
+        return get_paste_icon_url(self.status, self.language)
+
+    def get_language_name (self):
+        return get_language_name(self.language)
+
+    def get_snippet (self):
+        """
+        Gets the snippet if there is one and the status allows it.
+        """
+        snippet = ""
+        if self.snippet:
+            if self.status == kPASTE_STATUS_PUBLIC or self._is_current_user_author_or_admin():
+                snippet = self.snippet
+            elif self.status == kPASTE_STATUS_PRIVATE:
+                snippet = "[[ PRIVATE ]]"
+        return snippet
+
+    def get_title (self):
+        """
+        Gets the title if there is one and the status allows it.
+        """
+
+        title = self.slug
+        if self.title:
+            if self.status == kPASTE_STATUS_PUBLIC or self._is_current_user_author_or_admin():
+                title = self.title
+        return title
+
+    def get_url (self):
+        return app.url("%s", self.slug)
+
+    def is_expired (self):
+        return self.expired_at != None and self.expired_at <= datetime.datetime.now()
+
+
 class Log (db.Model):
    type = db.StringProperty(choices=["paste_add", "paste_fork", "user_register"])
    user = db.ReferenceProperty(User)
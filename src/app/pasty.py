@@ -10,8 +10,19 @@
 # or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
 # License for more details.
 
+from google.appengine.ext import db
 import random
 
+import app.model
+import app.summaries
+
+
+# The most entity groups a transaction may span, with the cross-group
+# transactions of the older runtimes: a fork and the ancestors whose fork
+# counts it updates.
+kTRANSACTION_MAX_GROUPS = 5
+
+
 def filter_title(title, default_value = ""):
     chars = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_:\\&()[]{}><*!?. "
     result = "" + "".join([ c for c in title if c in chars ])
@@ -20,6 +31,101 @@ def filter_title(title, default_value = ""):
     result = result.strip()
     return result
 
+def colorize (key):
+    """
+    Colors the code of the paste of <key>, unless it was colorized already,
+    and stores it along with its summary and body in a single cross-group
+    transaction, so that a task run twice doesn't color it twice. Returns
+    the paste.
+    """
+
+    def colorize_in_transaction ():
+        paste = db.get(key)
+        if paste != None and not paste.is_colorized:
+            paste.colorize()
+            app.summaries.put([paste])
+        return paste
+
+    options = db.create_transaction_options(xg=True)
+    return db.run_in_transaction_options(options, colorize_in_transaction)
+
+def count_fork (fork):
+    """
+    Adds <fork> to the fork counts of the pastes it comes from: the forks
+    of its parent, the indirect forks of every ancestor. Returns the
+    ancestors whose counts changed.
+    """
+
+    return update_fork_counts(fork, 1)
+
+def uncount_fork (fork):
+    """
+    Takes <fork> out of the fork counts of the ancestors which include it.
+    Returns the ancestors whose counts changed.
+    """
+
+    return update_fork_counts(fork, -1)
+
+def update_fork_counts (fork, delta):
+    """
+    Adds <delta> to the fork counts of the ancestors of <fork>, never below
+    0. The ancestors are updated a few at a time, each time in a single
+    cross-group transaction with the fork, which records in fork_counted_in
+    which ancestors include it: a task retried halfway carries on where it
+    stopped, and never counts a fork twice. Once all the ancestors are done,
+    the fork is marked as counted, or as not counted. Returns the ancestors
+    whose counts changed.
+    """
+
+    if delta > 0:
+        slugs = fork.get_ancestors()
+    else:
+        slugs = fork.get_counted_ancestors()
+    keys = [ancestor.key() for ancestor in app.model.Pasty.get_many_by_slugs(slugs) if ancestor != None]
+
+    options = db.create_transaction_options(xg=True)
+    size = kTRANSACTION_MAX_GROUPS - 1
+    updated = []
+    # The fork is marked in the last transaction, even with no ancestor.
+    for i in xrange(0, max(len(keys), 1), size):
+        is_last = i + size >= len(keys)
+        updated.extend(db.run_in_transaction_options(options, update_fork_counts_of,
+                                                     fork.key(), keys[i:i + size], delta, is_last))
+    return updated
+
+def update_fork_counts_of (fork_key, ancestor_keys, delta, is_last):
+    """
+    Adds <delta> to the fork counts of the ancestors of <ancestor_keys> which
+    don't include the fork of <fork_key> yet (or which do, to take it out),
+    with one batch get and one put. Meant to be run in a transaction.
+    """
+
+    entities = db.get([fork_key] + ancestor_keys)
+    fork = entities[0]
+    if fork == None:
+        return []
+
+    counted = fork.get_counted_ancestors()
+    updated = []
+    for ancestor in entities[1:]:
+        if ancestor == None or (ancestor.slug in counted) == (delta > 0):
+            continue
+
+        if ancestor.slug == fork.parent_paste:
+            ancestor.forks = max((ancestor.forks or 0) + delta, 0)
+        ancestor.indirect_forks = max((ancestor.indirect_forks or 0) + delta, 0)
+        if delta > 0:
+            counted.append(ancestor.slug)
+        else:
+            counted.remove(ancestor.slug)
+        updated.append(ancestor)
+
+    fork.fork_counted_in = counted
+    if is_last:
+        fork.is_fork_counted = delta > 0
+    db.put(updated + [fork])
+    return updated
+
 def filter_user_name(name):
     chars = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.@ "
     result = "" + "".join([ c for c in name if c in chars ])
@@ -35,7 +141,14 @@ def make_slug(length):
     return slug
 
 def make_unique_slug(length):
-    return make_slug(length)
+    """
+    Makes a slug which is not already the key of a paste.
+    """
+
+    slug = make_slug(length)
+    while app.model.Pasty.get_by_key_name(slug) != None:
+        slug = make_slug(length)
+    return slug
 
 def validate_code(code):
     result = True
@@ -0,0 +1,489 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+import calendar
+import datetime
+from django.utils import simplejson
+from google.appengine.api import memcache
+from google.appengine.api.labs.taskqueue import Task
+from google.appengine.ext import db
+import random
+
+import app.model
+import settings
+
+
+# The paste counts of an hour, a day and a month, and of a month broken
+# down by language and by user (see app.model.PasteCount) are keyed by their
+# path. Like the counters of app.counter, the counts are split into shards,
+# so that the pastes of a month don't all update the same entities: shard n
+# of the counts of a month all belong to the entity group of shard n of the
+# month count. A paste is added to the counts of a shard picked at random,
+# and marked as counted, in a transaction over two entity groups only.
+
+kUNITS = ("hour", "day", "month")
+
+kBREAKDOWN_LANGUAGE = "language"
+kBREAKDOWN_USER = "user"
+
+
+def get_hour_path (at):
+    return "hour/%d/%d/%d.%d" % (at.year, at.month, at.day, at.hour)
+
+def get_day_path (at):
+    return "day/%d/%d/%d" % (at.year, at.month, at.day)
+
+def get_month_path (at):
+    return "month/%d/%d" % (at.year, at.month)
+
+def get_breakdown_path (at, breakdown, name):
+    """
+    Gets the path of the count of the pastes of the month of <at> whose
+    <breakdown> (language, user) is <name>.
+    """
+
+    return get_month_path(at) + "/" + breakdown + "/" + name
+
+def get_path (at, unit):
+    if unit == "hour":
+        return get_hour_path(at)
+    elif unit == "day":
+        return get_day_path(at)
+    return get_month_path(at)
+
+def get_paths (at):
+    """
+    Gets the paths of the hour, the day and the month of <at>.
+    """
+
+    return [get_hour_path(at), get_day_path(at), get_month_path(at)]
+
+def get_paste_paths (paste):
+    """
+    Gets the paths of all the counts a paste is added to. Pastes are broken
+    down by the key of their user, not by the name they were posted under,
+    which anyone can type. Anonymous pastes have no user count.
+    """
+
+    paths = get_paths(paste.posted_at)
+    paths.append(get_breakdown_path(paste.posted_at, kBREAKDOWN_LANGUAGE, paste.language or ""))
+
+    user_key = app.model.Pasty.user.get_value_for_datastore(paste)
+    if user_key != None:
+        paths.append(get_breakdown_path(paste.posted_at, kBREAKDOWN_USER, str(user_key)))
+    return paths
+
+def get_shard_key (path, shard):
+    """
+    Gets the datastore key of shard <shard> of the count of <path>, in the
+    entity group of the same shard of the count of its month.
+    """
+
+    month_path = "/".join(["month"] + path.split("/")[1:3])
+    month_key = db.Key.from_path("PasteCount", month_path + "#" + str(shard))
+    if path == month_path:
+        return month_key
+    return db.Key.from_path("PasteCount", path, parent=month_key)
+
+def get_shard_keys (path):
+    return [get_shard_key(path, i) for i in xrange(0, settings.STATS_SHARD_COUNT)]
+
+def get_counts (paths):
+    """
+    Adds up the shards of the counts of several paths, with a single batch
+    get. Returns the counts in the order of <paths>.
+    """
+
+    keys = []
+    for path in paths:
+        keys.extend(get_shard_keys(path))
+
+    totals = {}
+    for shard in app.model.PasteCount.get(keys):
+        if shard != None:
+            totals[shard.path] = totals.get(shard.path, 0) + shard.count
+    return [totals.get(path, 0) for path in paths]
+
+def make_count (path, shard):
+    key = get_shard_key(path, shard)
+    count = app.model.PasteCount(key_name=key.name(), parent=key.parent(), path=path)
+
+    parts = path.split("/")
+    if len(parts) > 4:
+        count.month = "/".join(parts[:3])
+        count.breakdown = parts[3]
+        count.name = "/".join(parts[4:])
+    return count
+
+def run_in_transaction (function, *args):
+    """
+    Runs <function> in a transaction which may span several entity groups,
+    STATS_SHARD_COUNT at most.
+    """
+
+    options = db.create_transaction_options(xg=True)
+    return db.run_in_transaction_options(options, function, *args)
+
+def add_paste (key):
+    """
+    Adds the paste of <key> to the counts of its hour, its day and its
+    month, and of its language and its user in that month, unless it is
+    counted already. The paste is loaded again and marked as counted in the
+    same transaction, so that a task retried doesn't count it twice and
+    that no other change to it is lost. Returns whether it was counted.
+    """
+
+    shard = random.randrange(settings.STATS_SHARD_COUNT)
+
+    def add ():
+        paste = app.model.Pasty.get(key)
+        if paste == None or paste.is_counted:
+            return False
+
+        paths = get_paste_paths(paste)
+        counts = app.model.PasteCount.get([get_shard_key(path, shard) for path in paths])
+        now = datetime.datetime.now()
+        for i, count in enumerate(counts):
+            if count == None:
+                counts[i] = count = make_count(paths[i], shard)
+            count.count += 1
+            count.last_checked = now
+
+        paste.is_counted = True
+        db.put(counts + [paste])
+        return True
+
+    return run_in_transaction(add)
+
+def set_count (path, total):
+    """
+    Sets the count of <path> to <total>, by changing its first shard.
+    """
+
+    keys = get_shard_keys(path)
+
+    def fix ():
+        shards = app.model.PasteCount.get(keys)
+        first = shards[0]
+        if first == None:
+            first = make_count(path, 0)
+        first.count += total - sum([shard.count for shard in shards if shard != None])
+        first.last_checked = datetime.datetime.now()
+        first.put()
+
+    run_in_transaction(fix)
+
+def count_pastes (start, end):
+    """
+    Counts the pastes posted from <start> to <end> (excluded), in the
+    datastore.
+    """
+
+    qry = app.model.Pasty.all(keys_only=True)
+    qry.filter("posted_at >=", start)
+    qry.filter("posted_at <", end)
+    return qry.count()
+
+def get_uncounted_hours (start, end):
+    """
+    Gets the hour paths of the pastes posted from <start> to <end>
+    (excluded) which are not added to the paste counts yet.
+    """
+
+    qry = app.model.Pasty.all()
+    qry.filter("is_counted =", False)
+    qry.filter("posted_at >=", start)
+    qry.filter("posted_at <", end)
+
+    paths = []
+    for paste in qry:
+        path = get_hour_path(paste.posted_at)
+        if not path in paths:
+            paths.append(path)
+    return paths
+
+def reconcile_day (day):
+    """
+    Counts the pastes of <day>, a date, again and fixes the counts of its
+    hours, of itself and of its month, in case they drifted away (a task
+    failing halfway, a paste deleted). The hours with pastes whose recount
+    task hasn't run yet are left as they are: the task would add those
+    pastes a second time.
+    """
+
+    start = datetime.datetime(day.year, day.month, day.day)
+    end = start + datetime.timedelta(days=1)
+    hour = datetime.timedelta(hours=1)
+    hour_paths = [get_hour_path(start + hour * i) for i in xrange(0, 24)]
+    uncounted_paths = get_uncounted_hours(start, end)
+
+    days_in_month = calendar.monthrange(day.year, day.month)[1]
+    day_paths = [get_day_path(datetime.date(day.year, day.month, d)) for d in xrange(1, days_in_month + 1)]
+    day_path = get_day_path(day)
+
+    counts = get_counts(hour_paths + day_paths)
+    hour_counts = counts[:len(hour_paths)]
+    for i, path in enumerate(hour_paths):
+        if not path in uncounted_paths:
+            hour_count = count_pastes(start + hour * i, start + hour * (i + 1))
+            if hour_count != hour_counts[i]:
+                set_count(path, hour_count)
+                hour_counts[i] = hour_count
+    day_count = sum(hour_counts)
+
+    day_counts = counts[len(hour_paths):]
+    month_count = day_count - day_counts[day_paths.index(day_path)] + sum(day_counts)
+    set_count(day_path, day_count)
+    set_count(get_month_path(day), month_count)
+
+    return day_count
+
+def start_breakdowns (month):
+    """
+    Starts counting the pastes of the month starting at <month> again by
+    language and by user, unless it is being done already. Returns the day
+    to count first, or None.
+    """
+
+    month_path = get_month_path(month)
+    now = datetime.datetime.now()
+
+    def start ():
+        tally = app.model.BreakdownTally.get_by_key_name(month_path)
+        # A tally left behind by a chain of tasks which broke is started over.
+        if tally != None and now - tally.started_at < datetime.timedelta(days=1):
+            return None
+
+        tally = app.model.BreakdownTally(key_name=month_path, started_at=now, totals="{}")
+        tally.day = truncate(month, "month")
+        tally.put()
+        return tally.day
+
+    return db.run_in_transaction(start)
+
+def queue_tally (month, day):
+    """
+    Queues the task which tallies <day> for the month starting at <month>.
+    """
+
+    params = {"month": month.strftime("%Y-%m"), "day": day.strftime("%Y-%m-%d")}
+    task = Task(method="GET", url="/tasks/reconcile-breakdowns", params=params)
+    task.add()
+
+def get_uncounted_keys (start, end):
+    qry = app.model.Pasty.all(keys_only=True)
+    qry.filter("is_counted =", False)
+    qry.filter("posted_at >=", start)
+    qry.filter("posted_at <", end)
+    return [str(key) for key in qry]
+
+def tally_breakdowns (month, day):
+    """
+    Counts the pastes of <day> by language and by user, and adds them to
+    the tally of the month starting at <month>. The pastes are paged through
+    with a cursor, and only the properties the counts use are fetched; the
+    pastes not counted yet are left to their recount task. A day which was
+    tallied already, by a task run twice, is skipped. Returns the next day
+    to count, or None if the month is over or <day> was skipped.
+    """
+
+    month_path = get_month_path(month)
+    tally = app.model.BreakdownTally.get_by_key_name(month_path)
+    if tally == None or tally.day != day:
+        return None
+
+    end = day + datetime.timedelta(days=1)
+    uncounted_keys = get_uncounted_keys(day, end)
+
+    totals = {}
+    qry = db.Query(app.model.Pasty, projection=("posted_at", "language", "user"))
+    qry.filter("posted_at >=", day)
+    qry.filter("posted_at <", end)
+    cursor = None
+    while True:
+        if cursor != None:
+            qry.with_cursor(cursor)
+        pastes = qry.fetch(settings.STATS_RECONCILE_BATCH_SIZE)
+        for paste in pastes:
+            if not str(paste.key()) in uncounted_keys:
+                for path in get_paste_paths(paste)[len(kUNITS):]:
+                    totals[path] = totals.get(path, 0) + 1
+        if len(pastes) < settings.STATS_RECONCILE_BATCH_SIZE:
+            break
+        cursor = qry.cursor()
+
+    def add ():
+        tally = app.model.BreakdownTally.get_by_key_name(month_path)
+        if tally == None or tally.day != day:
+            return False
+
+        month_totals = simplejson.loads(tally.totals)
+        for path, count in totals.items():
+            month_totals[path] = month_totals.get(path, 0) + count
+        tally.totals = simplejson.dumps(month_totals)
+        tally.day = end
+        tally.put()
+        return True
+
+    if not db.run_in_transaction(add) or end.month != day.month:
+        return None
+    return end
+
+def fix_breakdowns (month):
+    """
+    Fixes the language and user counts of the month starting at <month>
+    which differ from its tally, once all its days are counted, and deletes
+    the tally. Returns how many counts were fixed, or None if the tally
+    isn't over.
+    """
+
+    tally = app.model.BreakdownTally.get_by_key_name(get_month_path(month))
+    if tally == None or tally.day.month == month.month:
+        return None
+
+    actual = simplejson.loads(tally.totals)
+
+    stored = {}
+    qry = app.model.PasteCount.all()
+    qry.filter("month =", get_month_path(month))
+    for count in qry:
+        stored[count.path] = stored.get(count.path, 0) + count.count
+
+    fixed = 0
+    for path in set(actual.keys()) | set(stored.keys()):
+        if actual.get(path, 0) != stored.get(path, 0):
+            set_count(path, actual.get(path, 0))
+            fixed += 1
+
+    tally.delete()
+    return fixed
+
+def get_user_names (pairs):
+    """
+    Turns the (user key, count) pairs of a user breakdown into (user id,
+    count) pairs, with a single batch get. Users who are gone are left out.
+    """
+
+    keys = []
+    for name, count in pairs:
+        try:
+            keys.append((db.Key(name), count))
+        except (db.BadArgumentError, db.BadKeyError):
+            pass
+
+    named_pairs = []
+    users = app.model.User.get([key for key, count in keys])
+    for i, user in enumerate(users):
+        if user != None and user.id:
+            named_pairs.append((user.id, keys[i][1]))
+    return named_pairs
+
+def truncate (at, unit):
+    """
+    Gets the start of the hour, day or month of <at>.
+    """
+
+    if unit == "hour":
+        return datetime.datetime(at.year, at.month, at.day, at.hour)
+    elif unit == "day":
+        return datetime.datetime(at.year, at.month, at.day)
+    return datetime.datetime(at.year, at.month, 1)
+
+def get_previous (at, unit):
+    """
+    Gets the start of the hour, day or month before the one starting at
+    <at>.
+    """
+
+    if unit == "hour":
+        return at - datetime.timedelta(hours=1)
+    elif unit == "day":
+        return at - datetime.timedelta(days=1)
+    elif at.month == 1:
+        return datetime.datetime(at.year - 1, 12, 1)
+    return datetime.datetime(at.year, at.month - 1, 1)
+
+def get_periods (unit, start, end):
+    """
+    Gets the starts of the hours, days or months from <start> to <end>
+    (included), the last STATS_MAX_POINTS of them. Without <start>, the
+    last STATS_DEFAULT_POINTS up to <end> are returned.
+    """
+
+    max_count = settings.STATS_MAX_POINTS
+    if start == None:
+        max_count = settings.STATS_DEFAULT_POINTS
+    else:
+        start = truncate(start, unit)
+
+    periods = []
+    at = truncate(end, unit)
+    while len(periods) < max_count and (start == None or at >= start):
+        periods.insert(0, at)
+        at = get_previous(at, unit)
+    return periods
+
+def get_breakdown (month, breakdown):
+    """
+    Gets the largest counts of the month starting at <month> broken down by
+    <breakdown>, as (name, count) pairs. The shards of the counts are all
+    fetched and added up.
+    """
+
+    qry = app.model.PasteCount.all()
+    qry.filter("month =", get_month_path(month))
+    qry.filter("breakdown =", breakdown)
+
+    totals = {}
+    for count in qry:
+        totals[count.name] = totals.get(count.name, 0) + count.count
+
+    pairs = [(name, count) for name, count in totals.items() if count > 0]
+    pairs.sort(key=lambda pair: pair[1], reverse=True)
+    return pairs[:settings.STATS_BREAKDOWN_LENGTH]
+
+def get_report (unit, start, end):
+    """
+    Gets the paste counts of the hours, days or months from <start> to <end>,
+    and the counts of the last months of the range by language and by user,
+    from memcache when possible. <start> may be None. The report is made of
+    a few batch gets and queries of small entities, never of pastes.
+    """
+
+    periods = get_periods(unit, start, end)
+    key = "stats/" + unit + "/" + periods[0].isoformat() + "/" + periods[-1].isoformat()
+
+    report = memcache.get(key)
+    if report == None:
+        series = []
+        counts = get_counts([get_path(at, unit) for at in periods])
+        for i, count in enumerate(counts):
+            series.append({"start": periods[i].isoformat(), "path": get_path(periods[i], unit), "count": count})
+
+        months = []
+        for at in periods:
+            month = truncate(at, "month")
+            if not month in months:
+                months.append(month)
+
+        breakdowns = []
+        for month in months[-settings.STATS_BREAKDOWN_MONTHS:]:
+            breakdowns.append({"month": get_month_path(month),
+                               "languages": get_breakdown(month, kBREAKDOWN_LANGUAGE),
+                               "users": get_user_names(get_breakdown(month, kBREAKDOWN_USER))})
+
+        report = {"unit": unit, "series": series, "months": breakdowns}
+        memcache.set(key, report, settings.STATS_CACHE_TIME)
+    return report
@@ -0,0 +1,76 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+from google.appengine.api import memcache
+from google.appengine.ext import db
+
+import app.model
+import settings
+
+
+def get_recent (count):
+    """
+    Gets the summaries of the latest pastes, at most PASTE_RECENT_LENGTH.
+    """
+
+    return get_unexpired(get_cached_list("summaries/recent", "-posted_at"))[:count]
+
+def get_recently_edited (count):
+    """
+    Gets the summaries of the latest edited pastes, at most
+    PASTE_RECENT_LENGTH.
+    """
+
+    return get_unexpired(get_cached_list("summaries/edited", "-edited_at"))[:count]
+
+def get_cached_list (key, order):
+    summaries = memcache.get(key)
+    if summaries == None:
+        qry = app.model.PasteSummary.all()
+        qry.order(order)
+        summaries = qry.fetch(settings.PASTE_RECENT_LENGTH)
+        memcache.set(key, summaries, settings.PASTE_RECENT_CACHE_TIME)
+    return summaries
+
+def get_unexpired (summaries):
+    """
+    Leaves out the summaries of the pastes which expired but were not
+    deleted yet.
+    """
+
+    return [summary for summary in summaries if not summary.is_expired()]
+
+def put_summaries (pastes):
+    """
+    Puts the summaries of pastes which were put on their own, in a
+    transaction, and forgets the cached lists of summaries.
+    """
+
+    if len(pastes) > 0:
+        db.put([app.model.PasteSummary.make(paste) for paste in pastes])
+        memcache.delete_multi(["summaries/recent", "summaries/edited"])
+
+def put (pastes):
+    """
+    Puts pastes along with their summaries and the bodies whose code was
+    set, in a single datastore call, and forgets the cached lists of
+    summaries. Returns the keys of the pastes.
+    """
+
+    summaries = [app.model.PasteSummary.make(paste) for paste in pastes]
+    bodies = [paste.get_changed_body() for paste in pastes]
+    bodies = [body for body in bodies if body != None]
+    keys = db.put(list(pastes) + summaries + bodies)
+    memcache.delete_multi(["summaries/recent", "summaries/edited"])
+    return keys[:len(pastes)]
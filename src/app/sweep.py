@@ -0,0 +1,134 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+import datetime
+from google.appengine.api import memcache
+from google.appengine.ext import db
+
+import app.cache
+import app.model
+import app.pasty
+import app.summaries
+import settings
+
+
+# Garbage is deleted by the /tasks/sweep task, a batch of keys at a time,
+# never while serving a page. Each sweep_* function deletes one batch and
+# returns how many entities it deleted and the cursor to carry on from, or
+# None when there is nothing left. A cursor only works with the very query
+# it came from, so what expired is found by comparing to <until>, the time
+# the sweep started, rather than to the current time.
+
+kKINDS = ("forms", "paste_counts", "pastes")
+
+# Expiry dates are compared to this one as well, so that the pastes that
+# never expire (with no expiry date) are left out of the query.
+kEPOCH = datetime.datetime(1970, 1, 1)
+
+
+def fetch_batch (qry, cursor):
+    """
+    Fetches a batch of results from <qry>, from <cursor> on. Returns the
+    results and the cursor after them, or None if the query is over.
+    """
+
+    if cursor:
+        qry.with_cursor(cursor)
+    keys = qry.fetch(settings.SWEEP_BATCH_SIZE)
+
+    next_cursor = None
+    if len(keys) == settings.SWEEP_BATCH_SIZE:
+        next_cursor = qry.cursor()
+    return keys, next_cursor
+
+def sweep (kind, cursor, until):
+    if kind == "forms":
+        return sweep_forms(cursor, until)
+    elif kind == "paste_counts":
+        return sweep_paste_counts(cursor)
+    return sweep_pastes(cursor, until)
+
+def sweep_forms (cursor, until):
+    """
+    Deletes the paste form tokens expired before <until>, stored before
+    they were signed.
+    """
+
+    qry = app.model.Form.all(keys_only=True)
+    qry.filter("expired_at <", until)
+    keys, cursor = fetch_batch(qry, cursor)
+    db.delete(keys)
+    return len(keys), cursor
+
+def sweep_paste_counts (cursor):
+    """
+    Deletes the paste counts stored before they were keyed by their path.
+    Their keys have an id rather than a name, and come first in key order.
+    """
+
+    qry = app.model.PasteCount.all(keys_only=True)
+    qry.order("__key__")
+    keys, cursor = fetch_batch(qry, cursor)
+
+    orphans = [key for key in keys if key.id() != None]
+    if len(orphans) < len(keys):
+        cursor = None
+    db.delete(orphans)
+    return len(orphans), cursor
+
+def sweep_pastes (cursor, until):
+    """
+    Deletes the pastes expired before <until>, with their body and their
+    summary, and takes the counted forks among them out of the fork counts
+    of the pastes they were forked from.
+    """
+
+    qry = app.model.Pasty.all()
+    qry.filter("expired_at >", kEPOCH)
+    qry.filter("expired_at <", until)
+    pastes, cursor = fetch_batch(qry, cursor)
+
+    uncount_forks(pastes)
+
+    keys = []
+    threads = set()
+    for paste in pastes:
+        keys.append(paste.key())
+        if paste.slug:
+            keys.append(db.Key.from_path("PasteBody", paste.slug))
+            keys.append(db.Key.from_path("PasteSummary", paste.slug))
+        if paste.thread:
+            threads.add(paste.thread)
+
+    db.delete(keys)
+    if len(pastes) > 0:
+        memcache.delete_multi(["summaries/recent", "summaries/edited"])
+        app.cache.next_generation("summaries")
+    for thread in threads:
+        app.cache.next_generation("thread/" + thread)
+    return len(pastes), cursor
+
+def uncount_forks (pastes):
+    """
+    Takes the counted forks among <pastes> out of the fork counts of their
+    ancestors. Each fork records the ancestors it was taken out of in the
+    same transactions, so that a task retried after failing to delete it
+    doesn't take it out twice.
+    """
+
+    changed = []
+    for paste in pastes:
+        if paste.parent_paste and len(paste.get_counted_ancestors()) > 0:
+            changed.extend(app.pasty.uncount_fork(paste))
+    app.summaries.put_summaries(changed)
@@ -14,45 +14,56 @@ import cgi
 import pygments.formatter
 from pygments.token import Token
 
-class HtmlFormatter (pygments.formatter.Formatter):
 
-    def _format_value(self, value, css_class):
-        result = ""
-        if value.find("\n") != -1:
-            lines = value.splitlines()
-            for line in lines:
-                result += "<span class=\"" + css_class + "\">" + cgi.escape(line) + "</span>\n"
-        else:
-            result = "<span class=\"" + css_class + "\">" + cgi.escape(value) + "</span>"
-        return result
+# The CSS class of the tokens, the first type a token is a subtype of
+# giving its class.
+CSS_CLASSES = (
+    (Token.Keyword, "kw"),
+    (Token.Comment, "cmt"),
+    (Token.String.Doc, "doc"),
+    (Token.Name.Builtin, "bui"),
+    (Token.Literal.String, "str"),
+    (Token.Number, "nb"),
+    (Token.Name.Tag, "tag")
+)
 
-    def format (self, tokens, outfile):
-        result = ""
+# The CSS class of every token type met so far, None for plain text.
+css_classes_by_type = {}
 
-        for token in tokens:
 
-            if token[0] in Token.Keyword:
-                result += self._format_value(token[1], "kw")
+def get_css_class (token_type):
+    if token_type in css_classes_by_type:
+        return css_classes_by_type[token_type]
 
-            elif token[0] in Token.Comment:
-                result += self._format_value(token[1], "cmt")
+    css_class = None
+    for parent_type, parent_css_class in CSS_CLASSES:
+        if token_type in parent_type:
+            css_class = parent_css_class
+            break
 
-            elif token[0] in Token.String.Doc:
-                result += self._format_value(token[1], "doc")
+    css_classes_by_type[token_type] = css_class
+    return css_class
 
-            elif token[0] in Token.Name.Builtin:
-                result += self._format_value(token[1], "bui")
 
-            elif token[0] in Token.Literal.String:
-                result += self._format_value(token[1], "str")
+class HtmlFormatter (pygments.formatter.Formatter):
+    """
+    Writes the tokens to the output as they come, each in a span of its
+    CSS class. Multiline tokens get a span per line.
+    """
 
-            elif token[0] in Token.Number:
-                result += self._format_value(token[1], "nb")
+    def format (self, tokens, outfile):
+        write = outfile.write
 
-            elif token[0] in Token.Name.Tag:
-                result += self._format_value(token[1], "tag")
+        for token_type, value in tokens:
+            css_class = get_css_class(token_type)
 
-            else:
-                result += cgi.escape(token[1])
+            if css_class == None:
+                write(cgi.escape(value))
+
+            elif value.find("\n") != -1:
+                start = "<span class=\"" + css_class + "\">"
+                for line in value.splitlines():
+                    write(start + cgi.escape(line) + "</span>\n")
 
-        outfile.write(result)
+            else:
+                write("<span class=\"" + css_class + "\">" + cgi.escape(value) + "</span>")
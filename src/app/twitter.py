@@ -0,0 +1,92 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+import datetime
+from google.appengine.api import memcache
+from google.appengine.api.labs import taskqueue
+import time
+
+import app.model
+import settings
+
+
+# The latest tweet is fetched by the /tasks/refresh-twitter task, never while
+# serving a page. Pages show the stored tweet, even when it is getting old,
+# and queue a refresh when it is.
+
+kSTATUS_KEY_NAME = "twitter"
+
+
+def get_latest_tweet ():
+    """
+    Gets the latest tweet of TWITTER_ACCOUNT, from memcache or else from the
+    datastore, or None if it was never fetched.
+    """
+
+    status = memcache.get("twitter/latest")
+    if status == None:
+        status = app.model.Status.get_by_key_name(kSTATUS_KEY_NAME)
+        if status != None:
+            memcache.set("twitter/latest", status)
+
+    if status == None or is_stale(status):
+        queue_refresh()
+
+    tweet = None
+    if status != None:
+        tweet = status.text
+    return tweet
+
+def is_stale (status):
+    age = datetime.datetime.now() - status.updated_at
+    return age > datetime.timedelta(seconds=settings.TWITTER_UPDATE_FREQUENCY)
+
+def queue_refresh ():
+    """
+    Queues a refresh of the latest tweet. The task is named after the
+    update period, so that it is queued once per period however many pages
+    find the tweet stale. The period is remembered in memcache, so that
+    those pages don't all try to queue it again, even when the refresh
+    keeps failing.
+    """
+
+    period = int(time.time()) // settings.TWITTER_UPDATE_FREQUENCY
+    if not memcache.add("twitter/queued/" + str(period), True, settings.TWITTER_UPDATE_FREQUENCY):
+        return
+
+    try:
+        task = taskqueue.Task(name="twitter-" + str(period), method="GET", url="/tasks/refresh-twitter")
+        task.add()
+    except (taskqueue.TaskAlreadyExistsError, taskqueue.TombstonedTaskError):
+        pass
+
+def refresh ():
+    """
+    Fetches the latest tweet, and stores it in the datastore and in
+    memcache. Returns the tweet, or None if there was none.
+    """
+
+    import feedparser
+
+    feed = feedparser.parse("http://twitter.com/statuses/user_timeline/" + settings.TWITTER_ACCOUNT + ".rss")
+    if len(feed.entries) == 0:
+        return None
+
+    status = app.model.Status(key_name=kSTATUS_KEY_NAME)
+    status.text = feed.entries[0].description[len(settings.TWITTER_ACCOUNT) + 2:]
+    status.updated_at = datetime.datetime.now()
+    status.put()
+    memcache.set("twitter/latest", status)
+    return status.text
@@ -11,14 +11,37 @@
 # License for more details.
 
 
+
+from google.appengine.api import memcache
 from google.appengine.api import users
 import hashlib
+import threading
 
 import app
 import app.model
+import settings
+
+
+# Cached for the Google accounts which didn't sign up.
+kNOT_REGISTERED = ""
+
+# The user of the current request.
+_request = threading.local()
 
 
 class User:
+    def __init__ (self):
+        self.db_user = None
+        self.google_id = ""
+        self.google_email = ""
+        self.gravatar_id = ""
+        self.id = None
+        self.is_google_admin = False
+        self.is_logged_in = False
+        self.is_logged_in_google = False
+        self.paste_count = 0
+        self.url = ""
+
     def refresh (self):
         guser = users.get_current_user()
         self.db_user = None
@@ -40,9 +63,7 @@ class User:
             self.is_logged_in_google = False
 
         if self.google_id != "":
-            qry_user = app.model.User.all()
-            qry_user.filter("google_id =", self.google_id)
-            self.db_user = qry_user.get()
+            self.db_user = get_db_user(self.google_id)
             if self.db_user:
                 self.is_logged_in = True
                 self.id = self.db_user.id
@@ -50,8 +71,54 @@ class User:
                 self.url = app.url("users/%s", self.id)
 
 
+def forget_db_user (google_id):
+    """
+    Drops the cached user of a Google account, once it signed up.
+    """
 
-_user = User()
+    memcache.delete("user/" + google_id)
 
 def get_current_user ():
-    return _user
+    """
+    Gets the user of the current request, anonymous until refreshed.
+    """
+
+    if getattr(_request, "user", None) == None:
+        reset_current_user()
+    return _request.user
+
+def get_db_user (google_id):
+    """
+    Gets the registered user of a Google account, from memcache when
+    possible, None if the account didn't sign up.
+    """
+
+    key = "user/" + google_id
+    db_user = memcache.get(key)
+    if db_user == None:
+        db_user = app.model.User.get_by_key_name(get_key_name(google_id))
+        if db_user == None:
+            # Users who signed up before users were keyed by Google account.
+            qry_user = app.model.User.all()
+            qry_user.filter("google_id =", google_id)
+            db_user = qry_user.get()
+
+        if db_user == None:
+            db_user = kNOT_REGISTERED
+        memcache.set(key, db_user, settings.USER_CACHE_TIME)
+
+    if db_user == kNOT_REGISTERED:
+        db_user = None
+    return db_user
+
+def get_key_name (google_id):
+    return "google/" + google_id
+
+def reset_current_user ():
+    """
+    Starts a request with an anonymous user, so that nothing is kept from
+    the user of the previous request.
+    """
+
+    _request.user = User()
+    return _request.user
@@ -1,4 +1,6 @@
 import math
+import re
+import zlib
 
 def make_filesize_readable (byte_size):
     result = []
@@ -23,3 +25,56 @@ def make_filesize_readable (byte_size):
         size = int(size)
 
     return [size, ["B", "kB", "mB", "gB", "tB"][unit]]
+
+kLINE_START = re.compile("[ \t]+")
+
+def format_line_start (line):
+    """
+    Make whitespaces print right in HTML:
+    * Replace spaces with <&nbsp;>
+    * Replace tabs with three <&nbsp;>
+    """
+    match = kLINE_START.match(line)
+    if match == None:
+        return line
+
+    start = match.group(0).replace(" ", "&nbsp;").replace("\t", "&nbsp;&nbsp;&nbsp;")
+    return start + line[match.end():]
+
+def format_code_lines (code):
+    """
+    Make whitespaces at line starts print right in HTML. Every line is
+    followed by a line break.
+    """
+    return "".join([format_line_start(line) + "\n" for line in code.splitlines()])
+
+# The first byte of a compressed text tells how the rest is stored.
+kTEXT_FORMAT_PLAIN = 0
+kTEXT_FORMAT_ZLIB = 1
+
+def compress_text (text):
+    """
+    Compresses a unicode text with zlib, behind a format byte. Texts which
+    don't get smaller are stored as plain UTF-8.
+    """
+    data = text.encode("utf-8")
+    compressed = zlib.compress(data)
+    if len(compressed) < len(data):
+        return chr(kTEXT_FORMAT_ZLIB) + compressed
+    return chr(kTEXT_FORMAT_PLAIN) + data
+
+def decompress_text (blob):
+    """
+    Gets back the unicode text made into <blob> by compress_text().
+    """
+    if blob == None or len(blob) == 0:
+        return u""
+
+    format = ord(blob[0])
+    if format == kTEXT_FORMAT_ZLIB:
+        data = zlib.decompress(blob[1:])
+    elif format == kTEXT_FORMAT_PLAIN:
+        data = blob[1:]
+    else:
+        raise ValueError("Unknown text format: " + str(format))
+    return data.decode("utf-8")
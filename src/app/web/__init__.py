@@ -11,8 +11,6 @@
 # License for more details.
 
 
-import feedparser
-from google.appengine.api import memcache
 from google.appengine.api import users
 from google.appengine.ext import webapp
 from google.appengine.ext.webapp import template
@@ -20,6 +18,7 @@ import os
 
 import app
 import app.appengine.hook
+import app.twitter
 import app.user
 import settings
 
@@ -32,6 +31,10 @@ class Path:
         self.path.append({"text": text, "link":link})
 
 class RequestHandler (webapp.RequestHandler):
+    # Whether the page finds out who the user is. Feeds, raw pages and tasks
+    # show the same thing to everyone, and keep to an anonymous user.
+    resolve_user = True
+
     def __init__(self):
         import app.appengine.hook
         app.appengine.hook.datastore_logs = []
@@ -46,20 +49,14 @@ class RequestHandler (webapp.RequestHandler):
         self.scripts = []
         self.feeds = []
         self.styles = []
-        self.user = app.user.get_current_user()
-        if self.user:
+        self.user = app.user.reset_current_user()
+        if self.resolve_user:
             self.user.refresh()
 
         self.content["APP"]["SHOW_TWITTER"] = settings.SHOW_TWITTER and settings.TWITTER_ACCOUNT
         if self.content["APP"]["SHOW_TWITTER"]:
-            tweet = memcache.get("twitter/latest")
-            if tweet is None:
-                feed = feedparser.parse("http://twitter.com/statuses/user_timeline/" + settings.TWITTER_ACCOUNT + ".rss")
-                if len(feed.entries) > 0:
-                    tweet = feed.entries[0].description[len(settings.TWITTER_ACCOUNT) + 2:]
-                    memcache.add("twitter/latest", tweet, settings.TWITTER_UPDATE_FREQUENCY)
             self.content["APP"]["U_TWITTER"] = "http://twitter.com/" + settings.TWITTER_ACCOUNT
-            self.content["APP"]["TWEET"] = tweet
+            self.content["APP"]["TWEET"] = app.twitter.get_latest_tweet()
 
     def add_atom_feed (self, url, title, rel):
         self.add_feed (url, "application/atom+xml", title, rel)
@@ -68,6 +65,26 @@ class RequestHandler (webapp.RequestHandler):
         feed = {"url":url, "type": type, "title": title, "rel": rel}
         self.feeds.append(feed)
 
+    def get_410 (self, paste_slug):
+        """
+        Tells that a paste has expired.
+        """
+
+        self.error(410)
+        self.content["paste_slug"] = paste_slug
+        self.content["u_paste"] = app.url("")
+        self.write_out("page/pastes/410.html")
+
+    def get_410_txt (self, paste_slug):
+        """
+        Tells that a paste has expired, as plain text.
+        """
+
+        self.error(410)
+        self.content["content"] = "The paste " + paste_slug + " has expired."
+        self.set_header("Content-Type", "text/plain")
+        self.write_out("page/pastes/410.tpl")
+
     def set_header(self, name, value):
         if not name in self.response.headers:
             self.response.headers.add_header(name, value)
@@ -136,14 +153,21 @@ class RequestHandler (webapp.RequestHandler):
         if settings.ENV == "debug":
             self.content["datastore_logs"] = app.appengine.hook.datastore_logs
 
+        self.response.out.write(self.render(self.template_name, self.content))
+
+    def render (self, template_name, values):
+        """
+        Renders a template to a string. A template name starting with <./> is
+        relative to the directory of the module.
+        """
+
         tpl_path = ""
-        if self.template_name.startswith("./"):
-            tpl_path = self.module_directory + "/" + self.template_name[2:]
+        if template_name.startswith("./"):
+            tpl_path = self.module_directory + "/" + template_name[2:]
         else:
-            tpl_path = self.template_name
+            tpl_path = template_name
 
-        rendered_template = template.render(tpl_path, self.content)
-        self.response.out.write(rendered_template)
+        return template.render(tpl_path, values)
 
 
 class UserRequestHandler (RequestHandler):
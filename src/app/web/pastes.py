@@ -8,9 +8,7 @@ import smoid.languages
 class PasteRequestHandler (app.web.RequestHandler):
 
     def get_paste (self, pasty_slug):
-        qry_pastes = app.model.Pasty.all()
-        qry_pastes.filter("slug =", pasty_slug)
-        return qry_pastes.get()
+        return app.model.Pasty.get_by_slug(pasty_slug)
 
 
 class PasteListRequestHandler (PasteRequestHandler):
@@ -0,0 +1,55 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+import datetime
+
+import app.stats
+import app.web
+
+
+class StatsRequestHandler (app.web.RequestHandler):
+
+    def get_report (self):
+        """
+        Gets the stats report asked for by the <unit>, <start> and <end>
+        parameters of the request, or None if they are wrong. The dates are
+        written YYYY-MM-DD, or YYYY-MM-DDTHH for hours.
+        """
+
+        unit = self.request.get("unit", "day")
+        if not unit in app.stats.kUNITS:
+            return None
+
+        try:
+            start = self.parse_date(self.request.get("start"))
+            end = self.parse_date(self.request.get("end"))
+        except ValueError:
+            return None
+
+        if end == None:
+            end = datetime.datetime.now()
+        if start != None and start > end:
+            return None
+
+        return app.stats.get_report(unit, start, end)
+
+    def parse_date (self, value):
+        date = None
+        if value != "":
+            if "T" in value:
+                date = datetime.datetime.strptime(value, "%Y-%m-%dT%H")
+            else:
+                date = datetime.datetime.strptime(value, "%Y-%m-%d")
+        return date
@@ -12,6 +12,36 @@
 
 
 import math
+import urllib
+
+import app.util
+
+
+# The line number links of the longest code shown so far, and the end of
+# each line in them: (links, ends).
+line_numbers = ("", [0])
+
+def get_line_numbers (count):
+    """
+    Gets the line number links of a code of <count> lines. They are made
+    once, shorter codes getting the start of the links of longer ones.
+    """
+    global line_numbers
+
+    links, ends = line_numbers
+    if count >= len(ends):
+        ends = list(ends)
+        new_links = []
+        for i in range(len(ends), count + 1):
+            link = "<a href=\"#l" + str(i) + "\" name=\"l" + str(i) + "\">" + str(i) + "</a>\n"
+            new_links.append(link)
+            ends.append(ends[-1] + len(link))
+        links += "".join(new_links)
+
+        # Replaced as a whole, for concurrent requests to see it consistent.
+        line_numbers = (links, ends)
+
+    return links[:ends[count]]
 
 
 class Paging:
@@ -40,13 +70,28 @@ class Paging:
 
 
 class CursorPaging (Paging):
+    """
+    A paging around the current page. The links of the pages whose
+    datastore cursor is in <cursors> ({page: cursor}) are made with
+    <cursor_page_url>, where {cursor} is replaced with the cursor.
+    """
 
     def __init__(self):
         Paging.__init__(self)
         self.cursor_margin = 0
+        self.cursor_page_url = ""
+        self.cursors = {}
         self.left_margin = 0
         self.right_margin = 0
 
+    def make_page(self, i):
+        if i in self.cursors and self.cursors[i] and self.cursor_page_url != "":
+            url = self.cursor_page_url.replace("{page}", str(i))
+            url = url.replace("{cursor}", urllib.quote(self.cursors[i]))
+            return (i, url, self.page == i)
+        else:
+            return Paging.make_page(self, i)
+
     def prepare(self):
         self.page_count = \
             math.ceil(float(self.items) / float(self.page_length))
@@ -78,28 +123,8 @@ class Code:
 
     def format_code(self, code):
         self.lines = code.split("\n")
-        line_nos = ""
-        code_lines = ""
-        i = 1
-        for line in self.lines:
-            line_nos += "<a href=\"#l" + str(i) + "\" name=\"l" + str(i) + "\">" + str(i) + "</a>\n"
-            if line == "":
-                code_lines += "\n"
-            else:
-                code_lines += self.format_line_start(line) + "\n"
-            i += 1
-        return (line_nos, code_lines)
+        code_lines = "".join([app.util.format_line_start(line) + "\n" for line in self.lines])
+        return (get_line_numbers(len(self.lines)), code_lines)
 
     def format_line_start(self, line):
-        result = ""
-        i = 0
-        for c in line:
-            if c == " ":
-                result += "&nbsp;"
-            elif c == "\t":
-                result += "&nbsp;&nbsp;&nbsp;"
-            else:
-                result += line[i:]
-                break
-            i += 1
-        return result
+        return app.util.format_line_start(line)
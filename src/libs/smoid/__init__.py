@@ -1,4 +1,6 @@
+import os
 import sys
+import time
 
 
 import smoid.languages.begin
@@ -21,83 +23,174 @@ import smoid.languages.namespace
 import smoid.languages.package
 import smoid.languages.shebang
 import smoid.languages.whyle
+import smoid.scanner
 
 
 class GrandChecker:
+    """
+    Finds out the language of a content by adding up the probabilities given
+    by all the checks. The checks are built and their patterns compiled once,
+    then every detection keeps its scores to itself: a single GrandChecker
+    can be shared by concurrent callers.
+
+    The patterns of the checks of a type are looked for by a single Scanner,
+    which leaves out the patterns that can't match the content.
+    """
+
+    kTYPES = (
+        smoid.languages.Check.kTYPE_FINAL,
+        smoid.languages.Check.kTYPE_MACRO,
+        smoid.languages.Check.kTYPE_MICRO
+    )
+
     def __init__ (self):
-        self.languages = {}
-        self.checkers = []
-
-        self.checkers.extend(smoid.languages.lang_ada.AdaCheckCollection())
-        self.checkers.extend(smoid.languages.lang_c.CCheckCollection())
-        self.checkers.extend(smoid.languages.lang_html.HtmlCheckCollection())
-        self.checkers.extend(smoid.languages.lang_lua.LuaCheckCollection())
-        self.checkers.extend(smoid.languages.lang_perl.PerlCheckCollection())
-        self.checkers.extend(smoid.languages.lang_php.PhpCheckCollection())
-        self.checkers.extend(smoid.languages.lang_python.PythonCheck())
-        self.checkers.extend(smoid.languages.lang_python_console.PythonConsoleCheck())
-        self.checkers.extend(smoid.languages.lang_ruby.RubyCheckCollection())
-        self.checkers.extend(smoid.languages.lang_sh.ShCollection())
-        self.checkers.extend(smoid.languages.lang_sql.SqlCheckCollection())
-        self.checkers.extend(smoid.languages.lang_xml.XmlCheck())
-
-        self.checkers.append(smoid.languages.begin.BeginCheck())
-        self.checkers.extend(smoid.languages.exception.ExceptionCheckCollection())
-        self.checkers.append(smoid.languages.klass.KlassCheck())
-        self.checkers.append(smoid.languages.imports.ImportCheck())
-        self.checkers.append(smoid.languages.namespace.NamespaceCheck())
-        self.checkers.append(smoid.languages.package.PackageCheck())
-        self.checkers.append(smoid.languages.shebang.ShebangCheck())
-        self.checkers.append(smoid.languages.whyle.WhileCheck())
-
-        self.verbose = False
+        checkers = []
+
+        checkers.extend(smoid.languages.lang_ada.AdaCheckCollection())
+        checkers.extend(smoid.languages.lang_c.CCheckCollection())
+        checkers.extend(smoid.languages.lang_html.HtmlCheckCollection())
+        checkers.extend(smoid.languages.lang_lua.LuaCheckCollection())
+        checkers.extend(smoid.languages.lang_perl.PerlCheckCollection())
+        checkers.extend(smoid.languages.lang_php.PhpCheckCollection())
+        checkers.extend(smoid.languages.lang_python.PythonCheck())
+        checkers.extend(smoid.languages.lang_python_console.PythonConsoleCheck())
+        checkers.extend(smoid.languages.lang_ruby.RubyCheckCollection())
+        checkers.extend(smoid.languages.lang_sh.ShCollection())
+        checkers.extend(smoid.languages.lang_sql.SqlCheckCollection())
+        checkers.extend(smoid.languages.lang_xml.XmlCheck())
+
+        checkers.append(smoid.languages.begin.BeginCheck())
+        checkers.extend(smoid.languages.exception.ExceptionCheckCollection())
+        checkers.append(smoid.languages.klass.KlassCheck())
+        checkers.append(smoid.languages.imports.ImportCheck())
+        checkers.append(smoid.languages.namespace.NamespaceCheck())
+        checkers.append(smoid.languages.package.PackageCheck())
+        checkers.append(smoid.languages.shebang.ShebangCheck())
+        checkers.append(smoid.languages.whyle.WhileCheck())
+
+        self.checkers = tuple(checkers)
+
+        self.checkers_by_type = {}
+        self.scanners_by_type = {}
+        for t in GrandChecker.kTYPES:
+            self.checkers_by_type[t] = tuple([c for c in self.checkers if c.type == t])
+            self.scanners_by_type[t] = smoid.scanner.Scanner(self.checkers_by_type[t])
+
         self.max_checker_name_length = 30
 
-    def check (self, content):
-        types = [
-            smoid.languages.Check.kTYPE_FINAL,
-            smoid.languages.Check.kTYPE_MACRO,
-            smoid.languages.Check.kTYPE_MICRO
-        ]
+    def check (self, content, verbose=False, early_exit=False, deadline=None):
+        """
+        Runs all the checks on <content> and returns the probability of each
+        language, as a dictionary of {"name", "probability"} maps.
+
+        With <early_exit>, the checks of a type are left out once they can't
+        change the leading language anymore: the probabilities are then
+        incomplete, but the leader is the one a full check would give.
+        No more check is run after <deadline>, a time.time() value.
+        """
+
+        languages = {}
+
+        for i in range(len(GrandChecker.kTYPES)):
+            t = GrandChecker.kTYPES[i]
+            self.check_type (t, content, languages, verbose, deadline)
+
+            remaining_types = GrandChecker.kTYPES[i + 1:]
+            if len(remaining_types) == 0:
+                break
+
+            if deadline != None and time.time() > deadline:
+                if verbose:
+                    print "Out of time after the " + self.get_check_type_name(t) + " checks"
+                break
+
+            if early_exit and self.is_decided(content, languages, remaining_types):
+                if verbose:
+                    print "Decided after the " + self.get_check_type_name(t) + " checks"
+                break
 
+        return languages
+
+    def check_type (self, t, content, languages, verbose=False, deadline=None):
+        checkers = self.checkers_by_type[t]
+
+        results = []
+        for checker in checkers:
+            result = smoid.languages.CheckResult(checker)
+            checker.check_start(content, result)
+            results.append(result)
+
+        self.scanners_by_type[t].scan(content, results, deadline)
+
+        for i in range(len(checkers)):
+            checker = checkers[i]
+            result = results[i]
+
+            if verbose:
+               display_name = ("<" + checker.name + ">...").ljust(self.max_checker_name_length)
+               print "[" + self.get_check_type_name(checker.type) + "]",
+               print "Checking " + display_name,
+
+            for language_name in result.languages:
+                if not language_name in languages:
+                    lang = {}
+                    lang["name"] = language_name
+                    lang["probability"] = result.languages[language_name]
+                    languages[language_name] = lang
+                else:
+                    languages[language_name]["probability"] += result.languages[language_name]
+
+            if verbose:
+                passed_languages = ""
+                for language_name in result.languages:
+                    prob = result.languages[language_name]
+                    if prob > 0:
+                        passed_languages += language_name + " +" + str(prob) + ", "
+
+                if passed_languages != "":
+                    print "[" + passed_languages[:-2] + "]"
+                else:
+                    print "-"
+
+    def is_decided (self, content, languages, types):
+        """
+        Tells whether the checks of <types> can't take the lead from the
+        leading language of <languages> anymore, whatever they find in
+        <content>. Probabilities only go up, so it is enough for the leader
+        to be ahead of the most the others could reach.
+        """
+
+        leader = None
+        for language in languages.values():
+            if leader == None or language["probability"] > leader["probability"]:
+                leader = language
+
+        if leader == None:
+            return False
+
+        max_probabilities = {}
         for t in types:
-            self.check_type (t, content)
-
-    def check_type (self, t,  content):
-
-        for checker in self.checkers:
-            if checker.type == t:
-                if self.verbose:
-                   display_name = ("<" + checker.name + ">...").ljust(self.max_checker_name_length)
-                   print "[" + self.get_check_type_name(checker.type) + "]",
-                   print "Checking " + display_name,
-
-                checker.check(content)
-
-                for language_name in checker.languages:
-                    language = checker.languages[language_name]
-                    if not language_name in self.languages:
-                        lang = {}
-                        lang["name"] = language_name
-                        lang["probability"] = language.probability
-                        self.languages[language_name] = lang
-                    else:
-                        self.languages[language_name]["probability"] += language.probability
-
-                did_languages_passed = False
-                languages = ""
-                if len(checker.languages) > 0:
-                    for language_name in checker.languages:
-                        prob = checker.languages[language_name].probability
-                        if prob > 0:
-                            languages += language_name + " +" + str(prob) + ", "
-                            did_languages_passed = True
-
-                if self.verbose:
-                    if did_languages_passed:
-                        print "[" + languages[:-2] + "]"
-                    else:
-                        print "-"
+            # What the content starts with is quickly known for sure.
+            for checker in self.checkers_by_type[t]:
+                result = smoid.languages.CheckResult(checker)
+                checker.check_start(content, result)
+                for language_name in result.languages:
+                    max_probabilities[language_name] = max_probabilities.get(language_name, 0) + result.languages[language_name]
+
+            self.scanners_by_type[t].add_max_probabilities(content, max_probabilities)
+
+        for language_name in set(languages.keys()) | set(max_probabilities.keys()):
+            if language_name == leader["name"]:
+                continue
+
+            probability = max_probabilities.get(language_name, 0)
+            if language_name in languages:
+                probability += languages[language_name]["probability"]
+
+            if probability >= leader["probability"]:
+                return False
+
+        return True
 
     def get_check_type_name (self, t):
         name = ""
@@ -111,22 +204,30 @@ class GrandChecker:
             name = "UNKNO"
         return name
 
-    def find_out_language_of_file (self, file_path):
-        lang = ""
-        hfile = open(file_path)
-        if hfile:
-            file_content = hfile.read()
-            lang = self.find_out_language (file_content)
-            hfile.close()
-        return lang
+    def find_out_language_of_file (self, file_path, verbose=False, max_length=0, max_time=0):
+        return self.find_out_language(GrandChecker.read_file(file_path, max_length), verbose, max_length, max_time)
+
+    def find_out_language(self, content, verbose=False, max_length=0, max_time=0):
+        """
+        Returns the name of the most probable language of <content>, or ""
+        if there is no telling.
+
+        Only the head, the middle and the tail of a content longer than
+        <max_length> are checked, and the checks stop after <max_time>
+        seconds, the most probable language so far being returned.
+        0 means no limit.
+        """
 
-    def find_out_language(self, content):
-        self.languages = {}
-        self.check(content)
-        results = self.languages.values()
+        content = GrandChecker.sample(content, max_length)
+
+        deadline = None
+        if max_time > 0:
+            deadline = time.time() + max_time
+
+        results = self.check(content, verbose, True, deadline).values()
         results = sorted(results, GrandChecker.sort_language)
 
-        if self.verbose:
+        if verbose:
             print "\nProbabilities..."
             for language in results:
                 if language["probability"] > 0:
@@ -141,6 +242,53 @@ class GrandChecker:
             language = ""
         return language
 
+    @staticmethod
+    def read_file (file_path, max_length=0):
+        """
+        Returns the content of a file, or what sample() keeps of it. The file
+        is mapped rather than read, so only the parts sampled are loaded.
+        """
+
+        # Not imported with the module: App Engine doesn't provide mmap.
+        import mmap
+
+        hfile = open(file_path, "rb")
+        try:
+            if os.fstat(hfile.fileno()).st_size == 0:
+                return ""
+
+            content = mmap.mmap(hfile.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                if max_length > 0 and len(content) > max_length:
+                    return GrandChecker.sample(content, max_length)
+                return content[:]
+            finally:
+                content.close()
+        finally:
+            hfile.close()
+
+    @staticmethod
+    def sample (content, max_length):
+        """
+        Returns the head, the middle and the tail of <content>, a third of
+        <max_length> each, if it is longer than that. The middle and the tail
+        start at a line.
+        """
+
+        if max_length <= 0 or len(content) <= max_length:
+            return content
+
+        part_length = max_length // 3
+
+        parts = []
+        for start in (0, (len(content) - part_length) // 2, len(content) - part_length):
+            part = content[start:start + part_length]
+            if start > 0:
+                part = part[part.find("\n") + 1:]
+            parts.append(part)
+
+        return "\n".join(parts)
+
     @staticmethod
     def sort_language (checker1, checker2):
         if checker1["probability"] > checker2["probability"]:
@@ -149,3 +297,14 @@ class GrandChecker:
             return 0
         else:
             return 1
+
+
+# The shared checker, built once when smoid is imported.
+checker = GrandChecker()
+
+
+def find_out_language (content, verbose=False, max_length=0, max_time=0):
+    return checker.find_out_language(content, verbose, max_length, max_time)
+
+def find_out_language_of_file (file_path, verbose=False, max_length=0, max_time=0):
+    return checker.find_out_language_of_file(file_path, verbose, max_length, max_time)
@@ -108,14 +108,20 @@ languages["xml"] = {
 }
 
 class Check:
+    """
+    A language check. Checks are shared by every detection, so they only
+    hold their compiled patterns: the probabilities found for a content go
+    to the CheckResult returned by check().
+    """
+
     kTYPE_FINAL = 1
     kTYPE_MACRO = 2
     kTYPE_MICRO = 3
 
     def __init__(self):
-        self.content = ""
         self.example = ""
         self.languages = {}
+        self.match_handlers = []
         self.multiple_matches = []
         self.name = ""
         self.one_time_matches = []
@@ -124,45 +130,47 @@ class Check:
     def add_language (self, language_name):
         self.languages[language_name] = CheckLanguage(name=language_name)
 
+    def add_match_handler (self, regex, handler, max_probability=None):
+        """
+        Calls handler(match, result) for every match of <regex> in a content.
+        <max_probability> is the most a match can give to a language, None
+        if there is no telling.
+        """
+        self.match_handlers.append((re.compile(regex), handler, max_probability))
+
     def add_multiple_matches (self, regex, probability):
-        self.multiple_matches.append((regex, probability))
+        self.multiple_matches.append((re.compile(regex), probability))
 
     def add_one_time_match (self, regex, probability):
-        self.one_time_matches.append((regex, probability))
+        self.one_time_matches.append((re.compile(regex), probability))
 
     def check (self, content):
-        self.content = content
-        self.reset()
-        for match in self.one_time_matches:
-            if self.is_re_matched(match[0]):
-                for lang in self.languages:
-                    self.languages[lang].probability += match[1]
-
-        for match_info in self.multiple_matches:
-            all_matched = re.findall(match_info[0], content)
-            for matched in all_matched:
-                for lang in self.languages:
-                    self.languages[lang].probability += match_info[1]
+        """
+        Runs the check alone on <content>. The GrandChecker doesn't use it:
+        it calls check_start() then scans the content once for the patterns
+        of all its checks (see smoid.scanner).
+        """
+        result = CheckResult(self)
 
-        self._test()
-
-    def incr_language_probability (self, name, prob_diff):
-        if name in self.languages:
-            self.languages[name].probability += prob_diff
+        self.check_start(content, result)
 
-    def incr_probability (self, prob_diff):
-        for language_name in self.languages:
-            self.languages[language_name].probability += prob_diff
+        for regex, probability in self.multiple_matches:
+            for matched in regex.finditer(content):
+                result.incr_probability(probability)
 
-    def is_re_found (self, regex, start_at = 0):
-        return re.compile(regex).search(self.content, start_at)
+        for regex, handler, max_probability in self.match_handlers:
+            for match in regex.finditer(content):
+                handler(match, result)
 
-    def is_re_matched (self, regex, start_at = 0):
-        return re.compile(regex).match(self.content, start_at)
+        return result
 
-    def reset (self):
-        for language_name in self.languages:
-            self.languages[language_name].probability = 0
+    def check_start (self, content, result):
+        """
+        Tests what the content starts with.
+        """
+        for regex, probability in self.one_time_matches:
+            if regex.match(content):
+                result.incr_probability(probability)
 
     def set_languages (self, languages):
         self.languages = languages
@@ -170,13 +178,28 @@ class Check:
     def set_type (self, t):
         self.type = t
 
-    def _test (self):
-        pass
-
 class CheckLanguage:
     def __init__ (self, name="", probability=0):
         self.name = name
         self.probability = probability
 
+class CheckResult:
+    """
+    The probabilities given by a check to its languages for one content.
+    """
+
+    def __init__ (self, check):
+        self.languages = {}
+        for language_name in check.languages:
+            self.languages[language_name] = 0
+
+    def incr_language_probability (self, name, prob_diff):
+        if name in self.languages:
+            self.languages[name] += prob_diff
+
+    def incr_probability (self, prob_diff):
+        for language_name in self.languages:
+            self.languages[language_name] += prob_diff
+
 class CheckCollection (list):
     pass
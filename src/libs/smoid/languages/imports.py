@@ -1,6 +1,3 @@
-import re
-
-
 from smoid.languages import Check, CheckCollection
 
 
@@ -14,14 +11,12 @@ class ImportCheck (Check):
         self.add_language("python")
         self.add_language("scala")
         res_package = "\s*import\s+([a-zA-Z_.]+)\s*(?:\n|\r|;)"
-        self.re_package = re.compile(res_package)
+        self.add_match_handler(res_package, self.on_import, 30)
 
-    def check (self, content):
-        self.reset()
-        matches = self.re_package.findall(content)
+    def on_import (self, match, result):
+        name = match.group(1)
 
-        for match in matches:
-            self.incr_probability(10)
-            if match[0:5] == "java.":
-                self.incr_language_probability("java", 20)
-                self.incr_language_probability("scala", 20)
+        result.incr_probability(10)
+        if name[0:5] == "java.":
+            result.incr_language_probability("java", 20)
+            result.incr_language_probability("scala", 20)
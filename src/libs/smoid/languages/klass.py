@@ -1,6 +1,3 @@
-import re
-
-
 from smoid.languages import Check, CheckCollection
 
 
@@ -45,31 +42,28 @@ class KlassCheck (Check):
         res_class_name = "[a-zA-Z0-9_\.]+"
         res_class = "(?:\n|\r|;|^)\s*" + res_modifiers + "class (" + res_class_name + ")"
 
-        self.re_class = re.compile(res_class)
-
-    def check (self, content):
-        self.reset()
+        self.add_match_handler(res_class, self.on_class)
 
-        for match in self.re_class.finditer(content):
-            match_str = match.group(0)
+    def on_class (self, match, result):
+        match_str = match.group(0)
 
-            self.incr_language_probability("java", 20)
-            self.incr_language_probability("csharp", 20)
-            self.incr_language_probability("python", 20)
-            self.incr_language_probability("php", 20)
+        result.incr_language_probability("java", 20)
+        result.incr_language_probability("csharp", 20)
+        result.incr_language_probability("python", 20)
+        result.incr_language_probability("php", 20)
 
-            if match_str != "":
-                modifiers = match_str.split(" ")
-                for modifier in modifiers:
-                    modifier = modifier.strip()
-                    if modifier in self.java_modifiers:
-                        self.incr_language_probability("java", 10)
+        if match_str != "":
+            modifiers = match_str.split(" ")
+            for modifier in modifiers:
+                modifier = modifier.strip()
+                if modifier in self.java_modifiers:
+                    result.incr_language_probability("java", 10)
 
-                    if modifier in self.csharp_modifiers:
-                        self.incr_language_probability("csharp", 10)
+                if modifier in self.csharp_modifiers:
+                    result.incr_language_probability("csharp", 10)
 
-                    if modifier in self.php_modifiers:
-                        self.incr_language_probability("php", 10)
+                if modifier in self.php_modifiers:
+                    result.incr_language_probability("php", 10)
 
-            else:
-                self.incr_language_probability("scala", 20)
+        else:
+            result.incr_language_probability("scala", 20)
@@ -1,5 +1,3 @@
-import re
-
 from smoid.languages import Check, CheckCollection
 
 
@@ -17,14 +15,13 @@ class AdaWithCheck (Check):
         res_id = "([a-zA-Z_][a-zA-Z0-9_.]*)"
         res_with = res_sol + "\s*" + res_scope + "\s*with\s+" + res_id + "\s*;"
 
-        self.re_with = re.compile(res_with)
+        self.add_match_handler(res_with, self.on_with, 80)
 
-    def check (self, content):
-        for match in self.re_with.finditer(content):
-            self.incr_language_probability("ada", 30)
+    def on_with (self, match, result):
+        result.incr_language_probability("ada", 30)
 
-            if match.group(1).startswith("Ada.") or match.group(1).startswith("GNAT."):
-                self.incr_language_probability("ada", 50)
+        if match.group(1).startswith("Ada.") or match.group(1).startswith("GNAT."):
+            result.incr_language_probability("ada", 50)
 
 
 class AdaRaiseCheck (Check):
@@ -1,5 +1,3 @@
-import re
-
 from smoid.languages import Check, CheckCollection
 
 
@@ -80,30 +78,27 @@ class CIncludeCheck (Check):
         ]
 
         res_import = """#\s*include\s+(?:"|\<|')(.*?)(?:"|\<|')(?:\n|\r)"""
-        self.re_import = re.compile(res_import)
-
-    def check (self, content):
-        self.reset()
+        self.add_match_handler(res_import, self.on_include, 50)
 
-        for match in self.re_import.finditer(content):
-            self.incr_language_probability("c", 10)
-            self.incr_language_probability("c++", 10)
+    def on_include (self, match, result):
+        result.incr_language_probability("c", 10)
+        result.incr_language_probability("c++", 10)
 
-            inc = match.group(1)
+        inc = match.group(1)
 
-            if inc in self.c_std_includes:
-                self.incr_language_probability("c", 40)
-                self.incr_language_probability("c++", 40)
+        if inc in self.c_std_includes:
+            result.incr_language_probability("c", 40)
+            result.incr_language_probability("c++", 40)
 
-            elif inc in self.cpp_std_includes:
-                self.incr_language_probability("c++", 40)
+        elif inc in self.cpp_std_includes:
+            result.incr_language_probability("c++", 40)
 
-            elif inc.endswith("hpp"):
-                self.incr_language_probability("c++", 30)
+        elif inc.endswith("hpp"):
+            result.incr_language_probability("c++", 30)
 
-            elif inc.endswith("h"):
-                self.incr_language_probability("c", 30)
-                self.incr_language_probability("c++", 30)
+        elif inc.endswith("h"):
+            result.incr_language_probability("c", 30)
+            result.incr_language_probability("c++", 30)
 
 
 class CCheckCollection (CheckCollection):
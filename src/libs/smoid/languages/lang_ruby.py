@@ -1,5 +1,3 @@
-import re
-
 from smoid.languages import Check, CheckCollection
 
 
@@ -33,7 +31,7 @@ class RubyFunctionDeclarationCheck (Check):
         res_func += res_args
         res_func += res_eol
 
-        self.re_func = re.compile(res_func)
+        self.add_match_handler(res_func, self.on_function, 40)
 
         self.special_methods = [
             "initialize",
@@ -45,14 +43,11 @@ class RubyFunctionDeclarationCheck (Check):
             "to_s"
         ]
 
-    def check (self, content):
-        self.reset()
-
-        for match in self.re_func.finditer(content):
-            func_name = match.group(1)
-            self.incr_language_probability("ruby", 20)
-            if func_name in self.special_methods:
-                self.incr_language_probability("ruby", 20)
+    def on_function (self, match, result):
+        func_name = match.group(1)
+        result.incr_language_probability("ruby", 20)
+        if func_name in self.special_methods:
+            result.incr_language_probability("ruby", 20)
 
 class RubyModuleDeclarationCheck (Check):
     def __init__ (self):
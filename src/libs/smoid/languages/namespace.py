@@ -1,6 +1,3 @@
-import re
-
-
 from smoid.languages import Check, CheckCollection
 
 
@@ -13,13 +10,12 @@ class NamespaceCheck (Check):
         self.add_language("c#")
         self.add_language("c++")
         res_package = "(?:^|\n|\r|;)\s*namespace\s*([a-zA-Z_][a-zA-Z_0-9.]*)\s*(?:$|\n|\r|;)\s*{"
-        self.re_package = re.compile(res_package)
+        self.add_match_handler(res_package, self.on_namespace, 10)
+
+    def on_namespace (self, match, result):
+        name = match.group(1)
 
-    def check (self, content):
-        self.reset()
-        matches = self.re_package.findall(content)
-        for match in matches:
-            if match.find(".") != -1:
-                self.incr_language_probability("c#", 10)
-            else:
-                self.incr_language_probability("c++", 10)
+        if name.find(".") != -1:
+            result.incr_language_probability("c#", 10)
+        else:
+            result.incr_language_probability("c++", 10)
@@ -1,6 +1,3 @@
-import re
-
-
 from smoid.languages import Check, CheckCollection
 
 
@@ -14,24 +11,19 @@ class PackageCheck (Check):
         self.add_language("java")
         self.add_language("perl")
         res_package = "(?:^|\n|\r|;)\s*package(?:\s*body)?\s*([a-zA-Z_0-9:.]+)\s*($|\n|\r|;|is)"
-        self.re_package = re.compile(res_package)
+        self.add_match_handler(res_package, self.on_package, 30)
 
-    def check (self, content):
-        self.reset()
-        matches = self.re_package.search(content)
+    def on_package (self, match, result):
+        if match.group(2) == "is":
+            result.incr_language_probability("ada", 30)
+        else:
+            if match.group(1).find(".") != -1:
+                result.incr_language_probability("java", 10)
 
-        for match in self.re_package.finditer(content):
+            elif match.group(1).find("::") != -1:
+                result.incr_language_probability("perl", 10)
 
-            if match.group(2) == "is":
-                self.incr_language_probability("ada", 30)
             else:
-                if match.group(1).find(".") != -1:
-                    self.incr_language_probability("java", 10)
-
-                elif match.group(1).find("::") != -1:
-                    self.incr_language_probability("perl", 10)
-
-                else:
-                    self.incr_language_probability("java", 10)
-                    self.incr_language_probability("perl", 10)
+                result.incr_language_probability("java", 10)
+                result.incr_language_probability("perl", 10)
 
@@ -13,8 +13,7 @@ class ShebangCheck (Check):
         self.add_language("python")
         self.add_language("ruby")
 
-    def check (self, content):
-        self.reset()
+    def check_start (self, content, result):
         content_len = len(content)
 
         if content_len > 2 and content[0:2] == "#!":
@@ -31,4 +30,4 @@ class ShebangCheck (Check):
             bin = content[slash_pos + 3:i + 2]
 
             if bin in self.languages.keys():
-                self.incr_language_probability(bin, 100)
+                result.incr_language_probability(bin, 100)
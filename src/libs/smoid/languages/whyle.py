@@ -1,7 +1,5 @@
 
 
-import re
-
 from smoid.languages import Check, CheckCollection
 
 
@@ -27,24 +25,21 @@ class WhileCheck (Check):
 
         res_while = res_sol + "\s*while(\s+|\(\s*).*?(\))?" + res_eol
 
-        self.re_while = re.compile(res_while)
-
-    def check (self, content):
-        self.reset()
+        self.add_match_handler(res_while, self.on_while, 30)
 
-        for match in self.re_while.finditer(content):
-            eol = match.group(3)
+    def on_while (self, match, result):
+        eol = match.group(3)
 
-            if eol == "do":
-                self.incr_language_probability("lua", 30)
-                self.incr_language_probability("ruby", 30)
+        if eol == "do":
+            result.incr_language_probability("lua", 30)
+            result.incr_language_probability("ruby", 30)
 
-            elif eol == ":":
-                self.incr_language_probability("python", 30)
+        elif eol == ":":
+            result.incr_language_probability("python", 30)
 
-            elif eol == "{":
-                self.incr_language_probability("c", 30)
-                self.incr_language_probability("c++", 30)
-                self.incr_language_probability("csharp", 30)
-                self.incr_language_probability("perl", 30)
-                self.incr_language_probability("php", 30)
+        elif eol == "{":
+            result.incr_language_probability("c", 30)
+            result.incr_language_probability("c++", 30)
+            result.incr_language_probability("csharp", 30)
+            result.incr_language_probability("perl", 30)
+            result.incr_language_probability("php", 30)
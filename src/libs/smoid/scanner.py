@@ -0,0 +1,159 @@
+import sre_constants
+import sre_parse
+import time
+
+
+class Scanner:
+    """
+    Looks for the patterns of a set of checks in a content and hands the
+    matches over to the checks.
+
+    Most patterns can only match around a keyword ("class", "import",
+    "while"...) or one of a few. The keywords are worked out once from the
+    pattern, and a pattern whose keywords aren't in the content is never
+    run: finding a string is much cheaper than trying a pattern at every
+    position, so a content is only walked by the few patterns which may
+    match it.
+    """
+
+    def __init__ (self, checks):
+        self.checks = tuple(checks)
+
+        # Every pattern, as (check index, regex, probability, handler, keywords).
+        # The probability of a handler is the most it gives for a match.
+        patterns = []
+        for i in range(len(self.checks)):
+            check = self.checks[i]
+            for regex, probability in check.multiple_matches:
+                patterns.append((i, regex, probability, None, Scanner.get_keywords(regex)))
+            for regex, handler, max_probability in check.match_handlers:
+                patterns.append((i, regex, max_probability, handler, Scanner.get_keywords(regex)))
+        self.patterns = tuple(patterns)
+
+        self.min_lengths = tuple([Scanner.get_min_length(p[1]) for p in self.patterns])
+
+    @staticmethod
+    def get_keywords (regex):
+        """
+        Returns strings one of which is found in every match of <regex>, or
+        () if there are none.
+        """
+        parsed = sre_parse.parse(regex.pattern, regex.flags)
+        if parsed.pattern.flags & sre_constants.SRE_FLAG_IGNORECASE:
+            return ()
+
+        return Scanner.find_keywords(parsed)
+
+    @staticmethod
+    def find_keywords (items):
+        keywords = ()
+        run = ""
+
+        for op, av in list(Scanner.flatten(items)) + [(None, None)]:
+            if op == sre_constants.LITERAL and av < 128:
+                run += chr(av)
+                continue
+
+            if run != "":
+                keywords = Scanner.best_keywords(keywords, (run,))
+                run = ""
+
+            if op == sre_constants.BRANCH:
+                alternatives = ()
+                for branch in av[1]:
+                    branch_keywords = Scanner.find_keywords(branch)
+                    if len(branch_keywords) == 0:
+                        alternatives = ()
+                        break
+                    alternatives += branch_keywords
+
+                if len(alternatives) > 0:
+                    keywords = Scanner.best_keywords(keywords, alternatives)
+
+        return keywords
+
+    @staticmethod
+    def best_keywords (keywords1, keywords2):
+        """
+        Returns the set of keywords likely to be found the less often: the
+        one with the longest shortest keyword, then the smallest one.
+        """
+        if len(keywords1) == 0:
+            return keywords2
+
+        rank1 = (min([len(k) for k in keywords1]), -len(keywords1))
+        rank2 = (min([len(k) for k in keywords2]), -len(keywords2))
+        if rank2 > rank1:
+            return keywords2
+        return keywords1
+
+    @staticmethod
+    def flatten (items):
+        """
+        Yields the items of a parsed pattern, with the groups opened up:
+        the items of a group are as needed as the group itself. Anything
+        which may not match as written (alternatives, repeats) is yielded
+        as is.
+        """
+        for op, av in items:
+            if op == sre_constants.SUBPATTERN:
+                for item in Scanner.flatten(av[-1]):
+                    yield item
+            else:
+                yield (op, av)
+
+    @staticmethod
+    def get_min_length (regex):
+        return sre_parse.parse(regex.pattern, regex.flags).getwidth()[0]
+
+    def add_max_probabilities (self, content, max_probabilities):
+        """
+        Adds the most the patterns can give to each language for <content>
+        to <max_probabilities>, a {language name: probability} dictionary.
+        The matches of a pattern don't overlap, so there can't be more of
+        them than of its keywords, or than the content can hold.
+        """
+        for p in range(len(self.patterns)):
+            i, regex, probability, handler, keywords = self.patterns[p]
+
+            max_matches = len(content) // max(self.min_lengths[p], 1) + 1
+            if len(keywords) > 0:
+                max_matches = min(max_matches, sum([content.count(k) for k in keywords]))
+
+            if max_matches == 0:
+                continue
+
+            if probability == None:
+                max_probability = float("inf")
+            else:
+                max_probability = max_matches * probability
+
+            for language_name in self.checks[i].languages:
+                max_probabilities[language_name] = max_probabilities.get(language_name, 0) + max_probability
+
+    def scan (self, content, results, deadline=None):
+        """
+        Adds the matches of the patterns in <content> to <results>, the
+        CheckResult of each check, in the order of the checks. The patterns
+        left when <deadline>, a time.time() value, is passed are skipped.
+        """
+        for i, regex, probability, handler, keywords in self.patterns:
+            if deadline != None and time.time() > deadline:
+                break
+
+            if len(keywords) > 0 and not Scanner.contains_any(content, keywords):
+                continue
+
+            if handler == None:
+                for match in regex.finditer(content):
+                    results[i].incr_probability(probability)
+            else:
+                for match in regex.finditer(content):
+                    handler(match, results[i])
+
+    @staticmethod
+    def contains_any (content, keywords):
+        for keyword in keywords:
+            if keyword in content:
+                return True
+        return False
@@ -29,6 +29,8 @@ import page.about.thanks
 import page.error.error404
 import page.languages.autodetected
 import page.pastes.add
+import page.pastes.colorize
+import page.pastes.count_forks
 import page.pastes.diff
 import page.pastes.index
 import page.pastes.index_atom
@@ -41,6 +43,13 @@ import page.pastes.recount
 import page.pastes.remote_diff
 import page.pastes.sitemap
 import page.pastes.update
+import page.stats.index
+import page.stats.index_json
+import page.tasks.migrate
+import page.tasks.reconcile_breakdowns
+import page.tasks.reconcile_stats
+import page.tasks.refresh_twitter
+import page.tasks.sweep
 import page.threads.thread
 import page.threads.thread_atom
 import page.users.signin
@@ -78,7 +87,6 @@ pages = [
     ('/(' + re_paste + ').atom', page.pastes.paste_atom.PasteAtom),
     ('/(' + re_paste + ')/diff', page.pastes.remote_diff.RemoteDiff),
     ('/(' + re_paste + ')/diff/(' + re_paste + ')', page.pastes.diff.Diff),
-    ('/(' + re_paste + ')/recount', page.pastes.recount.Recount),
     ('/(' + re_paste + ')/update', page.pastes.update.Update),
     # Users
     ('/users/(' + re_user + ')', page.users.user.User),
@@ -86,6 +94,18 @@ pages = [
     ('/threads/(' + re_paste + ')', page.threads.thread.Thread),
     ('/threads/(' + re_paste + ').atom', page.threads.thread_atom.ThreadAtom),
     ('/sitemap.xml', page.pastes.sitemap.Sitemap),
+    # Stats
+    ('/stats', page.stats.index.Index),
+    ('/stats.json', page.stats.index_json.IndexJson),
+    # Background tasks, only open to admins (see app.yaml)
+    ('/tasks/colorize/(' + re_paste + ')', page.pastes.colorize.Colorize),
+    ('/tasks/count-forks/(' + re_paste + ')', page.pastes.count_forks.CountForks),
+    ('/tasks/recount/(' + re_paste + ')', page.pastes.recount.Recount),
+    ('/tasks/migrate', page.tasks.migrate.Migrate),
+    ('/tasks/reconcile-breakdowns', page.tasks.reconcile_breakdowns.ReconcileBreakdowns),
+    ('/tasks/reconcile-stats', page.tasks.reconcile_stats.ReconcileStats),
+    ('/tasks/refresh-twitter', page.tasks.refresh_twitter.RefreshTwitter),
+    ('/tasks/sweep', page.tasks.sweep.Sweep),
     ('/sign-in', page.users.signin.SignIn),
     ('/sign-up', page.users.signup.SignUp),
     ('/sign-out', page.users.signout.SignOut),
@@ -20,9 +20,12 @@ import pygments.lexers
 import pygments.formatters
 
 import app
+import app.cache
+import app.counter
 import app.form
 import app.model
 import app.pasty
+import app.summaries
 import app.syhili
 import app.tag
 import app.web
@@ -30,7 +33,6 @@ import recaptcha.client.captcha
 import settings
 import smoid
 
-app.form.make_token()
 
 class Add (app.web.RequestHandler):
 
@@ -40,6 +42,7 @@ class Add (app.web.RequestHandler):
         self.form_code = ""
         self.form_title = ""
         self.form_tags = ""
+        self.form_expiration = ""
         self.form_parent_slug = ""
         self.form_token = ""
         self.url_parent_slug = ""
@@ -47,14 +50,11 @@ class Add (app.web.RequestHandler):
         self.parent_paste = None
         self.parent_paste_slug = ""
 
-    def delete_old_forms (self):
-        qforms = app.model.Form.all()
-        qforms.filter("expired_at <", datetime.datetime.now())
-        forms = qforms.fetch(10)
-        for form in forms:
-            form.delete()
-
     def display_form (self):
+        expirations = []
+        for value, label, lifetime in settings.PASTE_EXPIRATIONS:
+            expirations.append({"value": value, "label": label, "is_selected": value == self.form_expiration})
+        self.content["expirations"] = expirations
         self.write_out("./form.html")
 
     def get(self, parent_paste_slug=""):
@@ -68,9 +68,22 @@ class Add (app.web.RequestHandler):
         self.form_parent_slug = self.request.get("pasty_parent_slug")
         self.form_tags = self.request.get("pasty_tags")
         self.form_token = self.request.get("pasty_token")
+        self.form_expiration = self.request.get("pasty_expiration")
         #self.url_parent_slug = self.request.get("fork")
         self.parent_slug = ""
 
+    def get_expiration_date (self, expiration):
+        """
+        Gets when a paste posted now expires given the <expiration> chosen
+        in the form, or None if it never does.
+        """
+
+        date = None
+        for value, label, lifetime in settings.PASTE_EXPIRATIONS:
+            if value == expiration and lifetime != None:
+                date = datetime.datetime.now() + lifetime
+        return date
+
     def get_parent_paste (self):
         parent = None
         self.parent_slug = ""
@@ -80,49 +93,12 @@ class Add (app.web.RequestHandler):
             self.parent_slug = self.form_parent_slug
 
         if self.parent_slug != "":
-            pasties = app.model.Pasty.all()
-            pasties.filter("slug =", self.parent_slug)
-            parent = pasties.get()
+            parent = app.model.Pasty.get_by_slug(self.parent_slug)
 
         return parent
 
     def increment_paste_counter (self):
-        stats = app.model.PasteStats.all()
-        stats.id = 1
-        stat = stats.get()
-        if stat != None:
-            dbnew = app.model.PasteStats(key_name=stat.key().name())
-            dbnew.paste_count = stat.paste_count + 1
-            dbnew.put()
-        else:
-            dbnew = app.model.PasteStats(key_name="c1")
-            dbnew.paste_count = 1
-            dbnew.put()
-
-    def increment_fork_count (self):
-        if self.parent_paste != None:
-            # Increment direct fork count :
-            # children of a paste
-            if self.parent_paste.forks != None:
-                self.parent_paste.forks += 1
-            else:
-                self.parent_paste.forks = 1
-            self.parent_paste.put()
-
-            # Increment indirect fork count:
-            # Going up, from parent to parent
-            parent_slug = self.parent_paste.slug
-            while parent_slug != "":
-                pastes = app.model.Pasty.all()
-                pastes.filter("slug =", parent_slug)
-                fork = pastes.get()
-                if fork:
-                    #logging.info("FORK [" + fork.slug + "] ++indirect_forks to [" + parent_slug + "] NEXT WILL BE: " + fork.parent_paste)
-                    fork.indirect_forks += 1
-                    fork.put()
-                    parent_slug = fork.parent_paste
-                else:
-                    break
+        app.counter.increment(app.counter.kPASTES)
 
     def on_load (self):
         self.get_form_data()
@@ -137,7 +113,10 @@ class Add (app.web.RequestHandler):
             self.path.add(self.parent_paste.title, app.url("%s", self.parent_paste.slug))
             self.path.add("Fork", app.url("%s/fork", self.parent_paste_slug))
 
-        if not self.parent_paste or self.parent_paste.is_forkable():
+        if self.parent_paste and self.parent_paste.is_expired():
+            self.get_410(self.parent_paste.slug)
+
+        elif not self.parent_paste or self.parent_paste.is_forkable():
             if self.form_token == "":
                 self.on_form_not_sent()
             else:
@@ -154,10 +133,10 @@ class Add (app.web.RequestHandler):
         if not self.user.is_logged_in_google:
             self.content["recaptcha"] = recaptcha.client.captcha.displayhtml(settings.RECAPTCHA_PUBLIC_KEY)
 
-        self.content["pasty_token"] = app.form.put_form_token(self.request.remote_addr)
+        self.content["pasty_token"] = app.form.make_token(self.request.remote_addr)
 
         if self.parent_paste != None:
-            self.content["pasty_code"] = cgi.escape(self.parent_paste.code)
+            self.content["pasty_code"] = cgi.escape(self.parent_paste.get_body().code)
             self.content["pasty_title"] = "Fork"
             if self.parent_paste.forks >= 1:
                 self.content["pasty_title"] += str(self.parent_paste.forks + 1)
@@ -176,19 +155,6 @@ class Add (app.web.RequestHandler):
 
         self.display_form()
 
-        self.delete_old_forms()
-
-    def move_all_same_level_forks_down (self):
-        qry = app.model.Pasty.all()
-        qry.filter("thread =", self.parent_paste.thread)
-        qry.filter("thread_position >", self.parent_paste.thread_position + self.parent_paste.indirect_forks)
-        forks = qry.fetch(1000)
-
-        for fork in forks:
-            if fork.slug != self.paste.slug:
-                fork.thread_position = fork.thread_position + 1
-                fork.put()
-
     def on_form_sent (self):
         slug = app.pasty.make_unique_slug(8)
 
@@ -202,9 +168,9 @@ class Add (app.web.RequestHandler):
 
         if self.validate_form():
             self.put_paste(slug)
-            self.increment_fork_count()
+            app.cache.next_generation("summaries")
             if self.parent_paste:
-                self.move_all_same_level_forks_down()
+                app.cache.next_generation("thread/" + self.paste.thread)
             self.increment_paste_counter()
 
             if self.paste.is_private():
@@ -218,9 +184,9 @@ class Add (app.web.RequestHandler):
             self.content["u_add"] = app.url("")
 
             self.write_out("./added.html")
-
-            app.form.delete_token(self.form_token, self.request.remote_addr)
         else:
+            # The token may have been used up by validate_form().
+            self.content["pasty_token"] = app.form.make_token(self.request.remote_addr)
             self.content["recaptcha"] = recaptcha.client.captcha.displayhtml(settings.RECAPTCHA_PUBLIC_KEY)
             self.display_form()
 
@@ -254,19 +220,21 @@ class Add (app.web.RequestHandler):
 
         is_reply = self.form_parent_slug != ""
 
-        self.paste = app.model.Pasty()
+        self.paste = app.model.Pasty(key_name=slug)
+        self.paste.slug = slug
         paste_is_private = self.request.get("submit") == "privately"
 
         self.paste.set_code(self.form_code)
         self.paste.edited_at = datetime.datetime.now()
+        self.paste.expired_at = self.get_expiration_date(self.form_expiration)
         self.paste.edited_by_ip = self.request.remote_addr
         self.paste.forks = 0
         self.paste.indirect_forks = 0
+        self.paste.is_counted = False
         self.paste.parent_paste = ""
         self.paste.posted_at = datetime.datetime.now()
         self.paste.posted_by_ip = self.request.remote_addr
         self.paste.replies = 0
-        self.paste.slug = slug
 
         if not is_reply and paste_is_private:
             self.paste.status = app.model.kPASTE_STATUS_PRIVATE
@@ -286,34 +254,33 @@ class Add (app.web.RequestHandler):
         if is_reply:
             is_first_of_thread = False
             self.paste.parent_paste = self.form_parent_slug
+            self.paste.ancestors = self.parent_paste.get_ancestors() + [self.parent_paste.slug]
+            self.paste.is_fork_counted = False
             self.paste.thread_level = self.parent_paste.thread_level + 1
-            self.paste.thread_position = self.parent_paste.thread_position \
-                                         + self.parent_paste.indirect_forks + 1
+            self.paste.thread_path = app.model.make_thread_path(self.parent_paste.thread_path or "",
+                                                                self.paste.posted_at, slug)
 
             if self.parent_paste.thread == None:
                 self.paste.thread = slug
             else:
                 self.paste.thread = self.parent_paste.thread
         else:
+            # If the paste is not a reply, then it's starting its own thread.
+            self.paste.thread = slug
             self.paste.thread_level = 0
-            self.paste.thread_position = 0
+            self.paste.thread_path = ""
 
-        pasty_key = self.paste.put()
+        pasty_key = app.summaries.put([self.paste])[0]
 
         result = pasty_key != None
 
         if result == True:
-            dbPaste = app.model.Pasty.get(pasty_key)
-            # If the paste is not a reply, then it's starting its own thread.
-            if not is_reply:
-                if dbPaste != None:
-                    dbPaste.thread = slug
-                    dbPaste.put()
-
-            if result == True:
-                task = Task(name = self.paste.slug, method="GET", url = "/" + self.paste.slug + "/recount")
-                task.add(queue_name="paste-recount")
-                self.put_log(dbPaste)
+            task = Task(name = self.paste.slug, method="GET", url = "/tasks/colorize/" + self.paste.slug)
+            task.add(queue_name="paste-colorize")
+            if is_reply:
+                task = Task(name = self.paste.slug, method="GET", url = "/tasks/count-forks/" + self.paste.slug)
+                task.add(queue_name="paste-count-forks")
+            self.put_log(self.paste)
 
         return result
 
@@ -337,13 +304,14 @@ class Add (app.web.RequestHandler):
                 self.content["pasty_captcha_error"] = "Please try again."
                 result = False
 
+        if result == True and len(code) == 0:
+            self.content["pasty_code_error"] = "You must paste some code."
+            result = False
+
+        # Checked last, as a valid token is used up by the check.
         if result == True and not app.form.has_valid_token(self.request.remote_addr, token):
             if token != "":
                 self.content["pasty_error"] = "<strong>Your form has expired</strong>, you probably took too much time to fill it. <a href=\"" + app.url("") + "\"><strong>Refresh this page</strong></a>."
             result = False
 
-        if result == True and len(code) == 0:
-            self.content["pasty_code_error"] = "You must paste some code."
-            result = False
-
         return result
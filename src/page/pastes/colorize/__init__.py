@@ -0,0 +1,75 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+from google.appengine.api.labs import taskqueue
+from google.appengine.ext import db
+import logging
+
+import app
+import app.cache
+import app.model
+import app.pasty
+import app.web.pastes
+
+
+class Colorize (app.web.pastes.PasteRequestHandler):
+    """
+    Finds out the language of a new paste and colors its code. Called from
+    the paste-colorize task queue once the raw paste has been stored.
+    """
+
+    resolve_user = False
+
+    def __init__ (self):
+        app.web.pastes.PasteRequestHandler.__init__(self)
+        self.set_module(__name__ + ".__init__")
+        self.paste = None
+
+    def get (self, paste_slug):
+        self.paste = self.get_paste(paste_slug)
+        self.set_header("Content-Type", "text/plain")
+
+        if self.paste:
+            self.get_200()
+        else:
+            self.get_404()
+
+    def get_200 (self):
+        if not self.paste.is_colorized:
+            try:
+                self.paste = app.pasty.colorize(self.paste.key()) or self.paste
+            except db.Error:
+                # Contention or a datastore timeout: the task is retried.
+                raise
+            except Exception:
+                # Retrying would fail the same way forever; the paste keeps
+                # its plain code, and is counted without a language.
+                logging.exception("Paste " + self.paste.slug + " could not be colorized")
+            # The pastes of the thread list it, colorized or not.
+            app.cache.next_generation("thread/" + (self.paste.thread or self.paste.slug))
+
+        # The paste is counted by language, so it is counted once colorized.
+        if not self.paste.is_counted:
+            try:
+                task = taskqueue.Task(name = self.paste.slug, method="GET", url = "/tasks/recount/" + self.paste.slug)
+                task.add(queue_name="paste-recount")
+            except (taskqueue.TaskAlreadyExistsError, taskqueue.TombstonedTaskError):
+                pass
+
+        self.content["content"] = self.paste.slug + " is colorized as <" + str(self.paste.language) + ">."
+        self.write_out("./200.tpl")
+
+    def get_404 (self):
+        self.error(404)
+        self.write_out("page/txt.tpl")
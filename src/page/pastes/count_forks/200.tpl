@@ -0,0 +1,3 @@
+{% extends "../../txt.tpl" %}
+
+{% block content %}{{ content }}{% endblock %}
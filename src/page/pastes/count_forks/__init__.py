@@ -0,0 +1,70 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+import app
+import app.cache
+import app.model
+import app.pasty
+import app.summaries
+import app.web.pastes
+
+
+class CountForks (app.web.pastes.PasteRequestHandler):
+    """
+    Counts a new fork in the fork counts of the pastes it comes from: the
+    forks of its parent, the indirect forks of every ancestor. Called from
+    the paste-count-forks task queue, so that forking a deep thread doesn't
+    keep the user waiting.
+    """
+
+    resolve_user = False
+
+    def __init__ (self):
+        app.web.pastes.PasteRequestHandler.__init__(self)
+        self.set_module(__name__ + ".__init__")
+        self.paste = None
+
+    def get (self, paste_slug):
+        self.paste = self.get_paste(paste_slug)
+        self.set_header("Content-Type", "text/plain")
+
+        if self.paste:
+            self.get_200()
+        else:
+            self.get_404()
+
+    def get_200 (self):
+        ancestors = []
+        if not self.paste.is_fork_counted:
+            ancestors = self.count_fork()
+
+        self.content["content"] = self.paste.slug + " is counted in " + str(len(ancestors)) + " paste(s)."
+        self.write_out("./200.tpl")
+
+    def get_404 (self):
+        self.error(404)
+        self.write_out("page/txt.tpl")
+
+    def count_fork (self):
+        """
+        Increments the fork counts of the ancestors, and marks the fork as
+        counted. Returns the ancestors that were updated.
+        """
+
+        ancestors = app.pasty.count_fork(self.paste)
+        app.summaries.put_summaries(ancestors)
+        # A paste shows its thread once it has forks.
+        app.cache.next_generation("thread/" + self.paste.thread)
+        return ancestors
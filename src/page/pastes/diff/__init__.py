@@ -12,9 +12,9 @@
 
 
 import cgi
-import difflib
 
 import app
+import app.diff
 import app.model
 import app.util
 import app.web
@@ -40,11 +40,15 @@ class Diff (app.web.RequestHandler):
         self.paste_slugs = []
 
     def get (self, paste1_slug, paste2_slug):
-        self.pastes = [self.get_paste (paste1_slug), self.get_paste (paste2_slug)]
         self.paste_slugs = [paste1_slug, paste2_slug]
+        self.pastes = app.model.Pasty.get_many_by_slugs(self.paste_slugs)
+
+        expired_pastes = [paste for paste in self.pastes if paste != None and paste.is_expired()]
 
         if None in self.pastes:
             self.get_404()
+        elif len(expired_pastes) > 0:
+            self.get_410(expired_pastes[0].slug)
         else:
             unpublic_paste = None
             for paste in self.pastes:
@@ -73,6 +77,7 @@ class Diff (app.web.RequestHandler):
         tpl_pastes = [self.get_template_info_for_paste(0), self.get_template_info_for_paste(1)]
         self.content["pastes"] = tpl_pastes
         self.content["diff"] = self.get_diff()
+        self.content["is_too_large"] = self.content["diff"] == None
 
         self.write_out("./200.html")
 
@@ -100,16 +105,21 @@ class Diff (app.web.RequestHandler):
 
     def get_diff (self):
         """
-        Computes a diff and annotate each line with a line number.
+        Computes a diff and annotate each line with a line number. Returns
+        None if the pastes are too large to diff in time.
         """
 
-        diff = []
-        differ = difflib.Differ()
+        lines = app.diff.compare(self.pastes[0].get_raw_code().splitlines(),
+                                 self.pastes[1].get_raw_code().splitlines(),
+                                 settings.DIFF_MAX_TIME, settings.DIFF_REFINE_MAX_LINES)
+        if lines == None:
+            return None
 
+        diff = []
         lineno1 = 0
         lineno2 = 0
 
-        for line in differ.compare(self.pastes[0].get_raw_code().splitlines(), self.pastes[1].get_raw_code().splitlines()):
+        for line in lines:
             line_start = line[0:2]
 
             if line_start == "- ":
@@ -120,9 +130,6 @@ class Diff (app.web.RequestHandler):
                 lineno2 += 1
                 diff.append( ["", lineno2, line] )
 
-            elif line_start == "? ":
-                pass
-
             else:
                 lineno1 += 1
                 lineno2 += 1
@@ -135,10 +142,7 @@ class Diff (app.web.RequestHandler):
         Retrieves a paste from the datastore given its slug.
         """
 
-        qry_paste = app.model.Pasty.all()
-        qry_paste.filter("slug =", slug)
-
-        return qry_paste.get()
+        return app.model.Pasty.get_by_slug(slug)
 
     def get_template_info_for_paste (self, paste_index):
         """
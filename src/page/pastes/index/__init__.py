@@ -12,9 +12,14 @@
 
 
 import cgi
+from google.appengine.api import memcache
+from google.appengine.ext import db
 
 import app
+import app.cache
+import app.counter
 import app.model
+import app.summaries
 import app.util
 import app.web
 import app.web.ui
@@ -31,6 +36,8 @@ class Index (app.web.RequestHandler):
         app.web.RequestHandler.__init__(self)
         self.set_module(__name__ + ".__init__")
         self.page = 1
+        self.page_cursors = {}
+        self.cursor_generation = None
         self.pastes_per_page = 10
         self.paste_count = 0
 
@@ -58,41 +65,135 @@ class Index (app.web.RequestHandler):
 
     def get_paste_count (self):
         """
-        Retrieve the total paste count from the datastore.
+        Retrieve the total paste count from the paste counter.
         """
 
-        count = 0
-        stats = app.model.PasteStats.all()
-        stats.id = 1
-        stat = stats.get()
-        if stat != None:
-            count = stat.paste_count
-        return count
+        return app.counter.get_count(app.counter.kPASTES)
+
+    def fetch_page (self, cursor):
+        """
+        Fetches the pastes of the current page, starting from <cursor>, and
+        keeps the cursor of the next page.
+        """
+
+        qry = app.model.PasteSummary.all()
+        qry.order("-posted_at")
+        if cursor:
+            qry.with_cursor(cursor)
+        dbpastes = qry.fetch(self.pastes_per_page)
+
+        next_cursor = qry.cursor()
+        self.page_cursors[self.page + 1] = next_cursor
+        memcache.set(self.get_cursor_key(self.page + 1), next_cursor, settings.PASTE_INDEX_CURSOR_CACHE_TIME)
+
+        return dbpastes
+
+    def get_cursor_key (self, page):
+        """
+        Gets the memcache key of the cursor of a page. Every new or deleted
+        paste moves the pastes to other pages, so the cursors are keyed by
+        a generation bumped when it happens.
+        """
+
+        if self.cursor_generation == None:
+            self.cursor_generation = app.cache.get_generation("summaries")
+        return "summaries/cursor/" + str(self.cursor_generation) + "/" + str(page)
+
+    def get_page_cursor (self, page):
+        """
+        Gets the cursor at the start of a page. Cursors are cached for the
+        pages viewed and every PASTE_INDEX_CURSOR_STEP pages: a page whose
+        cursor isn't cached is reached from the closest one before it, with
+        keys only queries. No more than PASTE_INDEX_MAX_CURSOR_HOPS queries
+        are made, so a page too far away is replaced by the last page they
+        reach, and the next pages are reached from there. Returns the page
+        and its cursor.
+        """
+
+        if page <= 1:
+            return 1, None
+
+        cursor = memcache.get(self.get_cursor_key(page))
+        if cursor != None:
+            return page, cursor
+
+        step = settings.PASTE_INDEX_CURSOR_STEP
+        steps = range(1 + step, page, step)
+        cached_cursors = memcache.get_multi([self.get_cursor_key(p) for p in steps])
+
+        start_page = 1
+        for p in reversed(steps):
+            if self.get_cursor_key(p) in cached_cursors:
+                start_page = p
+                cursor = cached_cursors[self.get_cursor_key(p)]
+                break
+
+        hops = 0
+        while start_page < page:
+            if hops >= settings.PASTE_INDEX_MAX_CURSOR_HOPS:
+                return start_page, cursor
+            hops += 1
+
+            next_page = min(start_page + step, page)
+            key_count = (next_page - start_page) * self.pastes_per_page
+
+            qry = app.model.PasteSummary.all(keys_only=True)
+            qry.order("-posted_at")
+            if cursor:
+                qry.with_cursor(cursor)
+            keys = qry.fetch(key_count)
+
+            cursor = qry.cursor()
+            memcache.set(self.get_cursor_key(next_page), cursor, settings.PASTE_INDEX_CURSOR_CACHE_TIME)
+
+            # Past the last paste.
+            if len(keys) < key_count:
+                break
+
+            start_page = next_page
+
+        return page, cursor
 
     def get_pastes (self):
         """
-        Retrieve the pastes for the current page.
+        Retrieve the pastes for the current page, from the cursor in the
+        page link if there is one. The first page is taken from the latest
+        pastes kept in memcache.
         """
 
         pastes = []
+        dbpastes = None
+
+        cursor = self.request.get("cursor")
+        if cursor != "":
+            try:
+                dbpastes = self.fetch_page(cursor)
+            except (db.BadRequestError, db.BadValueError):
+                dbpastes = None
 
-        db = app.model.Pasty.all()
-        db.order("-posted_at")
-        dbpastes = db.fetch(self.pastes_per_page, (self.page - 1) * self.pastes_per_page)
+        if dbpastes == None and self.page == 1:
+            dbpastes = app.summaries.get_recent(self.pastes_per_page)
+
+        if dbpastes == None:
+            self.page, cursor = self.get_page_cursor(self.page)
+            dbpastes = self.fetch_page(cursor)
 
         if dbpastes != None:
             for opaste in dbpastes:
+                if opaste.is_expired():
+                    continue
+
                 dpaste = {}
                 dpaste["title"] = opaste.get_title()
                 dpaste["u"] = opaste.get_url()
                 dpaste["snippet"] = opaste.get_snippet()
 
-                if opaste.user:
-                    dpaste["u_user"] = app.url("users/%s", opaste.user.id)
+                if opaste.user_id:
+                    dpaste["u_user"] = app.url("users/%s", opaste.user_id)
                 dpaste["user_name"] = opaste.posted_by_user_name
 
-                if opaste.user:
-                    dpaste["u_gravatar"] = opaste.user.get_gravatar(16)
+                if opaste.user_id:
+                    dpaste["u_gravatar"] = opaste.get_gravatar(16)
 
                 dpaste["u_language_icon"] = opaste.get_icon_url()
 
@@ -115,6 +216,22 @@ class Index (app.web.RequestHandler):
                 pastes.append(dpaste)
         return pastes
 
+    def get_paging_cursors (self, paging):
+        """
+        Gets the cached cursors of the pages around the current one.
+        """
+
+        pages = range(max(2, self.page - paging.cursor_margin), self.page + paging.cursor_margin + 2)
+        cached_cursors = memcache.get_multi([self.get_cursor_key(p) for p in pages])
+
+        cursors = {}
+        for p in pages:
+            if self.get_cursor_key(p) in cached_cursors:
+                cursors[p] = cached_cursors[self.get_cursor_key(p)]
+        cursors.update(self.page_cursors)
+
+        return cursors
+
     def make_paging (self):
         """
         Makes the paging UI component.
@@ -128,6 +245,8 @@ class Index (app.web.RequestHandler):
         paging.right_margin = 2
         paging.cursor_margin = 1
         paging.page_url = app.url("pastes/?page={page}")
+        paging.cursor_page_url = app.url("pastes/?page={page}&amp;cursor={cursor}")
+        paging.cursors = self.get_paging_cursors(paging)
         paging.prepare()
 
         return paging
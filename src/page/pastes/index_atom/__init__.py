@@ -14,7 +14,9 @@
 import cgi
 
 import app
+import app.counter
 import app.model
+import app.summaries
 import app.util
 import app.web
 import app.web.ui
@@ -27,6 +29,8 @@ class IndexAtom (app.web.RequestHandler):
     A listing of the pastes as an atom feed.
     """
 
+    resolve_user = False
+
     def __init__ (self):
         app.web.RequestHandler.__init__(self)
         self.set_module(__name__ + ".__init__")
@@ -45,16 +49,10 @@ class IndexAtom (app.web.RequestHandler):
 
     def get_paste_count (self):
         """
-        Retrieve the total paste count from the datastore.
+        Retrieve the total paste count from the paste counter.
         """
 
-        count = 0
-        stats = app.model.PasteStats.all()
-        stats.id = 1
-        stat = stats.get()
-        if stat != None:
-            count = stat.paste_count
-        return count
+        return app.counter.get_count(app.counter.kPASTES)
 
     def get_pastes (self):
         """
@@ -63,9 +61,7 @@ class IndexAtom (app.web.RequestHandler):
 
         pastes = []
 
-        db = app.model.Pasty.all()
-        db.order("-posted_at")
-        dbpastes = db.fetch(10, 0)
+        dbpastes = app.summaries.get_recent(10)
 
         if dbpastes != None:
             for opaste in dbpastes:
@@ -74,13 +70,13 @@ class IndexAtom (app.web.RequestHandler):
                 dpaste["u"] = opaste.get_url()
                 dpaste["snippet"] = opaste.get_snippet()
 
-                if opaste.user:
-                    dpaste["user_name"] = opaste.user.id
+                if opaste.user_id:
+                    dpaste["user_name"] = opaste.user_id
                 else:
                     dpaste["user_name"] = opaste.posted_by_user_name
 
-                if opaste.user:
-                    dpaste["u_gravatar"] = opaste.user.get_gravatar(16)
+                if opaste.user_id:
+                    dpaste["u_gravatar"] = opaste.get_gravatar(16)
 
                 dpaste["u_language_icon"] = opaste.get_icon_url()
 
@@ -12,6 +12,7 @@
 
 import cgi
 import datetime
+from google.appengine.api import memcache
 import logging
 
 import smoid.languages
@@ -22,6 +23,7 @@ import app.util
 import app.web
 import app.web.pastes
 import app.web.ui
+import settings
 
 class List (app.web.pastes.PasteListRequestHandler):
 
@@ -35,15 +37,18 @@ class List (app.web.pastes.PasteListRequestHandler):
         self.paste_sep = "%2B"
 
     def get (self, slugs):
-        self.paste_slugs = set(slugs.split(self.paste_sep))
-
-        # Retrieve the pastes from the datastore
-        for slug in self.paste_slugs:
+        self.paste_slugs = []
+        for slug in slugs.split(self.paste_sep):
             slug = slug.strip()
-            if slug != "":
-                p = self.get_paste(slug)
-                if p != None:
-                    self.pastes.append(p)
+            if slug != "" and not slug in self.paste_slugs:
+                self.paste_slugs.append(slug)
+            if len(self.paste_slugs) >= settings.PASTE_LIST_MAX_SLUGS:
+                break
+
+        # Retrieve the pastes from the datastore, all at once
+        for p in app.model.Pasty.get_many_by_slugs(self.paste_slugs):
+            if p != None and not p.is_expired():
+                self.pastes.append(p)
 
         self.paste_count = len(self.pastes)
         if self.paste_count == 1:
@@ -58,19 +63,19 @@ class List (app.web.pastes.PasteListRequestHandler):
         At least two pastes have been found in the list.
         """
 
-        self.tpl_pastes = self.templatize_pastes (self.pastes)
+        fragments = self.get_code_fragments()
 
+        self.tpl_pastes = []
         global_size = 0
         global_line_count = 0
-        ui_code = app.web.ui.Code()
-        i = 0
         for p in self.pastes:
-            line_nos, code_lines = ui_code.format_code(p.code_colored)
-            self.tpl_pastes[i]["lines"] = line_nos
-            self.tpl_pastes[i]["code"] = code_lines
-            global_size += p.characters
-            global_line_count += p.lines
-            i += 1
+            tpl_paste = {}
+            tpl_paste["slug"] = p.slug
+            tpl_paste["u"] = p.get_url()
+            tpl_paste["code_fragment"] = fragments[p.slug]
+            self.tpl_pastes.append(tpl_paste)
+            global_size += p.characters or 0
+            global_line_count += p.lines or 0
 
         self.content["pastes"] = self.tpl_pastes
         self.content["global_size"] = app.util.make_filesize_readable(global_size)
@@ -78,6 +83,41 @@ class List (app.web.pastes.PasteListRequestHandler):
 
         self.write_out("./200.html")
 
+    def get_code_fragments (self):
+        """
+        Gets the rendered code of each paste, by slug. A public paste renders
+        the same for everyone, so it is cached until it is edited. Only the
+        bodies of the pastes missing from memcache are fetched, at once.
+        """
+
+        cache_keys = {}
+        for p in self.pastes:
+            if p.is_public() and p.is_colorized:
+                cache_keys[p.slug] = p.get_cache_key("list")
+
+        fragments = {}
+        cached = memcache.get_multi(cache_keys.values())
+        for slug, cache_key in cache_keys.items():
+            if cache_key in cached:
+                fragments[slug] = cached[cache_key]
+
+        missing = [p for p in self.pastes if not p.slug in fragments]
+        app.model.Pasty.load_bodies(missing)
+
+        rendered = {}
+        for p, tpl_paste in zip(missing, self.templatize_pastes(missing)):
+            code_lines = p.get_formatted_code()
+            tpl_paste["lines"] = app.web.ui.get_line_numbers(code_lines.count("\n"))
+            tpl_paste["code"] = code_lines
+            fragments[p.slug] = self.render("./code.html", {"paste": tpl_paste})
+            if p.slug in cache_keys:
+                rendered[cache_keys[p.slug]] = fragments[p.slug]
+
+        if len(rendered) > 0:
+            memcache.set_multi(rendered, settings.PASTE_CACHE_TIME)
+
+        return fragments
+
     def get_404 (self):
         """
         No paste (none) has been found.
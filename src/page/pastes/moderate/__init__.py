@@ -11,6 +11,8 @@
 # License for more details.
 
 
+import app.cache
+import app.summaries
 import app.web
 
 
@@ -48,4 +50,8 @@ class Moderate (app.web.pastes.PasteRequestHandler):
 
     def moderate_paste (self):
         self.paste.status = app.model.kPASTE_STATUS_MODERATED
-        return self.paste.put()
+        self.paste.revision += 1
+        key = app.summaries.put([self.paste])[0]
+        # The pastes of the thread list it with its status.
+        app.cache.next_generation("thread/" + (self.paste.thread or self.paste.slug))
+        return key
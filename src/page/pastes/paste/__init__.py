@@ -13,13 +13,16 @@
 
 import cgi
 import datetime
+from google.appengine.api import memcache
 import logging
 
 import app
+import app.cache
 import app.lang
 import app.model
 import app.util
 import app.web
+import app.web.ui
 import settings
 import smoid.languages
 
@@ -28,139 +31,45 @@ class Paste (app.web.RequestHandler):
 
     def __init__ (self):
         app.web.RequestHandler.__init__(self)
+        self.lists_unclosed = []
         self.set_module(__name__ + ".__init__")
         self.highlights = set([])
         self.has_edited_lines = False
         self.has_highlights = False
         self.edited_lines = {}
-        self.lines = []
         self.line_count = 0
         self.parent = None
         self.path.add("Pastes", app.url("pastes/"))
 
-    def format_complex_code (self, highlights):
-        r_code = ""
-        r_lines = ""
-
-        for i, line in enumerate(self.lines):
-            j = i + 1
-            r_lines += "<a href=\"#l" + str(j) + "\" name=\"l" + str(j) + "\">" + str(j) + "</a>\n"
-
-            if str(i) in highlights:
-                r_code += """<span class="hl">""" + line + "</span>\n"
-            else:
-                r_code += self.format_line_start(line) + "\n"
-
-        return (r_lines, r_code)
-
-    def format_line_start (self, line):
-        """
-        Make whitespaces print right in HTML:
-        * Replace spaces with <&nbsp;>
-        * Replace tabs with three <&nbsp;>
-        """
-        result = ""
-
-        for i, char in enumerate(line):
-            if char == " ":
-                result += "&nbsp;"
-            elif char == "\t":
-                result += "&nbsp;&nbsp;&nbsp;"
-            else:
-                result += line[i:]
-                break
-
-        return result
-
-    def format_simple_code(self):
-        """
-        Make whitespaces at line starts print right in HTML.
-        """
-
-        r_lines = ""
-        r_code = ""
-
-        for i, line in enumerate(self.lines):
-            j = i + 1
-            r_lines += "<a href=\"#l" + str(j) + "\" name=\"l" + str(j) + "\">"
-            r_lines += str(j)
-            r_lines += "</a>\n"
-
-            if line == "":
-                r_code += "\n"
-            else:
-                r_code += self.format_line_start(line) + "\n"
-
-        return (r_lines, r_code)
-
     def get (self, pasty_slug):
-        pasties = app.model.Pasty.all()
-        pasties.filter("slug =", pasty_slug)
-        self.pasty = pasties.get()
+        self.pasty = app.model.Pasty.get_by_slug(pasty_slug)
         self.pasty_slug = pasty_slug
         self.get_parent_paste()
 
         if self.pasty == None:
             self.get_404()
+        elif self.pasty.is_expired():
+            self.get_410(pasty_slug)
         else:
             self.get_200()
 
     def get_200 (self):
         self.secret_key = self.request.get("key")
-        user_is_poster = (self.pasty.user and self.user.db_user and self.pasty.user.id == self.user.db_user.id)
-
-        self.lines = self.pasty.code_colored.splitlines()
-        lines = ""
-        code = ""
-
-        highlights = self.pasty.get_parsed_highlights()
-        complex_formating = len(highlights) > 0
-
-        if complex_formating:
-            (lines, code) = self.format_complex_code(highlights)
-        else:
-            (lines, code) = self.format_simple_code()
-
-        if self.pasty.parent_paste or self.pasty.forks > 0:
-            thread_pastes = self.get_thread_pastes()
-        else:
-            thread_pastes = []
 
         tpl_paste = {}
-        tpl_paste["u"] = self.pasty.get_url()
-        tpl_paste["u_fork"] = self.pasty.get_fork_url()
         tpl_paste["u_raw_text"] = app.url("%s.txt", self.pasty_slug)
         tpl_paste["u_atom"] = app.url("%s.atom", self.pasty_slug)
         tpl_paste["slug"] = self.pasty.slug
         tpl_paste["title"] = self.pasty.get_title()
         tpl_paste["loc"] = self.pasty.lines
-        tpl_paste["lines"] = lines
-        tpl_paste["code"] = code
-        tpl_paste["size"] = app.util.make_filesize_readable(self.pasty.characters)
         tpl_paste["pasted_at"] = self.pasty.posted_at.strftime(settings.DATE_FORMAT)
-        tpl_paste["is_diffable"] = self.pasty.is_diffable()
-        tpl_paste["is_moderated"] = self.pasty.is_moderated()
-        tpl_paste["is_private"] = self.pasty.is_private()
-        tpl_paste["is_public"] = self.pasty.is_public()
-        tpl_paste["is_waiting_for_approval"] = self.pasty.is_waiting_for_approval()
-        tpl_paste["is_code_viewable"] = self.pasty.is_code_viewable()
 
         tpl_paste["language"] = {}
-        tpl_paste["language"]["u"] = self.pasty.get_language_url()
-        tpl_paste["language"]["u_icon"] = self.pasty.get_icon_url()
         tpl_paste["language"]["name"] = self.pasty.get_language_name()
 
-        tpl_paste["thread"] = {}
-        tpl_paste["thread"]["length"] = len(thread_pastes)
-
         self.content["paste"] = tpl_paste
-        self.content["is_thread"] = len(thread_pastes) > 1
-        self.content["thread_paste_count"] = len(thread_pastes)
-        self.content["u_thread_atom"] = app.url("threads/%s.atom", self.pasty.thread)
-        self.content["u_thread"] = app.url("threads/%s", self.pasty.thread)
+        self.content["paste_content"] = self.get_content_fragment()
         self.content["u_remote_diff"] = app.url("%s/diff", self.pasty.slug)
-        if self.content["is_thread"] == True:
-            self.content["thread_pastes"] = thread_pastes
         self.content["h1"] = "p" + self.pasty_slug
         self.content["user_name"] = self.pasty.posted_by_user_name
         if self.pasty.user:
@@ -175,6 +84,27 @@ class Paste (app.web.RequestHandler):
         self.path.add(self.pasty.get_title(), self.pasty.get_url())
         self.write_out("./200.html")
 
+    def get_content_fragment (self):
+        """
+        Gets the rendered code and thread of the paste. The rendering of a
+        public paste doesn't depend on who is viewing it, so it is cached
+        until the paste is edited or its thread is forked.
+        """
+
+        if not self.pasty.is_public() or not self.pasty.is_colorized:
+            return self.render_content_fragment()
+
+        thread_slug = self.pasty.thread or self.pasty.slug
+        thread_generation = app.cache.get_generation("thread/" + thread_slug)
+        cache_key = self.pasty.get_cache_key("content/" + str(thread_generation))
+
+        fragment = memcache.get(cache_key)
+        if fragment == None:
+            fragment = self.render_content_fragment()
+            memcache.set(cache_key, fragment, settings.PASTE_CACHE_TIME)
+
+        return fragment
+
     def get_404 (self):
         self.path.add("Paste not found")
         self.error(404)
@@ -185,9 +115,72 @@ class Paste (app.web.RequestHandler):
 
     def get_parent_paste (self):
         if self.pasty != None and self.pasty.parent_paste != "":
-            qparent = app.model.Pasty.all()
-            qparent.filter("slug =", self.pasty.parent_paste)
-            self.parent = qparent.get()
+            self.parent = app.model.Pasty.get_by_slug(self.pasty.parent_paste)
+
+    def highlight_lines (self, code, highlights):
+        """
+        Wraps the lines of <code> whose index is in <highlights> in a
+        highlight span.
+        """
+
+        lines = code.split("\n")
+        for i in highlights:
+            i = int(i)
+            if i < len(lines) - 1:
+                lines[i] = "<span class=\"hl\">" + lines[i] + "</span>"
+        return "\n".join(lines)
+
+    def render_content_fragment (self):
+        """
+        Renders the code and the thread of the paste, without any of the
+        per-user page chrome.
+        """
+
+        code = self.pasty.get_formatted_code()
+        lines = app.web.ui.get_line_numbers(code.count("\n"))
+
+        highlights = self.pasty.get_parsed_highlights()
+        if len(highlights) > 0:
+            code = self.highlight_lines(code, highlights)
+
+        if self.pasty.parent_paste or self.pasty.forks > 0:
+            thread_pastes = self.get_thread_pastes()
+        else:
+            thread_pastes = []
+
+        tpl_paste = {}
+        tpl_paste["u"] = self.pasty.get_url()
+        tpl_paste["u_fork"] = self.pasty.get_fork_url()
+        tpl_paste["u_raw_text"] = app.url("%s.txt", self.pasty_slug)
+        tpl_paste["slug"] = self.pasty.slug
+        tpl_paste["loc"] = self.pasty.lines
+        tpl_paste["lines"] = lines
+        tpl_paste["code"] = code
+        tpl_paste["is_moderated"] = self.pasty.is_moderated()
+        tpl_paste["is_private"] = self.pasty.is_private()
+        tpl_paste["is_waiting_for_approval"] = self.pasty.is_waiting_for_approval()
+        tpl_paste["is_code_viewable"] = self.pasty.is_code_viewable()
+
+        tpl_paste["language"] = {}
+        tpl_paste["language"]["u_icon"] = self.pasty.get_icon_url()
+        tpl_paste["language"]["name"] = self.pasty.get_language_name()
+
+        tpl_paste["thread"] = {}
+        tpl_paste["thread"]["length"] = len(thread_pastes)
+
+        fragment = {}
+        fragment["paste"] = tpl_paste
+        fragment["is_thread"] = len(thread_pastes) > 1
+        fragment["u_thread_atom"] = app.url("threads/%s.atom", self.pasty.thread)
+        fragment["u_thread"] = app.url("threads/%s", self.pasty.thread)
+        if fragment["is_thread"] == True:
+            fragment["thread_pastes"] = thread_pastes
+            fragment["lists_unclosed"] = self.lists_unclosed
+        fragment["user_name"] = self.pasty.posted_by_user_name
+        if self.pasty.user:
+            fragment["u_user"] = app.url("users/%s", self.pasty.user.id)
+
+        return self.render("./content.html", fragment)
 
     def get_thread_pastes (self):
         default_chars = self.pasty.characters
@@ -196,14 +189,14 @@ class Paste (app.web.RequestHandler):
         pastes = []
         dbqry = app.model.Pasty.all()
         dbqry.filter("thread =", self.pasty.thread)
-        dbqry.order("thread_position")
-        dbpastes = dbqry.fetch(1000)
+        dbqry.order("thread_path")
 
         cur_level = 0
-        paste_count = len(dbpastes)
-        i = 1
         lists_opened = 0
-        for dbpaste in dbpastes:
+        for dbpaste in dbqry:
+            if dbpaste.is_expired():
+                continue
+
             lpaste = {}
             lpaste["title"] = dbpaste.title
             lpaste["slug"] = dbpaste.slug
@@ -239,6 +232,6 @@ class Paste (app.web.RequestHandler):
                 lists_opened -= 1
             pastes.append(lpaste)
 
-        self.content["lists_unclosed"] = xrange(0, lists_opened)
+        self.lists_unclosed = xrange(0, lists_opened)
 
         return pastes
@@ -23,16 +23,17 @@ class PasteAtom (app.web.RequestHandler):
     Displays an atom feed representing the current paste.
     """
 
+    resolve_user = False
+
     def get(self, pasty_slug):
         self.set_module(__name__ + ".__init__")
-        pasties = app.model.Pasty.all()
-        pasties.filter("slug =", pasty_slug)
-
-        self.pasty = pasties.get()
+        self.pasty = app.model.Pasty.get_by_slug(pasty_slug)
         self.pasty_slug = pasty_slug
 
         if self.pasty == None:
             self.get_404()
+        elif self.pasty.is_expired():
+            self.get_410_txt(pasty_slug)
         else:
             self.get_200()
 
@@ -17,12 +17,21 @@ import datetime
 
 import app
 import app.model
+import app.stats
 import app.util
 import app.web.pastes
 import settings
 
 
 class Recount (app.web.pastes.PasteRequestHandler):
+    """
+    Adds a new paste to the paste counts of its hour, day and month, and of
+    its language and user. Queued by the colorize task, once the language is
+    known; the counts are repaired now and then by the /tasks/reconcile-stats
+    cron job.
+    """
+
+    resolve_user = False
 
     def __init__ (self):
         app.web.pastes.PasteRequestHandler.__init__(self)
@@ -44,19 +53,15 @@ class Recount (app.web.pastes.PasteRequestHandler):
             self.get_404()
 
     def get_200 (self):
-        self.pastes_in_hour = 0
-        self.pastes_in_day = 0
-        self.pastes_in_month = 0
-        self.pastes_in_year = 0
+        if not self.paste.is_counted:
+            app.stats.add_paste(self.paste.key())
+        counts = app.stats.get_counts(app.stats.get_paths(self.paste.posted_at))
+        self.pastes_in_hour, self.pastes_in_day, self.pastes_in_month = counts
 
         self.day_start, self.day_end = self.get_day()
         self.hour_start, self.hour_end = self.get_hour()
         self.month_start, self.month_end = self.get_month()
 
-        self.update_hour()
-        self.update_day()
-        self.update_month()
-
         self.content["pasted_at"] = self.paste.posted_at.strftime(settings.DATETIME_FORMAT)
         self.content["month_start"] = self.month_start.strftime(settings.DATETIME_FORMAT)
         self.content["month_end"] = self.month_end.strftime(settings.DATETIME_FORMAT)
@@ -100,96 +105,3 @@ class Recount (app.web.pastes.PasteRequestHandler):
         month_end += datetime.timedelta(days_in_month - 1, 59, 0, 0, 59, 23)
 
         return month_start, month_end
-
-    def update_hour (self):
-        while True:
-            qry_pastes = app.model.Pasty.all()
-            qry_pastes.filter("posted_at >", self.hour_start)
-            qry_pastes.order("posted_at")
-            db_pastes = qry_pastes.fetch(20)
-            if db_pastes:
-                i = 0
-                for db_paste in db_pastes:
-                    if db_paste.posted_at <= self.hour_end:
-                        i += 1
-                        self.pastes_in_hour += 1
-                    else:
-                        break
-                if i < 20:
-                    break
-
-        hour_path ="hour"
-        hour_path += "/" + str(self.hour_start.year)
-        hour_path += "/" + str(self.hour_start.month)
-        hour_path += "/" + str(self.hour_start.day)
-        hour_path += "." + str(self.hour_start.hour)
-
-        qry_hour = app.model.PasteCount.all()
-        qry_hour.filter("path =", hour_path)
-        hour = qry_hour.get()
-
-        if not hour:
-            hour = app.model.PasteCount()
-            hour.path = hour_path
-
-        hour.last_checked = datetime.datetime.now()
-        hour.count = self.pastes_in_hour
-        hour.put()
-
-    def update_day (self):
-        for hour in xrange(1, 24):
-            hour_path ="hour"
-            hour_path += "/" + str(self.day_start.year)
-            hour_path += "/" + str(self.day_start.month)
-            hour_path += "/" + str(self.day_start.day)
-            hour_path += "." + str(hour)
-
-            qry_hour = app.model.PasteCount.all()
-            qry_hour.filter("path =", hour_path)
-            db_hour = qry_hour.get()
-
-            if db_hour:
-                self.pastes_in_day += db_hour.count
-
-        day_path = "day"
-        day_path += "/" + str(self.day_start.year)
-        day_path += "/" + str(self.day_start.month)
-        day_path += "/" + str(self.day_start.day)
-
-        qry_day = app.model.PasteCount.all()
-        qry_day.filter("path = ", day_path)
-        day = qry_day.get()
-
-        if not day:
-            day = app.model.PasteCount()
-            day.path = day_path
-
-        day.last_checked = datetime.datetime.now()
-        day.count = self.pastes_in_day
-        day.put()
-
-    def update_month (self):
-        days_in_month = calendar.monthrange(self.month_start.year, self.month_start.month)[1]
-
-        self.pastes_in_month = 0
-        for day in xrange(1, days_in_month):
-            day_path ="day/" + str(self.day_start.year) + "/" + str(self.day_start.month) + "/" + str(day)
-            qry_day = app.model.PasteCount.all()
-            qry_day.filter("path =", day_path)
-            db_day = qry_day.get()
-
-            if db_day:
-                self.pastes_in_month += db_day.count
-
-        month_path ="month/" + str(self.day_start.year) + "/" + str(self.day_start.month)
-        qry_month = app.model.PasteCount.all()
-        qry_month.filter("path = ", month_path)
-        month = qry_month.get()
-
-        if not month:
-            month = app.model.PasteCount()
-            month.path = month_path
-
-        month.last_checked = datetime.datetime.now()
-        month.count = self.pastes_in_month
-        month.put()
@@ -13,17 +13,18 @@
 
 import cgi
 import datetime
-import difflib
 import google.appengine.api.urlfetch
 import logging
 
 import smoid.languages
 import app
+import app.diff
 import app.model
 import app.util
 import app.web
 import app.web.pastes
 import app.web.ui
+import settings
 
 
 class RemoteDiff (app.web.pastes.PasteRequestHandler):
@@ -54,7 +55,9 @@ class RemoteDiff (app.web.pastes.PasteRequestHandler):
         self.content["paste_slug"] = self.paste_slug
         self.content["u_paste"] = app.url("%s", slug)
 
-        if self.paste:
+        if self.paste and self.paste.is_expired():
+            self.get_410(slug)
+        elif self.paste:
 
             self.path.add("Pastes", app.url("pastes/"))
             self.path.add(self.paste.get_title(), self.paste.get_url())
@@ -82,6 +85,7 @@ class RemoteDiff (app.web.pastes.PasteRequestHandler):
 
     def get_200 (self):
         self.content["diff"] = self.get_diff()
+        self.content["is_too_large"] = self.content["diff"] == None
         self.content["paste_title"] = self.paste.title
         self.content["paste_size"] = app.util.make_filesize_readable(self.paste.characters)
         self.content["paste_loc"] = self.paste.lines
@@ -95,24 +99,28 @@ class RemoteDiff (app.web.pastes.PasteRequestHandler):
 
     def get_diff (self):
         """
-        Compute a diff and annotate each line with a line number.
+        Compute a diff and annotate each line with a line number. Returns
+        None if the sources are too large to diff in time.
         """
 
         paste_content = self.paste.get_raw_code()
         remote_content = self.remote_content
 
-        diff = []
-        differ = difflib.Differ()
+        lines = app.diff.compare(paste_content.splitlines(), remote_content.splitlines(),
+                                 settings.DIFF_MAX_TIME, settings.DIFF_REFINE_MAX_LINES)
+        if lines == None:
+            return None
 
+        diff = []
         lineno1 = 0
         lineno2 = 0
 
-        for line in differ.compare(paste_content.splitlines(), remote_content.splitlines()):
+        for line in lines:
             line_start = line[0:2]
 
             if line_start == "- ":
                 lineno1 += 1
-                diff.append([lineno1, "", '<span class="cmt">-</span> ' + line[2:]])
+                diff.append([lineno1, "", '<span class="cmt">-</span> ' + cgi.escape(line[2:])])
 
             elif line_start == "+ ":
                 lineno2 += 1
@@ -121,6 +129,6 @@ class RemoteDiff (app.web.pastes.PasteRequestHandler):
             else:
                 lineno1 += 1
                 lineno2 += 1
-                diff.append([lineno1, lineno2, line])
+                diff.append([lineno1, lineno2, cgi.escape(line)])
 
         return diff
@@ -15,10 +15,12 @@ import cgi
 
 import app
 import app.model
+import app.summaries
 import app.web
 
 
 class Sitemap (app.web.RequestHandler):
+    resolve_user = False
 
     def __init__ (self):
         app.web.RequestHandler.__init__(self)
@@ -27,9 +29,7 @@ class Sitemap (app.web.RequestHandler):
     def get (self):
         self.set_header("Content-Type", "text/xml")
 
-        qry = app.model.Pasty.all()
-        qry.order("-edited_at")
-        dbpastes = qry.fetch(100, 0)
+        dbpastes = app.summaries.get_recently_edited(100)
         pastes = []
 
         for dbpaste in dbpastes:
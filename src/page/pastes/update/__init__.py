@@ -16,6 +16,7 @@ import pygments.formatters
 
 import app
 import app.model
+import app.summaries
 import app.util
 import app.web
 import smoid.languages
@@ -42,12 +43,14 @@ class Update (app.web.RequestHandler):
             self.get_404()
 
     def get_200 (self):
+        code = self.paste.get_body().code
         if self.paste.language:
-            self.paste.code_colored = self.prepare_code (self.paste.code, self.paste.language)
-        self.paste.characters = len(self.paste.code)
-        self.paste.lines = self.paste.code.count("\n") + 1
-        self.paste.snippet = app.model.Pasty.make_snippet(self.paste.code, settings.PASTE_SNIPPET_MAX_LENGTH)
-        self.paste.put()
+            self.paste.set_code_colored(self.prepare_code (code, self.paste.language))
+        self.paste.characters = len(code)
+        self.paste.lines = code.count("\n") + 1
+        self.paste.snippet = app.model.Pasty.make_snippet(code, settings.PASTE_SNIPPET_MAX_LENGTH)
+        self.paste.revision += 1
+        app.summaries.put([self.paste])
 
         self.write_out("./200.html")
 
@@ -55,9 +58,7 @@ class Update (app.web.RequestHandler):
         self.write_out("./404.html")
 
     def get_paste (self, pasty_slug):
-        qry_pastes = app.model.Pasty.all()
-        qry_pastes.filter("slug =", pasty_slug)
-        return qry_pastes.get()
+        return app.model.Pasty.get_by_slug(pasty_slug)
 
     def prepare_code(self, code, language):
         result = ""
@@ -0,0 +1,66 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+import app
+import app.model
+import app.web.stats
+
+
+class Index (app.web.stats.StatsRequestHandler):
+    """
+    Shows how many pastes were posted per hour, day or month, and the most
+    used languages and the most active users of the last months.
+    """
+
+    def __init__ (self):
+        app.web.stats.StatsRequestHandler.__init__(self)
+        self.set_module(__name__ + ".__init__")
+
+    def get (self):
+        self.path.add("Stats", app.url("stats"))
+
+        report = self.get_report()
+        if report != None:
+            self.get_200(report)
+        else:
+            self.get_400()
+
+    def get_200 (self, report):
+        max_count = max([point["count"] for point in report["series"]] + [1])
+        series = []
+        for point in report["series"]:
+            series.append({"path": point["path"],
+                           "count": point["count"],
+                           "width": point["count"] * 100 / max_count})
+
+        months = []
+        for month in report["months"]:
+            languages = [{"name": app.model.get_language_name(name) or "Unknown", "count": count}
+                         for name, count in month["languages"]]
+            users = [{"name": name, "u": app.url("users/%s", name), "count": count}
+                     for name, count in month["users"]]
+            months.append({"month": month["month"], "languages": languages, "users": users})
+
+        self.content["unit"] = report["unit"]
+        self.content["series"] = series
+        self.content["months"] = months
+        self.content["u_json"] = app.url("stats.json")
+        if self.request.query_string:
+            self.content["u_json"] += "?" + self.request.query_string
+        self.write_out("./200.html")
+
+    def get_400 (self):
+        self.error(400)
+        self.write_out("./400.html")
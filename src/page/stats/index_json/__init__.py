@@ -0,0 +1,41 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+from django.utils import simplejson
+
+import app.web.stats
+
+
+class IndexJson (app.web.stats.StatsRequestHandler):
+    """
+    The paste stats of /stats as JSON.
+    """
+
+    resolve_user = False
+
+    def __init__ (self):
+        app.web.stats.StatsRequestHandler.__init__(self)
+        self.set_module(__name__ + ".__init__")
+
+    def get (self):
+        self.set_header("Content-Type", "application/json")
+
+        report = self.get_report()
+        if report == None:
+            self.error(400)
+            report = {"error": "Wrong unit, start or end."}
+
+        self.content["content"] = simplejson.dumps(report)
+        self.write_out("./200.tpl")
@@ -0,0 +1,217 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+from google.appengine.api import datastore
+from google.appengine.api.labs.taskqueue import Task
+from google.appengine.ext import db
+import logging
+
+import app
+import app.model
+import app.web
+
+
+class Migrate (app.web.RequestHandler):
+    """
+    Upgrades the stored pastes to the current datastore layout, one batch at a
+    time. Each batch queues the next one until every paste has been visited.
+    """
+
+    resolve_user = False
+
+    def __init__ (self):
+        app.web.RequestHandler.__init__(self)
+        self.set_module(__name__ + ".__init__")
+        self.batch_size = 20
+        self.migrated = 0
+        self.moved = 0
+        self.compressed = 0
+
+    def get (self):
+        qry_pastes = app.model.Pasty.all()
+        qry_pastes.order("__key__")
+        cursor = self.request.get("cursor")
+        if cursor != "":
+            qry_pastes.with_cursor(cursor)
+        pastes = qry_pastes.fetch(self.batch_size)
+
+        self.move_bodies(pastes)
+        self.compress_bodies(pastes)
+        pastes = self.migrate_pastes(pastes)
+        self.put_threads(pastes)
+        self.put_summaries(pastes)
+
+        if len(pastes) == self.batch_size:
+            task = Task(method="GET", url="/tasks/migrate", params={"cursor": qry_pastes.cursor()})
+            task.add()
+
+        self.content["content"] = str(self.migrated) + " paste(s) migrated, " \
+                                  + str(self.moved) + " code(s) moved, " \
+                                  + str(self.compressed) + " code(s) compressed."
+        self.set_header("Content-Type", "text/plain")
+        self.write_out("./200.tpl")
+
+    def compress_bodies (self, pastes):
+        """
+        Compresses the bodies put before the code was compressed.
+        """
+
+        slugs = [paste.slug for paste in pastes if paste.slug != ""]
+        if len(slugs) == 0:
+            return
+
+        bodies = []
+        for body in app.model.PasteBody.get_by_key_name(slugs):
+            if body != None and not body.is_compressed():
+                body.compress()
+                bodies.append(body)
+
+        db.put(bodies)
+        self.compressed += len(bodies)
+
+    def migrate_pastes (self, pastes):
+        """
+        Rekeys the pastes which are not stored with their slug as key name.
+        Returns the pastes of the batch as they are now stored.
+        """
+
+        legacy_pastes = []
+        for paste in pastes:
+            if paste.slug != "" and paste.key().name() != paste.slug:
+                legacy_pastes.append(paste)
+
+        if len(legacy_pastes) > 0:
+            slugs = [paste.slug for paste in legacy_pastes]
+            keyed_pastes = app.model.Pasty.get_by_key_name(slugs)
+
+            new_pastes = []
+            old_keys = []
+            for i, paste in enumerate(legacy_pastes):
+                if keyed_pastes[i] != None or paste.slug in slugs[:i]:
+                    logging.warning("Paste " + paste.slug + " is stored twice, skipping " + str(paste.key()))
+                else:
+                    new_pastes.append(self.rekey_paste(paste))
+                    old_keys.append(paste.key())
+
+            db.put(new_pastes)
+            db.delete(old_keys)
+            self.migrated += len(new_pastes)
+
+            new_pastes_by_slug = dict([(paste.slug, paste) for paste in new_pastes])
+            pastes = [new_pastes_by_slug.get(paste.slug, paste) for paste in pastes]
+
+        return pastes
+
+    def move_bodies (self, pastes):
+        """
+        Moves the code of the pastes still stored with it to a PasteBody, and
+        removes it from the paste. Pastes stored twice keep their code, the
+        copy that is rekeyed is the one moved.
+        """
+
+        pastes = [paste for paste in pastes if paste.slug != ""]
+        if len(pastes) == 0:
+            return
+
+        slugs = [paste.slug for paste in pastes]
+        entities = datastore.Get([paste.key() for paste in pastes])
+        bodies = app.model.PasteBody.get_by_key_name(slugs)
+        keyed_pastes = app.model.Pasty.get_by_key_name(slugs)
+
+        new_bodies = []
+        stripped_entities = []
+        for i, paste in enumerate(pastes):
+            entity = entities[i]
+            names = [name for name in app.model.kPASTE_BODY_PROPERTIES if name in entity]
+
+            is_kept = paste.key().name() == paste.slug \
+                      or (keyed_pastes[i] == None and paste.slug not in slugs[:i])
+            if len(names) == 0 or not is_kept:
+                continue
+
+            # A body put since the paste was loaded is newer than the code
+            # left in the paste.
+            if bodies[i] == None:
+                new_bodies.append(app.model.PasteBody.make_from_entity(paste.slug, entity))
+
+            for name in names:
+                del entity[name]
+            stripped_entities.append(entity)
+
+        # The bodies go first, so that no code is lost if the task fails in
+        # between.
+        db.put(new_bodies)
+        datastore.Put(stripped_entities)
+        self.moved += len(stripped_entities)
+
+    def put_threads (self, pastes):
+        """
+        Stores the thread path of the pastes keyed by their slug, and the
+        ancestors of the forks made before they were stored with them. The
+        thread paths of the forks are made again, since those made before
+        they held the slugs of the pastes don't sort the same.
+        Pastes without a stored thread path are left out of their thread,
+        so the pastes starting a thread are put as well.
+        """
+
+        pastes = [paste for paste in pastes if paste.slug != "" and paste.key().name() == paste.slug]
+
+        forks = []
+        for paste in pastes:
+            if paste.parent_paste:
+                if len(paste.ancestors) == 0:
+                    paste.ancestors = paste.get_ancestors()
+                forks.append(paste)
+
+        slugs = set()
+        for fork in forks:
+            slugs.update(fork.ancestors[1:])
+        posted_ats = {}
+        for ancestor in app.model.Pasty.get_many_by_slugs(list(slugs)):
+            if ancestor != None and ancestor.posted_at != None:
+                posted_ats[ancestor.slug] = ancestor.posted_at
+
+        for fork in forks:
+            if fork.posted_at != None:
+                path = ""
+                for slug in fork.ancestors[1:]:
+                    if slug in posted_ats:
+                        path = app.model.make_thread_path(path, posted_ats[slug], slug)
+                fork.thread_path = app.model.make_thread_path(path, fork.posted_at, fork.slug)
+
+        roots = [paste for paste in pastes if not paste.parent_paste]
+        db.put(forks + roots)
+
+    def put_summaries (self, pastes):
+        """
+        Makes the summaries the paste listings are read from, for the pastes
+        keyed by their slug.
+        """
+
+        summaries = []
+        for paste in pastes:
+            if paste.slug != "" and paste.key().name() == paste.slug:
+                summaries.append(app.model.PasteSummary.make(paste))
+        db.put(summaries)
+
+    def rekey_paste (self, paste):
+        """
+        Copies a paste to a new entity keyed by its slug.
+        """
+
+        values = {}
+        for name, prop in app.model.Pasty.properties().iteritems():
+            values[name] = prop.get_value_for_datastore(paste)
+
+        return app.model.Pasty(key_name=paste.slug, **values)
@@ -0,0 +1,53 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+import datetime
+
+import app
+import app.stats
+import app.web
+
+
+class ReconcileBreakdowns (app.web.RequestHandler):
+    """
+    Counts the pastes of a day again by language and by user, for the tally
+    of their month, and queues the next day. Once the month is tallied,
+    fixes its language and user counts. Queued by reconcile-stats, with
+    ?month=YYYY-MM&day=YYYY-MM-DD.
+    """
+
+    resolve_user = False
+
+    def __init__ (self):
+        app.web.RequestHandler.__init__(self)
+        self.set_module(__name__ + ".__init__")
+
+    def get (self):
+        month = datetime.datetime.strptime(self.request.get("month"), "%Y-%m")
+        day = datetime.datetime.strptime(self.request.get("day"), "%Y-%m-%d")
+
+        next_day = app.stats.tally_breakdowns(month, day)
+        if next_day != None:
+            app.stats.queue_tally(month, next_day)
+            self.content["content"] = day.strftime("%Y-%m-%d") + " tallied."
+        else:
+            fixed = app.stats.fix_breakdowns(month)
+            if fixed != None:
+                self.content["content"] = month.strftime("%Y-%m") + ": " + str(fixed) + " language and user count(s) fixed."
+            else:
+                self.content["content"] = day.strftime("%Y-%m-%d") + " already tallied."
+
+        self.set_header("Content-Type", "text/plain")
+        self.write_out("./200.tpl")
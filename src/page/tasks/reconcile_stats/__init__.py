@@ -0,0 +1,63 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+import datetime
+
+import app
+import app.stats
+import app.web
+
+
+class ReconcileStats (app.web.RequestHandler):
+    """
+    Counts the pastes of yesterday and today again, and fixes the paste
+    counts the paste-recount tasks keep up to date. Run by cron. A given day
+    can be reconciled with ?day=YYYY-MM-DD. The language and user counts of
+    their months are fixed by a chain of reconcile-breakdowns tasks.
+    """
+
+    resolve_user = False
+
+    def __init__ (self):
+        app.web.RequestHandler.__init__(self)
+        self.set_module(__name__ + ".__init__")
+
+    def get (self):
+        day = self.request.get("day")
+        if day != "":
+            days = [datetime.datetime.strptime(day, "%Y-%m-%d").date()]
+        else:
+            today = datetime.datetime.now().date()
+            days = [today - datetime.timedelta(days=1), today]
+
+        lines = []
+        months = []
+        for day in days:
+            count = app.stats.reconcile_day(day)
+            lines.append(day.strftime("%Y-%m-%d") + ": " + str(count) + " paste(s).")
+
+            month = datetime.datetime(day.year, day.month, 1)
+            if not month in months:
+                months.append(month)
+
+        for month in months:
+            day = app.stats.start_breakdowns(month)
+            if day != None:
+                app.stats.queue_tally(month, day)
+                lines.append(month.strftime("%Y-%m") + ": counting languages and users again.")
+
+        self.content["content"] = "\n".join(lines)
+        self.set_header("Content-Type", "text/plain")
+        self.write_out("./200.tpl")
@@ -0,0 +1,44 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+import app.twitter
+import app.web
+import settings
+
+
+class RefreshTwitter (app.web.RequestHandler):
+    """
+    Fetches the latest tweet shown at the bottom of the pages. Run by cron,
+    and queued by the pages which find it stale.
+    """
+
+    resolve_user = False
+
+    def __init__ (self):
+        app.web.RequestHandler.__init__(self)
+        self.set_module(__name__ + ".__init__")
+
+    def get (self):
+        if settings.SHOW_TWITTER and settings.TWITTER_ACCOUNT:
+            tweet = app.twitter.refresh()
+            if tweet != None:
+                self.content["content"] = "Latest tweet: " + tweet
+            else:
+                self.content["content"] = "No tweet found."
+        else:
+            self.content["content"] = "Twitter is not shown."
+
+        self.set_header("Content-Type", "text/plain")
+        self.write_out("./200.tpl")
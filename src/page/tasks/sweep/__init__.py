@@ -0,0 +1,74 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+import datetime
+from google.appengine.api.labs.taskqueue import Task
+
+import app
+import app.sweep
+import app.web
+import settings
+
+
+class Sweep (app.web.RequestHandler):
+    """
+    Deletes expired and orphaned entities, SWEEP_BATCH_COUNT batches at a
+    time. Run by cron, it queues a sweep of each kind of garbage; each
+    sweep queues the next one, from where it stopped, on the rate-limited
+    sweep queue until there is nothing left. The sweeps of a run all delete
+    what expired before the run started.
+    """
+
+    date_format = "%Y-%m-%dT%H:%M:%S"
+
+    resolve_user = False
+
+    def __init__ (self):
+        app.web.RequestHandler.__init__(self)
+        self.set_module(__name__ + ".__init__")
+
+    def get (self):
+        kind = self.request.get("kind")
+        try:
+            until = datetime.datetime.strptime(self.request.get("until"), self.date_format)
+        except ValueError:
+            until = None
+
+        if kind in app.sweep.kKINDS and until != None:
+            self.content["content"] = self.sweep(kind, self.request.get("cursor"), until)
+        else:
+            until = datetime.datetime.now().strftime(self.date_format)
+            for kind in app.sweep.kKINDS:
+                task = Task(method="GET", url="/tasks/sweep", params={"kind": kind, "until": until})
+                task.add(queue_name="sweep")
+            self.content["content"] = "Sweeping " + ", ".join(app.sweep.kKINDS) + "."
+
+        self.set_header("Content-Type", "text/plain")
+        self.write_out("./200.tpl")
+
+    def sweep (self, kind, cursor, until):
+        deleted = 0
+        for i in xrange(0, settings.SWEEP_BATCH_COUNT):
+            count, cursor = app.sweep.sweep(kind, cursor, until)
+            deleted += count
+            if cursor == None:
+                break
+
+        if cursor != None:
+            params = {"kind": kind, "cursor": cursor, "until": until.strftime(self.date_format)}
+            task = Task(method="GET", url="/tasks/sweep", params=params, countdown=settings.SWEEP_DELAY)
+            task.add(queue_name="sweep")
+
+        return str(deleted) + " " + kind + " deleted."
@@ -66,11 +66,11 @@ class Thread (app.web.pastes.PasteListRequestHandler):
 
     def get_pastes (self, paste_slug):
         """
-        Fetch all the pastes in the thread.
+        Fetch all the pastes in the thread, each fork after its parent.
         """
 
         qry_pastes = app.model.Pasty.all()
         qry_pastes.filter("thread =", paste_slug)
-        qry_pastes.order("-posted_at")
+        qry_pastes.order("thread_path")
 
-        return qry_pastes.fetch(1000, 0)
+        return [paste for paste in qry_pastes if not paste.is_expired()]
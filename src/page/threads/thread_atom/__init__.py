@@ -19,13 +19,11 @@ import app.web
 
 
 class ThreadAtom (app.web.RequestHandler):
+    resolve_user = False
 
     def get (self, pasty_slug):
         self.set_module(__name__ + ".__init__")
-        pasties = app.model.Pasty.all()
-        pasties.filter("slug =", pasty_slug)
-
-        self.pasty = pasties.get()
+        self.pasty = app.model.Pasty.get_by_slug(pasty_slug)
         self.pasty_slug = pasty_slug
         self.forks = []
 
@@ -67,6 +65,9 @@ class ThreadAtom (app.web.RequestHandler):
 
         if db_forks:
             for db_fork in db_forks:
+                if db_fork.is_expired():
+                    continue
+
                 tpl_fork = {}
                 tpl_fork["u"] = db_fork.get_url()
                 tpl_fork["slug"] = db_fork.slug
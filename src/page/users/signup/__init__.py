@@ -16,6 +16,7 @@ import datetime
 from google.appengine.api import users
 
 import app.model
+import app.user
 import app.web
 
 
@@ -47,7 +48,7 @@ class SignUp (app.web.RequestHandler):
         self.get()
 
     def put_user (self):
-        db_user = app.model.User()
+        db_user = app.model.User(key_name=app.user.get_key_name(self.user.google_id))
         db_user.id = self.request.get("user_id")
         db_user.google_id = self.user.google_id
         db_user.email = self.user.google_email
@@ -55,7 +56,9 @@ class SignUp (app.web.RequestHandler):
         db_user.paste_count = 0
         db_user.registered_at = datetime.datetime.now()
 
-        return db_user.put()
+        key = db_user.put()
+        app.user.forget_db_user(self.user.google_id)
+        return key
 
     def validate_user_id (self, id):
         result = True
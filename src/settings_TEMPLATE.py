@@ -28,12 +28,137 @@ PASTE_CODE_MAX_LINES = 500
 # The maximum size of a paste
 PASTE_CODE_MAX_LENGTH = 100000
 
+# How long a rendered paste stays in memcache (in seconds)
+PASTE_CACHE_TIME = 60 * 60 * 24
+
+# The most pastes a list of pastes (/p1+p2+...) shows, the others are left out
+PASTE_LIST_MAX_SLUGS = 20
+
 # The delay after which a paste form is expired
 PASTE_FORM_EXPIRATION_DELTA = datetime.timedelta(minutes=20)
 
+# When a paste expires, chosen on the paste form: (value, label, lifetime).
+# The first one is the default, a lifetime of None never expires.
+PASTE_EXPIRATIONS = (
+    ("never", "Never", None),
+    ("hour", "In an hour", datetime.timedelta(hours=1)),
+    ("day", "In a day", datetime.timedelta(days=1)),
+    ("week", "In a week", datetime.timedelta(weeks=1)),
+    ("month", "In a month", datetime.timedelta(days=30)),
+)
+
+# The key the paste form tokens are signed with. Left empty, a random key is
+# made and stored in the datastore the first time a form is shown.
+FORM_TOKEN_SECRET = ""
+
+# Whether a paste form can only be sent once (the used tokens are kept in
+# memcache)
+FORM_TOKEN_ONE_TIME = True
+
+# How long the cursors of the pages of the paste index stay in memcache
+# (in seconds)
+PASTE_INDEX_CURSOR_CACHE_TIME = 60 * 60
+
+# The paste index caches the cursor of one page in that many, so that any
+# page can be reached from a close one
+PASTE_INDEX_CURSOR_STEP = 20
+
+# How many of those cursors a request of the paste index may make when they
+# aren't cached: a page further away shows the last page reached instead
+PASTE_INDEX_MAX_CURSOR_HOPS = 5
+
+# How many of the latest pastes are kept in memcache for the paste index, the
+# Atom feed and the sitemap
+PASTE_RECENT_LENGTH = 100
+
+# How long the latest pastes stay in memcache (in seconds)
+PASTE_RECENT_CACHE_TIME = 60 * 10
+
 # The maximum length of a paste snippet
 PASTE_SNIPPET_MAX_LENGTH = 50
 
+# How much of a paste the language detection reads: only the head, the middle
+# and the tail of longer pastes are checked (0 for no limit)
+PASTE_LANGUAGE_DETECTION_MAX_LENGTH = 30000
+
+# How long the language detection may take (in seconds, 0 for no limit)
+PASTE_LANGUAGE_DETECTION_MAX_TIME = 1
+
+# Whether to look up pastes stored before they were keyed by their slug.
+# Set it to False once /tasks/migrate has been run.
+PASTE_LEGACY_SLUG_LOOKUP = True
+
+
+# -----------------------------------------------------------------------------
+# COUNTERS
+# -----------------------------------------------------------------------------
+
+# How many entities a counter is split into. It can be raised, but not
+# lowered once counters have been incremented.
+COUNTER_SHARD_COUNT = 20
+
+# How long the total of a counter stays in memcache (in seconds)
+COUNTER_CACHE_TIME = 60 * 10
+
+
+# -----------------------------------------------------------------------------
+# STATS
+# -----------------------------------------------------------------------------
+
+# How many entities a paste count is split into. Reconciling a count updates
+# all of its shards in a transaction, which can span 5 entity groups at most
+# on the older runtimes, so it can't be more than 5. It can be raised, but
+# not lowered once pastes are counted.
+STATS_SHARD_COUNT = 5
+
+# How many hours, days or months /stats shows when no start is given
+STATS_DEFAULT_POINTS = 30
+
+# The most hours, days or months /stats shows at once
+STATS_MAX_POINTS = 62
+
+# How many of the last months of a range /stats breaks down by language and
+# by user
+STATS_BREAKDOWN_MONTHS = 3
+
+# How many languages and users are shown for a month
+STATS_BREAKDOWN_LENGTH = 10
+
+# How many pastes are fetched at once when counting them again by language
+# and by user
+STATS_RECONCILE_BATCH_SIZE = 500
+
+# How long a stats report stays in memcache (in seconds)
+STATS_CACHE_TIME = 60 * 10
+
+
+# -----------------------------------------------------------------------------
+# DIFFS
+# -----------------------------------------------------------------------------
+
+# How long diffing two pastes, or a paste and a remote file, may take before
+# giving up (in seconds, 0 for no limit)
+DIFF_MAX_TIME = 1
+
+# A block of lines replaced by another is shown line by line, each line
+# followed by the most similar new one, if both have at most that many lines
+# (0 to never match the lines of a block)
+DIFF_REFINE_MAX_LINES = 20
+
+
+# -----------------------------------------------------------------------------
+# SWEEP
+# -----------------------------------------------------------------------------
+
+# How many entities /tasks/sweep deletes at once
+SWEEP_BATCH_SIZE = 100
+
+# How many batches a sweep task deletes before handing over to the next one
+SWEEP_BATCH_COUNT = 5
+
+# How long to wait between two sweep tasks (in seconds)
+SWEEP_DELAY = 10
+
 
 # -----------------------------------------------------------------------------
 # DATES
@@ -59,6 +184,9 @@ USER_NAME_MAX_LENGTH = 100
 # The default user name (when the user is not logged in)
 DEFAULT_USER_NAME = "John Doe"
 
+# How long the user of a Google account stays in memcache (in seconds)
+USER_CACHE_TIME = 60 * 60
+
 
 # -----------------------------------------------------------------------------
 # GOOGLE ANALYTICS
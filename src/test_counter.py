@@ -0,0 +1,70 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+from google.appengine.api import memcache
+from google.appengine.datastore import datastore_stub_util
+from google.appengine.ext import testbed
+import unittest
+
+import app.counter
+import app.model
+
+
+class CounterTest (unittest.TestCase):
+
+    def setUp (self):
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        policy = datastore_stub_util.PseudoRandomHRConsistencyPolicy(probability=1)
+        self.testbed.init_datastore_v3_stub(consistency_policy=policy)
+        self.testbed.init_memcache_stub()
+
+    def tearDown (self):
+        self.testbed.deactivate()
+
+    def test_empty (self):
+        self.assertEqual(app.counter.get_count("test"), 0)
+
+    def test_increment (self):
+        for i in xrange(50):
+            app.counter.increment("test")
+        app.counter.increment("test", 5)
+        self.assertEqual(app.counter.count("test"), 55)
+        self.assertEqual(app.counter.get_count("test"), 55)
+
+    def test_cached (self):
+        app.counter.increment("test")
+        self.assertEqual(app.counter.get_count("test"), 1)
+
+        # Increments update the cached total too.
+        app.counter.increment("test", 2)
+        self.assertEqual(memcache.get("counter/test"), 3)
+        self.assertEqual(app.counter.get_count("test"), 3)
+
+    def test_shards (self):
+        for i in xrange(50):
+            app.counter.increment("test")
+        shards = app.model.CounterShard.all().filter("name =", "test").fetch(100)
+        self.assertTrue(len(shards) > 1)
+        self.assertEqual(sum([shard.count for shard in shards]), 50)
+
+    def test_legacy_count (self):
+        app.model.PasteStats(key_name="c1", paste_count=10).put()
+        app.counter.increment(app.counter.kPASTES)
+        self.assertEqual(app.counter.count(app.counter.kPASTES), 11)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+import random
+import unittest
+
+import app.diff
+
+
+def get_lcs_length (seq1, seq2):
+    """
+    Gets the length of the longest common subsequence of two lists, the
+    slow way.
+    """
+
+    lengths = [[0] * (len(seq2) + 1) for i in xrange(len(seq1) + 1)]
+    for i in xrange(len(seq1) - 1, -1, -1):
+        for j in xrange(len(seq2) - 1, -1, -1):
+            if seq1[i] == seq2[j]:
+                lengths[i][j] = lengths[i + 1][j + 1] + 1
+            else:
+                lengths[i][j] = max(lengths[i + 1][j], lengths[i][j + 1])
+    return lengths[0][0]
+
+
+class CompareTest (unittest.TestCase):
+
+    def check (self, lines1, lines2, refine_max_lines=0):
+        result = app.diff.compare(lines1, lines2, refine_max_lines=refine_max_lines)
+
+        # Both sides can be read back from the result.
+        self.assertEqual([line[2:] for line in result if line[0] in " -"], lines1)
+        self.assertEqual([line[2:] for line in result if line[0] in " +"], lines2)
+
+        # The fewest lines are removed and added.
+        common = len([line for line in result if line[0] == " "])
+        self.assertEqual(common, get_lcs_length(lines1, lines2))
+        return result
+
+    def test_same (self):
+        self.assertEqual(self.check(["a", "b"], ["a", "b"]), ["  a", "  b"])
+
+    def test_empty (self):
+        self.assertEqual(self.check([], []), [])
+        self.assertEqual(self.check([], ["a"]), ["+ a"])
+        self.assertEqual(self.check(["a"], []), ["- a"])
+
+    def test_change (self):
+        self.assertEqual(self.check(["a", "b", "c"], ["a", "x", "c"]),
+                         ["  a", "- b", "+ x", "  c"])
+
+    def test_insert_and_delete (self):
+        self.assertEqual(self.check(["a", "b", "c", "d"], ["b", "c", "e", "d"]),
+                         ["- a", "  b", "  c", "+ e", "  d"])
+
+    def test_random (self):
+        rand = random.Random(1)
+        for i in xrange(200):
+            lines1 = [rand.choice("abcd") for j in xrange(rand.randint(0, 15))]
+            lines2 = [rand.choice("abcd") for j in xrange(rand.randint(0, 15))]
+            self.check(lines1, lines2)
+
+    def test_refine (self):
+        lines1 = ["def foo (a):", "    return a"]
+        lines2 = ["def foo (a, b):", "    return a + b"]
+        result = self.check(lines1, lines2, refine_max_lines=20)
+        self.assertEqual(result, ["- def foo (a):", "+ def foo (a, b):",
+                                  "-     return a", "+     return a + b"])
+
+    def test_refine_max_lines (self):
+        lines1 = ["def foo (a):", "    return a"]
+        lines2 = ["def foo (a, b):", "    return a + b"]
+        result = self.check(lines1, lines2, refine_max_lines=1)
+        self.assertEqual(result, ["- def foo (a):", "-     return a",
+                                  "+ def foo (a, b):", "+     return a + b"])
+
+    def test_max_time (self):
+        lines1 = [str(i) for i in xrange(3000)]
+        lines2 = [str(i) for i in xrange(3000, 6000)]
+        self.assertEqual(app.diff.compare(lines1, lines2, max_time=0.000001), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+from google.appengine.ext import testbed
+import time
+import unittest
+
+import app.form
+import app.model
+import settings
+
+
+class FormTokenTest (unittest.TestCase):
+
+    def setUp (self):
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        self.testbed.init_datastore_v3_stub()
+        self.testbed.init_memcache_stub()
+
+        self.settings = (settings.FORM_TOKEN_SECRET, settings.FORM_TOKEN_ONE_TIME)
+        settings.FORM_TOKEN_SECRET = ""
+        settings.FORM_TOKEN_ONE_TIME = True
+        app.form._secret = None
+
+    def tearDown (self):
+        settings.FORM_TOKEN_SECRET, settings.FORM_TOKEN_ONE_TIME = self.settings
+        app.form._secret = None
+        self.testbed.deactivate()
+
+    def test_valid (self):
+        token = app.form.make_token("1.2.3.4")
+        self.assertTrue(app.form.has_valid_token("1.2.3.4", token))
+
+    def test_one_time (self):
+        token = app.form.make_token("1.2.3.4")
+        self.assertTrue(app.form.has_valid_token("1.2.3.4", token))
+        self.assertFalse(app.form.has_valid_token("1.2.3.4", token))
+
+    def test_many_times (self):
+        settings.FORM_TOKEN_ONE_TIME = False
+        token = app.form.make_token("1.2.3.4")
+        self.assertTrue(app.form.has_valid_token("1.2.3.4", token))
+        self.assertTrue(app.form.has_valid_token("1.2.3.4", token))
+
+    def test_other_ip_address (self):
+        token = app.form.make_token("1.2.3.4")
+        self.assertFalse(app.form.has_valid_token("5.6.7.8", token))
+
+    def test_tampered (self):
+        timestamp, nonce, signature = app.form.make_token("1.2.3.4").split("-")
+        nonce = "%016x" % (int(nonce, 16) ^ 1)
+        self.assertFalse(app.form.has_valid_token("1.2.3.4", "-".join([timestamp, nonce, signature])))
+
+    def test_expired (self):
+        timestamp = str(int(time.time()) - app.form.get_expiration_time() - 1)
+        nonce = "0123456789abcdef"
+        token = timestamp + "-" + nonce + "-" + app.form.sign("1.2.3.4", timestamp, nonce)
+        self.assertFalse(app.form.has_valid_token("1.2.3.4", token))
+
+    def test_malformed (self):
+        token = app.form.make_token("1.2.3.4")
+        self.assertFalse(app.form.has_valid_token("1.2.3.4", ""))
+        self.assertFalse(app.form.has_valid_token("1.2.3.4", token + "\n"))
+        self.assertFalse(app.form.has_valid_token("1.2.3.4", token.upper()))
+        # Digits which aren't ASCII.
+        self.assertFalse(app.form.has_valid_token("1.2.3.4", u"\u0661" + token.split("-", 1)[1]))
+
+    def test_stored_secret (self):
+        token = app.form.make_token("1.2.3.4")
+        self.assertNotEqual(app.model.Secret.get_by_key_name(app.form.kSECRET_KEY_NAME), None)
+
+        # Another instance signs with the same secret.
+        app.form._secret = None
+        self.assertTrue(app.form.has_valid_token("1.2.3.4", token))
+
+    def test_settings_secret (self):
+        settings.FORM_TOKEN_SECRET = "secret"
+        token = app.form.make_token("1.2.3.4")
+        self.assertEqual(app.model.Secret.get_by_key_name(app.form.kSECRET_KEY_NAME), None)
+        self.assertTrue(app.form.has_valid_token("1.2.3.4", token))
+
+
+if __name__ == "__main__":
+    unittest.main()
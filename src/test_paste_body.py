@@ -0,0 +1,63 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+from google.appengine.ext import testbed
+import unittest
+
+import app.model
+
+
+class PasteBodyTest (unittest.TestCase):
+
+    def setUp (self):
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        self.testbed.init_datastore_v3_stub()
+        self.testbed.init_memcache_stub()
+
+        self.code = u"print 'hello'\n" * 100
+
+    def tearDown (self):
+        self.testbed.deactivate()
+
+    def test_compressed (self):
+        body = app.model.PasteBody(key_name="Pa")
+        body.code = self.code
+        body.put()
+
+        body = app.model.PasteBody.get_by_key_name("Pa")
+        self.assertTrue(body.is_compressed())
+        self.assertTrue(len(body.code_blob) < len(self.code))
+        self.assertEqual(body.code, self.code)
+        self.assertEqual(body.code_colored, u"")
+
+    def test_uncompressed (self):
+        # A body put before the code was compressed.
+        app.model.PasteBody(key_name="Pa", code_text=self.code).put()
+
+        body = app.model.PasteBody.get_by_key_name("Pa")
+        self.assertFalse(body.is_compressed())
+        self.assertEqual(body.code, self.code)
+
+        body.compress()
+        body.put()
+        body = app.model.PasteBody.get_by_key_name("Pa")
+        self.assertTrue(body.is_compressed())
+        self.assertEqual(body.code_text, None)
+        self.assertEqual(body.code, self.code)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+from google.appengine.datastore import datastore_stub_util
+from google.appengine.ext import db
+from google.appengine.ext import testbed
+import datetime
+import unittest
+
+import app.cache
+import app.model
+import page.pastes.index
+import settings
+
+
+class PageCursorTest (unittest.TestCase):
+
+    def setUp (self):
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        policy = datastore_stub_util.PseudoRandomHRConsistencyPolicy(probability=1)
+        self.testbed.init_datastore_v3_stub(consistency_policy=policy)
+        self.testbed.init_memcache_stub()
+        self.testbed.init_user_stub()
+
+        self.settings = (settings.SHOW_TWITTER, settings.PASTE_INDEX_CURSOR_STEP,
+                         settings.PASTE_INDEX_MAX_CURSOR_HOPS)
+        settings.SHOW_TWITTER = False
+        settings.PASTE_INDEX_CURSOR_STEP = 2
+        settings.PASTE_INDEX_MAX_CURSOR_HOPS = 2
+
+        # 100 pastes, the newest first: 10 pages.
+        now = datetime.datetime.now()
+        self.slugs = ["P%03d" % i for i in xrange(0, 100)]
+        summaries = []
+        for i, slug in enumerate(self.slugs):
+            posted_at = now - datetime.timedelta(minutes=i)
+            summaries.append(app.model.PasteSummary(key_name=slug, slug=slug, posted_at=posted_at))
+        db.put(summaries)
+
+    def tearDown (self):
+        (settings.SHOW_TWITTER, settings.PASTE_INDEX_CURSOR_STEP,
+         settings.PASTE_INDEX_MAX_CURSOR_HOPS) = self.settings
+        self.testbed.deactivate()
+
+    def get_page (self, number):
+        """
+        Gets the page reached by a request for page <number>, and the slugs
+        of its pastes.
+        """
+
+        handler = page.pastes.index.Index()
+        handler.page, cursor = handler.get_page_cursor(number)
+        return handler.page, [paste.slug for paste in handler.fetch_page(cursor)]
+
+    def test_first_page (self):
+        self.assertEqual(self.get_page(1), (1, self.slugs[:10]))
+
+    def test_page (self):
+        self.assertEqual(self.get_page(3), (3, self.slugs[20:30]))
+        # From the cached cursor.
+        self.assertEqual(self.get_page(3), (3, self.slugs[20:30]))
+        self.assertEqual(self.get_page(4), (4, self.slugs[30:40]))
+
+    def test_max_hops (self):
+        # A page too far away is replaced by the last page reached...
+        self.assertEqual(self.get_page(9), (5, self.slugs[40:50]))
+        # ...and the next requests carry on from there.
+        self.assertEqual(self.get_page(9), (9, self.slugs[80:90]))
+
+    def test_past_the_end (self):
+        self.get_page(9)
+        self.get_page(9)
+        self.assertEqual(self.get_page(11), (11, []))
+
+    def test_new_generation (self):
+        self.assertEqual(self.get_page(3), (3, self.slugs[20:30]))
+
+        # A new paste moves every paste down, the cached cursors are left.
+        slug = "Pnew"
+        posted_at = datetime.datetime.now() + datetime.timedelta(minutes=1)
+        app.model.PasteSummary(key_name=slug, slug=slug, posted_at=posted_at).put()
+        app.cache.next_generation("summaries")
+        self.assertEqual(self.get_page(3), (3, self.slugs[19:29]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+from google.appengine.datastore import datastore_stub_util
+from google.appengine.ext import db
+from google.appengine.ext import testbed
+import unittest
+
+import app.model
+import app.pasty
+
+
+class ForkCountTest (unittest.TestCase):
+
+    def setUp (self):
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        policy = datastore_stub_util.PseudoRandomHRConsistencyPolicy(probability=1)
+        self.testbed.init_datastore_v3_stub(consistency_policy=policy)
+        self.testbed.init_memcache_stub()
+
+    def tearDown (self):
+        self.testbed.deactivate()
+
+    def make_thread (self, depth):
+        """
+        Makes a thread of <depth> pastes, each forked from the one before,
+        with uncounted forks. Returns the pastes.
+        """
+
+        pastes = []
+        for i in xrange(0, depth):
+            slug = "P" + str(i)
+            paste = app.model.Pasty(key_name=slug, slug=slug, thread="P0")
+            if i > 0:
+                paste.parent_paste = pastes[-1].slug
+                paste.ancestors = pastes[-1].ancestors + [pastes[-1].slug]
+                paste.is_fork_counted = False
+            pastes.append(paste)
+        db.put(pastes)
+        return pastes
+
+    def get_counts (self, pastes):
+        pastes = app.model.Pasty.get([paste.key() for paste in pastes])
+        return [(paste.forks, paste.indirect_forks) for paste in pastes]
+
+    def test_count (self):
+        pastes = self.make_thread(3)
+        app.pasty.count_fork(pastes[1])
+        app.pasty.count_fork(pastes[2])
+        self.assertEqual(self.get_counts(pastes), [(1, 2), (1, 1), (0, 0)])
+        self.assertTrue(app.model.Pasty.get(pastes[2].key()).is_fork_counted)
+
+    def test_deep_thread (self):
+        # More ancestors than a transaction may span.
+        pastes = self.make_thread(app.pasty.kTRANSACTION_MAX_GROUPS * 2 + 1)
+        fork = pastes[-1]
+        updated = app.pasty.count_fork(fork)
+        self.assertEqual(len(updated), len(pastes) - 1)
+
+        counts = self.get_counts(pastes)
+        self.assertEqual(counts[-2], (1, 1))
+        self.assertEqual(counts[:-2], [(0, 1)] * (len(pastes) - 2))
+
+        fork = app.model.Pasty.get(fork.key())
+        self.assertTrue(fork.is_fork_counted)
+        self.assertEqual(sorted(fork.fork_counted_in), sorted(fork.ancestors))
+
+    def test_count_once (self):
+        pastes = self.make_thread(app.pasty.kTRANSACTION_MAX_GROUPS * 2)
+        fork = pastes[-1]
+        keys = [paste.key() for paste in pastes[:-1]]
+
+        # A task which failed after its first transaction.
+        db.run_in_transaction_options(db.create_transaction_options(xg=True),
+                                      app.pasty.update_fork_counts_of, fork.key(), keys[:2], 1, False)
+        fork = app.model.Pasty.get(fork.key())
+        self.assertFalse(fork.is_fork_counted)
+
+        app.pasty.count_fork(fork)
+        app.pasty.count_fork(app.model.Pasty.get(fork.key()))
+        counts = self.get_counts(pastes)
+        self.assertEqual([indirect_forks for forks, indirect_forks in counts[:-1]], [1] * len(keys))
+
+    def test_uncount (self):
+        pastes = self.make_thread(app.pasty.kTRANSACTION_MAX_GROUPS * 2)
+        fork = pastes[-1]
+        app.pasty.count_fork(fork)
+        fork = app.model.Pasty.get(fork.key())
+
+        app.pasty.uncount_fork(fork)
+        self.assertEqual(self.get_counts(pastes), [(0, 0)] * len(pastes))
+        fork = app.model.Pasty.get(fork.key())
+        self.assertFalse(fork.is_fork_counted)
+        self.assertEqual(fork.get_counted_ancestors(), [])
+
+        # Never below 0.
+        app.pasty.uncount_fork(fork)
+        self.assertEqual(self.get_counts(pastes), [(0, 0)] * len(pastes))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+from google.appengine.datastore import datastore_stub_util
+from google.appengine.ext import testbed
+import datetime
+import unittest
+
+import app.model
+import app.stats
+
+
+class StatsTest (unittest.TestCase):
+
+    def setUp (self):
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        policy = datastore_stub_util.PseudoRandomHRConsistencyPolicy(probability=1)
+        self.testbed.init_datastore_v3_stub(consistency_policy=policy)
+        self.testbed.init_memcache_stub()
+
+        self.at = datetime.datetime(2011, 5, 3, 14, 20)
+
+    def tearDown (self):
+        self.testbed.deactivate()
+
+    def make_paste (self, slug, posted_at, language="python", is_counted=False):
+        paste = app.model.Pasty(key_name=slug, slug=slug, posted_at=posted_at,
+                                language=language, is_counted=is_counted)
+        paste.put()
+        return paste
+
+    def get_count (self, path):
+        return app.stats.get_counts([path])[0]
+
+    def test_add_paste (self):
+        paste = self.make_paste("Pa", self.at)
+        self.assertTrue(app.stats.add_paste(paste.key()))
+
+        paths = app.stats.get_paste_paths(paste)
+        self.assertEqual(app.stats.get_counts(paths), [1] * len(paths))
+        self.assertTrue(app.model.Pasty.get(paste.key()).is_counted)
+
+    def test_add_paste_once (self):
+        paste = self.make_paste("Pa", self.at)
+        self.assertTrue(app.stats.add_paste(paste.key()))
+        self.assertFalse(app.stats.add_paste(paste.key()))
+        self.assertEqual(self.get_count(app.stats.get_month_path(self.at)), 1)
+
+    def test_shard_keys (self):
+        # The counts of a shard are in the entity group of its month count.
+        path = app.stats.get_breakdown_path(self.at, app.stats.kBREAKDOWN_LANGUAGE, "python")
+        month_path = app.stats.get_month_path(self.at)
+        for shard in xrange(0, 3):
+            self.assertEqual(app.stats.get_shard_key(path, shard).parent(),
+                             app.stats.get_shard_key(month_path, shard))
+
+    def test_set_count (self):
+        path = app.stats.get_day_path(self.at)
+        app.stats.set_count(path, 7)
+        self.assertEqual(self.get_count(path), 7)
+        app.stats.set_count(path, 2)
+        self.assertEqual(self.get_count(path), 2)
+
+    def test_reconcile_day (self):
+        self.make_paste("Pa", self.at, is_counted=True)
+        self.make_paste("Pb", self.at, is_counted=True)
+        self.assertEqual(app.stats.reconcile_day(self.at.date()), 2)
+        self.assertEqual(self.get_count(app.stats.get_hour_path(self.at)), 2)
+        self.assertEqual(self.get_count(app.stats.get_day_path(self.at)), 2)
+        self.assertEqual(self.get_count(app.stats.get_month_path(self.at)), 2)
+
+    def test_reconcile_day_uncounted (self):
+        # The recount task of the paste will add it, the hour is left alone.
+        paste = self.make_paste("Pa", self.at)
+        app.stats.reconcile_day(self.at.date())
+        self.assertEqual(self.get_count(app.stats.get_hour_path(self.at)), 0)
+
+        app.stats.add_paste(paste.key())
+        app.stats.reconcile_day(self.at.date())
+        self.assertEqual(self.get_count(app.stats.get_hour_path(self.at)), 1)
+        self.assertEqual(self.get_count(app.stats.get_month_path(self.at)), 1)
+
+    def test_breakdowns (self):
+        month = datetime.datetime(2011, 5, 1)
+        self.make_paste("Pa", self.at, language="python", is_counted=True)
+        self.make_paste("Pb", self.at + datetime.timedelta(days=10), language="python", is_counted=True)
+        self.make_paste("Pc", self.at, language="ruby", is_counted=True)
+        self.make_paste("Pd", self.at, language="ruby")
+        wrong_path = app.stats.get_breakdown_path(month, app.stats.kBREAKDOWN_LANGUAGE, "sql")
+        app.stats.set_count(wrong_path, 3)
+
+        day = app.stats.start_breakdowns(month)
+        self.assertEqual(day, month)
+        # Already started.
+        self.assertEqual(app.stats.start_breakdowns(month), None)
+
+        days = 0
+        while day != None:
+            day = app.stats.tally_breakdowns(month, day)
+            days += 1
+        self.assertEqual(days, 31)
+        self.assertEqual(app.stats.fix_breakdowns(month), 3)
+
+        python_path = app.stats.get_breakdown_path(month, app.stats.kBREAKDOWN_LANGUAGE, "python")
+        ruby_path = app.stats.get_breakdown_path(month, app.stats.kBREAKDOWN_LANGUAGE, "ruby")
+        self.assertEqual(self.get_count(python_path), 2)
+        # The paste whose recount task hasn't run is left out.
+        self.assertEqual(self.get_count(ruby_path), 1)
+        self.assertEqual(self.get_count(wrong_path), 0)
+        self.assertEqual(app.model.BreakdownTally.all().count(), 0)
+
+    def test_tally_twice (self):
+        month = datetime.datetime(2011, 5, 1)
+        self.make_paste("Pa", month, is_counted=True)
+        day = app.stats.start_breakdowns(month)
+        self.assertEqual(app.stats.tally_breakdowns(month, day), month + datetime.timedelta(days=1))
+        # A task run twice.
+        self.assertEqual(app.stats.tally_breakdowns(month, day), None)
+        self.assertEqual(app.stats.fix_breakdowns(month), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+from google.appengine.datastore import datastore_stub_util
+from google.appengine.ext import testbed
+import datetime
+import unittest
+
+import app.model
+import app.pasty
+import app.sweep
+import settings
+
+
+class SweepTest (unittest.TestCase):
+
+    def setUp (self):
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        policy = datastore_stub_util.PseudoRandomHRConsistencyPolicy(probability=1)
+        self.testbed.init_datastore_v3_stub(consistency_policy=policy)
+        self.testbed.init_memcache_stub()
+
+        self.batch_size = settings.SWEEP_BATCH_SIZE
+        self.now = datetime.datetime.now()
+        self.past = self.now - datetime.timedelta(days=1)
+        self.future = self.now + datetime.timedelta(days=1)
+
+    def tearDown (self):
+        settings.SWEEP_BATCH_SIZE = self.batch_size
+        self.testbed.deactivate()
+
+    def make_paste (self, slug, expired_at=None, parent=None):
+        paste = app.model.Pasty(key_name=slug, slug=slug, posted_at=self.past,
+                                expired_at=expired_at, thread=slug)
+        if parent != None:
+            paste.parent_paste = parent.slug
+            paste.ancestors = parent.ancestors + [parent.slug]
+            paste.thread = parent.thread
+            paste.is_fork_counted = False
+        paste.put()
+        if parent != None:
+            app.pasty.count_fork(paste)
+        return app.model.Pasty.get(paste.key())
+
+    def sweep_all (self, kind):
+        total, cursor = app.sweep.sweep(kind, None, self.now)
+        while cursor != None:
+            deleted, cursor = app.sweep.sweep(kind, cursor, self.now)
+            total += deleted
+        return total
+
+    def test_expired (self):
+        self.make_paste("Pa", expired_at=self.past)
+        self.make_paste("Pb", expired_at=self.future)
+        self.make_paste("Pc")
+
+        self.assertEqual(self.sweep_all("pastes"), 1)
+        self.assertEqual(app.model.Pasty.get_by_key_name("Pa"), None)
+        self.assertNotEqual(app.model.Pasty.get_by_key_name("Pb"), None)
+        self.assertNotEqual(app.model.Pasty.get_by_key_name("Pc"), None)
+
+    def test_batches (self):
+        settings.SWEEP_BATCH_SIZE = 2
+        for i in xrange(0, 5):
+            self.make_paste("P" + str(i), expired_at=self.past)
+
+        deleted, cursor = app.sweep.sweep("pastes", None, self.now)
+        self.assertEqual(deleted, 2)
+        self.assertNotEqual(cursor, None)
+        self.assertEqual(self.sweep_all("pastes"), 3)
+        self.assertEqual(app.model.Pasty.all().count(), 0)
+
+    def test_uncount_forks (self):
+        root = self.make_paste("Pa")
+        parent = self.make_paste("Pb", parent=root)
+        self.make_paste("Pc", expired_at=self.past, parent=parent)
+        self.assertEqual(app.model.Pasty.get(root.key()).indirect_forks, 2)
+
+        self.sweep_all("pastes")
+
+        root = app.model.Pasty.get(root.key())
+        parent = app.model.Pasty.get(parent.key())
+        self.assertEqual((root.forks, root.indirect_forks), (1, 1))
+        self.assertEqual((parent.forks, parent.indirect_forks), (0, 0))
+
+    def test_uncount_once (self):
+        root = self.make_paste("Pa")
+        fork = self.make_paste("Pb", expired_at=self.past, parent=root)
+
+        # A task which failed after taking the fork out of the counts.
+        app.sweep.uncount_forks([fork])
+        fork = app.model.Pasty.get(fork.key())
+        self.assertEqual(fork.get_counted_ancestors(), [])
+        self.sweep_all("pastes")
+
+        root = app.model.Pasty.get(root.key())
+        self.assertEqual((root.forks, root.indirect_forks), (0, 0))
+
+    def test_forms (self):
+        app.model.Form(token="a", expired_at=self.past).put()
+        app.model.Form(token="b", expired_at=self.future).put()
+        self.assertEqual(self.sweep_all("forms"), 1)
+        self.assertEqual([form.token for form in app.model.Form.all()], ["b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+import datetime
+import unittest
+
+import app.model
+
+
+class MakeThreadPathTest (unittest.TestCase):
+
+    def setUp (self):
+        self.at = datetime.datetime(2011, 5, 1, 12, 30, 0, 123000)
+
+    def test_segment_length (self):
+        path = app.model.make_thread_path("", self.at, "Pabc")
+        self.assertEqual(len(path), app.model.kTHREAD_PATH_SEGMENT_LENGTH)
+        path = app.model.make_thread_path(path, self.at, "Pabcdefgh")
+        self.assertEqual(len(path), 2 * app.model.kTHREAD_PATH_SEGMENT_LENGTH)
+
+    def test_fork_after_parent (self):
+        parent = app.model.make_thread_path("", self.at, "Pparent")
+        fork = app.model.make_thread_path(parent, self.at, "Pfork")
+        self.assertTrue(fork.startswith(parent))
+        self.assertTrue(parent < fork)
+
+    def test_forks_by_time (self):
+        later = self.at + datetime.timedelta(milliseconds=1)
+        path1 = app.model.make_thread_path("", self.at, "Pzzzzzzzz")
+        path2 = app.model.make_thread_path("", later, "Paaaaaaaa")
+        self.assertTrue(path1 < path2)
+
+    def test_same_millisecond (self):
+        path1 = app.model.make_thread_path("", self.at, "Paaaaaaaa")
+        path2 = app.model.make_thread_path("", self.at, "Pbbbbbbbb")
+        self.assertNotEqual(path1, path2)
+
+        # The forks of the first paste are listed before the second one.
+        fork1 = app.model.make_thread_path(path1, self.at, "Pzzzzzzzz")
+        self.assertEqual(sorted([path2, fork1, path1]), [path1, fork1, path2])
+
+    def test_short_slug (self):
+        path1 = app.model.make_thread_path("", self.at, "Pab")
+        path2 = app.model.make_thread_path("", self.at, "Pabc")
+        fork1 = app.model.make_thread_path(path1, self.at, "Pzzzzzzzz")
+        self.assertEqual(sorted([path2, fork1, path1]), [path1, fork1, path2])
+
+    def test_max_length (self):
+        path = ""
+        for i in xrange(100):
+            path = app.model.make_thread_path(path, self.at, "P" + str(i))
+        self.assertTrue(len(path) <= app.model.kTHREAD_PATH_MAX_LENGTH)
+        self.assertEqual(len(path) % app.model.kTHREAD_PATH_SEGMENT_LENGTH, 0)
+        self.assertTrue(path.endswith(app.model.make_thread_path("", self.at, "P99")))
+
+
+if __name__ == "__main__":
+    unittest.main()
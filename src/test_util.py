@@ -0,0 +1,48 @@
+# Copyright 2008 Thomas Quemard
+#
+# Paste-It is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation; either version 3.0, or (at your option)
+# any later version.
+#
+# Paste-It is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details.
+
+
+
+
+import unittest
+import zlib
+
+import app.util
+
+
+class CompressTextTest (unittest.TestCase):
+
+    def test_round_trip (self):
+        for text in [u"", u"a", u"print 'hello'\n" * 100, u"\u00e9t\u00e9 \u2603\n" * 50]:
+            self.assertEqual(app.util.decompress_text(app.util.compress_text(text)), text)
+
+    def test_compressed (self):
+        text = u"print 'hello'\n" * 100
+        blob = app.util.compress_text(text)
+        self.assertEqual(ord(blob[0]), app.util.kTEXT_FORMAT_ZLIB)
+        self.assertTrue(len(blob) < len(text))
+
+    def test_plain (self):
+        # Too short to get any smaller.
+        blob = app.util.compress_text(u"a")
+        self.assertEqual(blob, chr(app.util.kTEXT_FORMAT_PLAIN) + "a")
+
+    def test_empty_blob (self):
+        self.assertEqual(app.util.decompress_text(None), u"")
+        self.assertEqual(app.util.decompress_text(""), u"")
+
+    def test_unknown_format (self):
+        self.assertRaises(ValueError, app.util.decompress_text, chr(9) + zlib.compress("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()